@@ -129,3 +129,61 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+
+# QTI imports run in the background. Uploads are queued in the database (ImportJob) and run by
+# this many threads inside the web process; set it to 0 when running `manage.py run_worker` instead.
+QTI_IMPORT_LOCAL_WORKERS = 2
+# Number of processes that parse the assessments of one zip in parallel (1 parses them one after another).
+QTI_IMPORT_PARSE_WORKERS = 1
+
+# Uploads are always written to a temporary file instead of being held in memory, so large QTI zips
+# don't bloat the web process. Zips are checked against these limits before anything is imported.
+FILE_UPLOAD_HANDLERS = ['django.core.files.uploadhandler.TemporaryFileUploadHandler']
+QTI_UPLOAD_MAX_COMPRESSED_SIZE = 200 * 1024 * 1024  # bytes
+QTI_UPLOAD_MAX_UNCOMPRESSED_SIZE = 1024 * 1024 * 1024  # bytes, all members together
+QTI_UPLOAD_MAX_COMPRESSION_RATIO = 100  # uncompressed size / compressed size of a member
+QTI_UPLOAD_MAX_MEMBERS = 10000
+
+# Every QTI import writes one JSON line with its per-phase timings, memory and query counts to this log.
+# Set this to True to also measure peak memory with tracemalloc, which slows every import down
+# (benchmark_import --trace-memory does it for benchmark runs only).
+QTI_IMPORT_TRACE_MEMORY = False
+QTI_IMPORT_LOG = BASE_DIR / 'qti_import.log'
+
+# Exports read rows from the database this many at a time, through a server-side cursor.
+EXPORT_CHUNK_SIZE = 2000
+# Selections of more courses, tests or questions than this are exported in chunks of this many IDs,
+# since each ID is a query parameter that appears in several subqueries.
+EXPORT_IN_CLAUSE_SIZE = 1000
+# Tables dumped at the same time (each on its own database connection) when the entire database is exported.
+EXPORT_WORKERS = 4
+# Finished exports are kept here and served again while the exported data is unchanged.
+# The least recently used ones are removed once the folder grows past EXPORT_CACHE_MAX_BYTES (0 turns the cache off).
+EXPORT_CACHE_DIR = BASE_DIR / 'export_cache'
+EXPORT_CACHE_MAX_BYTES = 500 * 1024 * 1024
+
+# Imported questions at least this similar (estimated share of common 3-word shingles) to an older question
+# of the same textbook or course are linked to it as near-duplicates. See testapp1/utils/question_dedup.py.
+DUPLICATE_QUESTION_SIMILARITY = 0.8
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message_only': {'format': '%(message)s'},
+    },
+    'handlers': {
+        'qti_import_file': {
+            'class': 'logging.FileHandler',
+            'filename': QTI_IMPORT_LOG,
+            'formatter': 'message_only',
+        },
+    },
+    'loggers': {
+        'testapp1.qti_import': {
+            'handlers': ['qti_import_file'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
@@ -22,6 +22,10 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('testing/', views.parse_qti_xml), # Make sure not to forget the up-slash at the end of url (for now)
     path('process_file/', views.parse_qti_xml, name='parse_qti_xml'), # Process file (AJAX)
+    path('import_status/<int:job_id>/', views.import_status, name='import_status'),  # Progress of a queued import
     path("upload/", views.upload_page, name="upload_page"),  # Load the HTML page
     path("export-csv/", views.export_csv, name="export_csv"),
+    path("export_status/<int:job_id>/", views.export_status, name="export_status"),  # Progress of a full export
+    path("export_download/<int:job_id>/", views.export_download, name="export_download"),
+    path("search/", views.search, name="search"),  # Full-text search over the question bank
 ]
@@ -1,5 +1,9 @@
 from django.contrib import admin
-from .models import UserProfile, Course, Question, Template, Attachment, Test, TestQuestion, Feedback
+from django.db import transaction
+
+from .models import (UserProfile, Course, Question, Template, Attachment, Test, TestQuestion, Feedback, ImportJob,
+                     ExportJob, QuestionSignature)
+from .utils.import_jobs import retry_import_job, start_local_workers
 
 # Register your models here.
 admin.site.register(UserProfile)
@@ -10,3 +14,28 @@ admin.site.register(Attachment)
 admin.site.register(Test)
 admin.site.register(TestQuestion)
 admin.site.register(Feedback)
+admin.site.register(ExportJob)
+
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ('original_filename', 'course', 'status', 'assessments_processed', 'created_at', 'finished_at')
+    list_filter = ('status',)
+    actions = ['retry_jobs']
+
+    @admin.action(description="Retry selected imports (skips assessments already committed)")
+    def retry_jobs(self, request, queryset):
+        retried = sum(1 for job in queryset if retry_import_job(job))
+        transaction.on_commit(start_local_workers)
+        self.message_user(request, f"{retried} import(s) queued again.")
+
+
+@admin.register(QuestionSignature)
+class QuestionSignatureAdmin(admin.ModelAdmin):
+    list_display = ('question', 'duplicate_of', 'similarity', 'scope')
+    raw_id_fields = ('question', 'duplicate_of')
+    exclude = ('minhash',)
+
+    def get_queryset(self, request):
+        # only the questions flagged as near-duplicates
+        return super().get_queryset(request).filter(duplicate_of__isnull=False)
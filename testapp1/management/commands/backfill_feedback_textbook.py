@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+
+from testapp1.models import Feedback
+
+
+class Command(BaseCommand):
+    help = (
+        "Fills in Feedback.textbook for existing feedback from its question or test, in batches of "
+        "primary keys. Feedback saved since the field was added already has it; running this again is harmless."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000, help="Feedback rows updated per query.")
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options["batch_size"])
+        last_id = Feedback.objects.aggregate(last_id=Max('pk'))['last_id'] or 0
+        updated = 0
+        # one short UPDATE per range of IDs, so the table isn't locked for the whole backfill
+        for start in range(0, last_id, batch_size):
+            updated += Feedback.refresh_textbooks(Feedback.objects.filter(pk__gt=start, pk__lte=start + batch_size))
+        self.stdout.write(self.style.SUCCESS(f"Worked out the textbook of {updated} feedback row(s)."))
@@ -0,0 +1,97 @@
+import json
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from testapp1.utils.import_benchmark import SUITES, compare, load_baseline, run_benchmark_case, save_baseline
+from testapp1.utils.qti_corpus import write_corpus_zip
+
+
+class Command(BaseCommand):
+    help = (
+        "Imports QTI zips into a throwaway test database (created from the default connection like the test "
+        "runner does, and destroyed afterwards) and reports items/sec, queries per item, peak RSS and media "
+        "bytes written, optionally compared against a baseline file. Needs --force."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("zips", nargs="*", help="Zips to import. Without any, the --suite zips are generated.")
+        parser.add_argument("--suite", default="small,medium",
+                            help=f"Generated cases to run when no zips are given ({', '.join(SUITES)}).")
+        parser.add_argument("--parse-workers", type=int, default=1, help="Parse worker processes per import.")
+        parser.add_argument("--repeat", type=int, default=1, help="Runs per case; the fastest run is kept.")
+        parser.add_argument("--baseline", help="Baseline JSON file to compare the results with.")
+        parser.add_argument("--save-baseline", help="Write the results to this JSON file as the new baseline.")
+        parser.add_argument("--tolerance", type=float, default=0.10,
+                            help="Relative change allowed before a result counts as a regression.")
+        parser.add_argument("--fail-on-regression", action="store_true",
+                            help="Exit with an error if any result regressed beyond the tolerance.")
+        parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+        parser.add_argument("--force", action="store_true",
+                            help="Confirm creating (and destroying) the test database on the configured server. "
+                                 "An existing test database of the same name is replaced.")
+        parser.add_argument("--trace-memory", action="store_true",
+                            help="Also measure the peak memory of every import phase (slows the imports down).")
+
+    def handle(self, *args, **options):
+        if not options["force"]:
+            raise CommandError("benchmark_import creates and destroys a test database on the configured database "
+                               "server (replacing one of the same name). Pass --force to run it.")
+        with tempfile.TemporaryDirectory(prefix="qti-benchmark-") as corpus_dir:
+            cases = {os.path.basename(path): path for path in options["zips"]}
+            if not cases:
+                for name in options["suite"].split(","):
+                    if name not in SUITES:
+                        raise CommandError(f"Unknown suite '{name}'; choose from {', '.join(SUITES)}.")
+                    cases[name] = os.path.join(corpus_dir, f"{name}.zip")
+                    write_corpus_zip(cases[name], **SUITES[name])
+
+            results = {}
+            for name, path in cases.items():
+                runs = []
+                for run_number in range(options["repeat"]):
+                    # a fresh process per run, so peak RSS belongs to this run alone
+                    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                        runs.append(pool.submit(run_benchmark_case, path, options["parse_workers"],
+                                                 options["trace_memory"]).result())
+                results[name] = max(runs, key=lambda run: run["items_per_second"])
+                self.report(name, results[name])
+
+        if options["json"]:
+            self.stdout.write(json.dumps(results, indent=2, sort_keys=True))
+
+        regressions = []
+        if options["baseline"]:
+            baseline = load_baseline(options["baseline"])
+            self.stdout.write(f"\nCompared with {options['baseline']} (tolerance {options['tolerance']:.0%}):")
+            for name, result in results.items():
+                if name not in baseline:
+                    self.stdout.write(f"  {name}: not in the baseline")
+                    continue
+                for metric, old_value, new_value, change, regressed in compare(result, baseline[name],
+                                                                               options["tolerance"]):
+                    line = f"  {name} {metric}: {old_value} -> {new_value} ({change:+.1%})"
+                    if regressed:
+                        regressions.append(f"{name} {metric}")
+                        self.stdout.write(self.style.ERROR(line + "  REGRESSION"))
+                    else:
+                        self.stdout.write(line)
+
+        if options["save_baseline"]:
+            save_baseline(options["save_baseline"], results)
+            self.stdout.write(f"Baseline written to {options['save_baseline']}")
+
+        if regressions and options["fail_on_regression"]:
+            raise CommandError(f"Regressed: {', '.join(regressions)}")
+
+    def report(self, name, result):
+        peak_rss = f"{result['peak_rss_bytes'] / 2 ** 20:.1f} MiB" if result["peak_rss_bytes"] else "n/a"
+        self.stdout.write(
+            f"{name}: {result['items']} items in {result['seconds']}s = {result['items_per_second']} items/s, "
+            f"{result['queries_per_item']} queries/item, peak RSS {peak_rss}, {result['media_bytes']} media bytes"
+        )
+        if result["errors"]:
+            self.stdout.write(self.style.WARNING(f"  errors: {result['errors']}"))
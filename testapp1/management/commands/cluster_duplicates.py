@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Q
+
+from testapp1.models import Question, QuestionSignature
+from testapp1.utils.question_dedup import SIGN_BATCH_SIZE, link_duplicates
+
+
+class Command(BaseCommand):
+    help = (
+        "Finds the near-duplicate questions of an existing question bank. Every question is signed again "
+        "(MinHash of its text without HTML) and linked to the oldest question of its cluster, comparing it "
+        "only with the questions of its textbook or course that share an LSH bucket with it. The QTI importer "
+        "does the same for the questions it writes; this covers questions added before or by other means."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--textbook", type=int, help="Only the questions of this textbook (ID) and its courses.")
+        parser.add_argument("--course", type=int, help="Only the questions of this course (ID).")
+        parser.add_argument("--threshold", type=float, default=None,
+                            help="Similarity from 0 to 1 above which questions are linked (default: "
+                                 "settings.DUPLICATE_QUESTION_SIMILARITY).")
+        parser.add_argument("--show", type=int, default=10, help="Number of the largest clusters to list.")
+
+    def handle(self, *args, **options):
+        if options["threshold"] is not None and not 0 < options["threshold"] <= 1:
+            raise CommandError("--threshold must be between 0 and 1.")
+        questions = Question.objects.all()
+        if options["textbook"] is not None:
+            questions = questions.filter(Q(textbook=options["textbook"]) | Q(course__textbook=options["textbook"]))
+        if options["course"] is not None:
+            questions = questions.filter(course=options["course"])
+
+        # oldest first, so every question is compared with older questions that were already signed in this run
+        question_ids = list(questions.order_by('pk').values_list('pk', flat=True))
+        linked = 0
+        for start in range(0, len(question_ids), SIGN_BATCH_SIZE):
+            with transaction.atomic():
+                linked += link_duplicates(question_ids[start:start + SIGN_BATCH_SIZE], options["threshold"])
+
+        clusters = QuestionSignature.objects.filter(question__in=question_ids, duplicate_of__isnull=False) \
+            .values('duplicate_of').annotate(size=Count('pk')).order_by('-size', 'duplicate_of')
+        self.stdout.write(f"{linked} of {len(question_ids)} question(s) nearly duplicate an older one, "
+                          f"in {clusters.count()} cluster(s).")
+        for cluster in clusters[:options["show"]]:
+            question = Question.objects.get(pk=cluster["duplicate_of"])
+            self.stdout.write(f"  QID {question.pk} and {cluster['size']} near-duplicate(s): {question}")
+        self.stdout.write(self.style.SUCCESS("Near-duplicate questions linked."))
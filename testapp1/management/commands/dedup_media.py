@@ -0,0 +1,135 @@
+import hashlib
+import os
+from collections import defaultdict
+
+from django.apps import apps
+from django.core.files import File
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import FileField, Value
+from django.db.models.functions import Replace
+
+from testapp1.models import Question, Options, Answers
+from testapp1.storage import BLOB_DIR, blob_name, content_addressed_storage
+
+# image fields that are stored content-addressed
+MANAGED_FIELDS = [
+    (Question, "img"),
+    (Question, "ansimg"),
+    (Options, "image"),
+    (Answers, "answer_graphic"),
+]
+# text fields the importer writes image URLs into
+TEXT_FIELDS = [
+    (Question, "text"),
+    (Question, "answer"),
+    (Options, "text"),
+    (Answers, "text"),
+]
+CHUNK_SIZE = 64 * 1024
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as media_file:
+        for chunk in iter(lambda: media_file.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class Command(BaseCommand):
+    help = (
+        "Moves existing imported images into content-addressed storage, points every row (and every "
+        "image URL in question, option and answer text) at the shared copy, and deletes duplicate files."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Report what would change without changing it.")
+
+    def handle(self, *args, **options):
+        dry_run = options["dry_run"]
+        storage = content_addressed_storage
+        media_root = storage.location
+
+        # group every file under MEDIA_ROOT (except the blob store itself) by content
+        files_by_digest = defaultdict(list)
+        file_sizes = {}
+        for directory, folder_names, file_names in os.walk(media_root):
+            relative_directory = os.path.relpath(directory, media_root).replace(os.sep, "/")
+            if relative_directory == BLOB_DIR or relative_directory.startswith(BLOB_DIR + "/"):
+                continue
+            for file_name in file_names:
+                name = file_name if relative_directory == "." else f"{relative_directory}/{file_name}"
+                path = storage.path(name)
+                files_by_digest[hash_file(path)].append(name)
+                file_sizes[name] = os.path.getsize(path)
+
+        managed_names = set()
+        for model, field_name in MANAGED_FIELDS:
+            managed_names.update(model.objects.exclude(**{field_name: ""}).exclude(**{f"{field_name}__isnull": True})
+                                 .values_list(field_name, flat=True).distinct())
+        # files referenced by any other file field are left where they are
+        protected_names = set()
+        for model in apps.get_app_config("testapp1").get_models():
+            for field in model._meta.get_fields():
+                if isinstance(field, FileField) and (model, field.name) not in MANAGED_FIELDS:
+                    protected_names.update(model.objects.exclude(**{field.name: ""})
+                                           .values_list(field.name, flat=True))
+
+        rows_repointed = 0
+        files_removed = 0
+        bytes_removed = 0
+        bytes_added = 0
+
+        for digest, names in files_by_digest.items():
+            names.sort()
+            referenced_names = [name for name in names if name in managed_names]
+            removable_names = [name for name in names if name not in protected_names]
+
+            if referenced_names:
+                # the contents move to the blob store, so none of the loose copies are needed
+                new_name = blob_name(digest, os.path.splitext(names[0])[1])
+                if not storage.exists(new_name):
+                    bytes_added += file_sizes[names[0]]
+                    if not dry_run:
+                        with open(storage.path(names[0]), "rb") as media_file:
+                            new_name = storage.save(names[0], File(media_file))
+                for old_name in referenced_names:
+                    rows_repointed += self.repoint(old_name, new_name, dry_run)
+            elif not protected_names.intersection(names):
+                # nothing uses these files, so keep one copy and drop the rest
+                removable_names = removable_names[1:]
+
+            for name in removable_names:
+                files_removed += 1
+                bytes_removed += file_sizes[name]
+                if not dry_run:
+                    storage.delete(name)
+
+        reclaimed = bytes_removed - bytes_added
+        prefix = "[dry run] " if dry_run else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}Scanned {len(file_sizes)} files, repointed {rows_repointed} rows, "
+            f"removed {files_removed} files. Disk reclaimed: {reclaimed} bytes ({reclaimed / (1024 * 1024):.2f} MB)."
+        ))
+
+    def repoint(self, old_name, new_name, dry_run):
+        """
+        Points every image field and every embedded URL that uses old_name at new_name.
+        Returns the number of rows that change.
+        """
+        storage = content_addressed_storage
+        old_url = storage.url(old_name)
+        rows = 0
+        with transaction.atomic():
+            for model, field_name in MANAGED_FIELDS:
+                matching = model.objects.filter(**{field_name: old_name})
+                rows += matching.count() if dry_run else matching.update(**{field_name: new_name})
+            for model, field_name in TEXT_FIELDS:
+                matching = model.objects.filter(**{f"{field_name}__contains": old_url})
+                if dry_run:
+                    rows += matching.count()
+                else:
+                    rows += matching.update(**{field_name: Replace(field_name, Value(old_url),
+                                                                   Value(storage.url(new_name)))})
+        return rows
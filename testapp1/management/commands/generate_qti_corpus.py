@@ -0,0 +1,47 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from testapp1.utils.qti_corpus import DEFAULT_TYPE_MIX, parse_type_mix, write_corpus_zip
+
+
+class Command(BaseCommand):
+    help = "Writes synthetic Canvas-style QTI 1.2 zips for benchmarking imports."
+
+    def add_arguments(self, parser):
+        parser.add_argument("output", help="Zip file to write (with --zips > 1, a folder to write them to).")
+        parser.add_argument("--zips", type=int, default=1, help="Number of zips to write.")
+        parser.add_argument("--assessments", type=int, default=10, help="Assessments per zip.")
+        parser.add_argument("--items", type=int, default=20, help="Items per assessment.")
+        parser.add_argument("--mix", default=None,
+                            help="Question type weights, e.g. multiple_choice_question=5,essay_question=1 "
+                                 f"(default: {','.join(f'{k}={v}' for k, v in DEFAULT_TYPE_MIX.items())}).")
+        parser.add_argument("--image-ratio", type=float, default=0.1,
+                            help="Fraction of items whose prompt embeds an image.")
+        parser.add_argument("--image-size", type=int, default=20000, help="Size of each image in bytes.")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed; the same seed gives the same zips.")
+
+    def handle(self, *args, **options):
+        type_mix = parse_type_mix(options["mix"]) if options["mix"] else None
+        if type_mix is not None and not set(type_mix) <= set(DEFAULT_TYPE_MIX):
+            raise CommandError(f"Unknown question types: {', '.join(sorted(set(type_mix) - set(DEFAULT_TYPE_MIX)))}")
+
+        if options["zips"] > 1:
+            os.makedirs(options["output"], exist_ok=True)
+            paths = [os.path.join(options["output"], f"synthetic_{number}.zip")
+                     for number in range(1, options["zips"] + 1)]
+        else:
+            paths = [options["output"]]
+
+        for number, path in enumerate(paths):
+            summary = write_corpus_zip(
+                path,
+                assessments=options["assessments"],
+                items=options["items"],
+                type_mix=type_mix,
+                image_ratio=options["image_ratio"],
+                image_size=options["image_size"],
+                seed=options["seed"] + number
+            )
+            self.stdout.write(f"{path}: {summary['assessments']} assessments, {summary['items']} items, "
+                              f"{summary['images']} images ({os.path.getsize(path)} bytes)")
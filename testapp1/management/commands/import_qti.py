@@ -0,0 +1,269 @@
+import csv
+import glob
+import os
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from testapp1.models import Course, ImportJob, Textbook
+from testapp1.utils.import_jobs import NEW_COURSE_LOCK, named_lock, run_import_job
+from testapp1.utils.qti_manifest import ZipManifest
+from testapp1.utils.qti_to_db import QtiImporter
+from testapp1.utils.zip_limits import ZipLimitError, check_zip_limits
+
+# columns of the --manifest CSV. "zip" is matched against the file name (or the path as given)
+MANIFEST_COLUMNS = ["zip", "course_id", "course_name", "crn", "semester",
+                    "textbook_title", "textbook_author", "textbook_version", "textbook_isbn", "textbook_link"]
+GLOB_CHARACTERS = set("*?[")
+
+
+def find_zips(paths):
+    """
+    Expands files, directories (searched recursively for .zip files) and glob patterns into
+    a list of zip paths, in the order given and without duplicates.
+    """
+    zip_paths = []
+    for path in paths:
+        if GLOB_CHARACTERS & set(path):
+            matches = sorted(glob.glob(path, recursive=True))
+        elif os.path.isdir(path):
+            matches = sorted(
+                os.path.join(directory, file_name)
+                for directory, folder_names, file_names in os.walk(path)
+                for file_name in file_names
+                if file_name.lower().endswith(".zip")
+            )
+        else:
+            matches = [path]
+        for match in matches:
+            if os.path.isfile(match):
+                zip_paths.append(os.path.abspath(match))
+            elif not GLOB_CHARACTERS & set(path):
+                raise CommandError(f"{match} does not exist.")
+    return list(dict.fromkeys(zip_paths))
+
+
+def read_manifest(path):
+    """
+    Reads the --manifest CSV into {zip name or path: row}.
+    """
+    with open(path, newline="", encoding="utf-8-sig") as manifest_file:
+        reader = csv.DictReader(manifest_file)
+        missing_columns = {"zip", "course_id"} - set(reader.fieldnames or [])
+        if missing_columns:
+            raise CommandError(f"{path} is missing the column(s): {', '.join(sorted(missing_columns))}. "
+                               f"Expected columns: {', '.join(MANIFEST_COLUMNS)}.")
+        return {os.path.normpath(row["zip"].strip()): row for row in reader if row.get("zip")}
+
+
+def manifest_row(manifest, zip_path):
+    for key in (zip_path, os.path.relpath(zip_path), os.path.basename(zip_path)):
+        if key in manifest:
+            return manifest[key]
+    return None
+
+
+def course_for_row(row, create):
+    """
+    Returns the course a manifest row points at, creating it (and its textbook) the way the
+    upload page does when create is True. Returns None if the course doesn't exist and create is False.
+    """
+    def value(column):
+        return (row.get(column) or "").strip() or None
+
+    course_instance = Course.objects.filter(course_id=value("course_id")).first()
+    if course_instance is not None or not create:
+        return course_instance
+
+    textbook_instance = None
+    if value("textbook_title"):
+        textbook_instance, created = Textbook.objects.get_or_create(
+            title=value("textbook_title"),
+            author=value("textbook_author"),
+            version=value("textbook_version"),
+            isbn=value("textbook_isbn"),
+            defaults={
+                "link": value("textbook_link"),
+            }
+        )
+    course_instance, created = Course.objects.get_or_create(
+        course_id=value("course_id"),
+        defaults={
+            "name": value("course_name") or "Untitled Course",
+            "crn": value("crn") or "0000",
+            "sem": value("semester") or "Fall 2021",
+            "textbook": textbook_instance
+        }
+    )
+    return course_instance
+
+
+class Command(BaseCommand):
+    help = (
+        "Imports Canvas QTI 1.2 zips from disk. Takes files, directories (searched for .zip files) and "
+        "glob patterns, and imports several zips at once. Each zip goes to the course given by --course "
+        "or by its row in --manifest (columns: " + ", ".join(MANIFEST_COLUMNS) + "). Every import is "
+        "recorded as an ImportJob, which --resume uses to skip zips that were already imported."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+", help="Zip files, directories or glob patterns.")
+        parser.add_argument("--manifest", help="CSV mapping each zip to its course and textbook.")
+        parser.add_argument("--course", help="course_id of an existing course for zips not in the manifest.")
+        parser.add_argument("--user", help="Username to record as the author of the imported questions.")
+        parser.add_argument("--workers", type=int, default=2, help="Zips imported at the same time.")
+        parser.add_argument("--parse-workers", type=int, default=None,
+                            help="Processes parsing the assessments of one zip (default: "
+                                 "settings.QTI_IMPORT_PARSE_WORKERS).")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Check every zip and report what would be added, updated or skipped, "
+                                 "without writing anything.")
+        parser.add_argument("--resume", action="store_true",
+                            help="Skip zips that an earlier run already imported successfully, and carry on "
+                                 "where a failed run stopped.")
+
+    def handle(self, *args, **options):
+        zip_paths = find_zips(options["paths"])
+        if not zip_paths:
+            raise CommandError("No zip files found.")
+        manifest = read_manifest(options["manifest"]) if options["manifest"] else {}
+        if options["course"] and not Course.objects.filter(course_id=options["course"]).exists():
+            raise CommandError(f"There is no course with course_id {options['course']}.")
+        user = None
+        if options["user"]:
+            user = User.objects.filter(username=options["user"]).first()
+            if user is None:
+                raise CommandError(f"There is no user named {options['user']}.")
+
+        self.output_lock = threading.Lock()
+        self.totals = {"zips": 0, "skipped_zips": 0, "failed_zips": 0, "assessments": 0, "items": 0,
+                       "added": 0, "updated": 0, "skipped": 0}
+        start_time = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=max(1, options["workers"]), thread_name_prefix="import-qti") as pool:
+            futures = [pool.submit(self.import_one, zip_path, manifest, user, options) for zip_path in zip_paths]
+            for future in as_completed(futures):
+                future.result()
+
+        self.print_summary(time.perf_counter() - start_time, options["dry_run"])
+
+    def import_one(self, zip_path, manifest, user, options):
+        try:
+            row = manifest_row(manifest, zip_path)
+            if row is None and options["course"]:
+                row = {"course_id": options["course"]}
+            if row is None:
+                self.finish(zip_path, "failed", "not in the manifest and no --course given")
+                return
+
+            try:
+                check_zip_limits(zip_path, compressed_size=os.path.getsize(zip_path))
+            except ZipLimitError as error:
+                self.finish(zip_path, "failed", str(error))
+                return
+
+            if options["dry_run"]:
+                self.dry_run(zip_path, course_for_row(row, create=False))
+                return
+
+            # two zips (in this run or another) for the same new course must not both create it
+            with named_lock(NEW_COURSE_LOCK):
+                course_instance = course_for_row(row, create=True)
+            earlier_jobs = ImportJob.objects.filter(
+                original_filename=zip_path, upload_size=os.path.getsize(zip_path), course=course_instance)
+            checkpoint = []
+            if options["resume"]:
+                if earlier_jobs.filter(status=ImportJob.DONE).exists():
+                    self.finish(zip_path, "skipped", "already imported")
+                    return
+                # carry on after the assessments a failed run already committed
+                failed_job = earlier_jobs.filter(status=ImportJob.FAILED).order_by("-created_at").first()
+                if failed_job is not None:
+                    checkpoint = failed_job.checkpoint
+
+            # recorded like an upload, so it shows up next to them in the admin
+            import_job = ImportJob.objects.create(
+                original_filename=zip_path,
+                upload_size=os.path.getsize(zip_path),
+                course=course_instance,
+                user=user,
+                status=ImportJob.RUNNING,
+                worker=f"import_qti-{os.getpid()}-{threading.current_thread().name}",
+                started_at=timezone.now(),
+                checkpoint=checkpoint
+            )
+            import_job = run_import_job(import_job, parse_workers=options["parse_workers"], zip_path=zip_path)
+            if import_job.status == ImportJob.DONE:
+                self.finish(zip_path, "done", result=import_job.result)
+            else:
+                self.finish(zip_path, "failed", import_job.error)
+        except Exception as error:
+            self.finish(zip_path, "failed", f"{type(error).__name__}: {error}")
+        finally:
+            connections.close_all()
+
+    def dry_run(self, zip_path, course_instance):
+        with zipfile.ZipFile(zip_path) as zip_ref:
+            assessment_folders = list(ZipManifest(zip_ref.namelist()).assessments())
+            if course_instance is None:
+                # a new course, so everything would be added
+                self.finish(zip_path, "checked", result={"assessments": len(assessment_folders),
+                                                         "added": len(assessment_folders), "updated": 0, "skipped": 0})
+                return
+            # the same check the import starts with, which only reads from the database
+            importer = QtiImporter(course_instance)
+            folders_to_import = importer.skip_unchanged(zip_ref, assessment_folders)
+
+        updated = sum(1 for folder_name, meta_path, questions_path in folders_to_import
+                      if importer.folder_idents[folder_name] in importer.existing_tests)
+        self.finish(zip_path, "checked", result={
+            "assessments": len(assessment_folders),
+            "added": len(folders_to_import) - updated,
+            "updated": updated,
+            "skipped": importer.skipped,
+        })
+
+    def finish(self, zip_path, outcome, message=None, result=None):
+        with self.output_lock:
+            if outcome == "failed":
+                self.totals["failed_zips"] += 1
+                self.stderr.write(self.style.ERROR(f"FAILED  {zip_path}: {message}"))
+                return
+            if outcome == "skipped":
+                self.totals["skipped_zips"] += 1
+                self.stdout.write(f"SKIPPED {zip_path}: {message}")
+                return
+
+            self.totals["zips"] += 1
+            for key in ("assessments", "items", "added", "updated", "skipped"):
+                self.totals[key] += result.get(key, 0)
+            label = "CHECKED" if outcome == "checked" else "DONE   "
+            would = "would be " if outcome == "checked" else ""
+            self.stdout.write(self.style.SUCCESS(
+                f"{label} {zip_path}: {result['added']} tests {would}added, {result['updated']} {would}updated, "
+                f"{result['skipped']} unchanged"
+                + (f", {result['items']} items in {result['elapsed_seconds']}s" if outcome == "done" else "")
+            ))
+
+    def print_summary(self, elapsed_seconds, dry_run):
+        totals = self.totals
+        would = "would be " if dry_run else ""
+        self.stdout.write("")
+        self.stdout.write(
+            f"{'Checked' if dry_run else 'Imported'} {totals['zips']} zip(s) in {elapsed_seconds:.1f}s "
+            f"({totals['skipped_zips']} skipped, {totals['failed_zips']} failed): "
+            f"{totals['added']} tests {would}added, {totals['updated']} {would}updated, {totals['skipped']} unchanged."
+        )
+        if not dry_run and elapsed_seconds > 0:
+            self.stdout.write(
+                f"Throughput: {totals['items'] / elapsed_seconds:.1f} items/s, "
+                f"{totals['zips'] / elapsed_seconds:.2f} zips/s."
+            )
+        if totals["failed_zips"]:
+            raise CommandError(f"{totals['failed_zips']} zip(s) failed.")
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from testapp1.models import Question, QuestionSearchText
+from testapp1.utils.question_search import INDEX_BATCH_SIZE, index_questions
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the full-text search text of every question (prompt, answer, options and answers, "
+        "without HTML). Run it once after migrating, or if the index got out of step."
+    )
+
+    def handle(self, *args, **options):
+        question_ids = list(Question.objects.order_by('pk').values_list('pk', flat=True))
+        with transaction.atomic():
+            # search text of questions that no longer exist
+            QuestionSearchText.objects.exclude(question__in=Question.objects.all()).delete()
+        for start in range(0, len(question_ids), INDEX_BATCH_SIZE):
+            with transaction.atomic():
+                index_questions(question_ids[start:start + INDEX_BATCH_SIZE])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {len(question_ids)} question(s)."))
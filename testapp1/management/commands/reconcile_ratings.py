@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from testapp1.models import Question, Test, Textbook
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuilds the rating totals (rating_count, rating_sum) of every question, test and textbook from "
+        "the feedback table. Saving and deleting feedback keeps them up to date; this repairs them after "
+        "feedback was changed in bulk (e.g. with QuerySet.update() or bulk_create(), which skip that)."
+    )
+
+    def handle(self, *args, **options):
+        for model in (Question, Test, Textbook):
+            with transaction.atomic():
+                updated = model.recompute_ratings()
+            self.stdout.write(f"{model._meta.verbose_name_plural}: {updated} row(s) recounted")
+        self.stdout.write(self.style.SUCCESS("Rating totals rebuilt."))
@@ -0,0 +1,61 @@
+import os
+import socket
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from testapp1.utils.import_jobs import claim_next_job, run_import_job
+
+
+class Command(BaseCommand):
+    help = "Runs queued QTI import jobs. The queue lives in the database, so no message broker is needed."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=1, help="Number of jobs to run at the same time.")
+        parser.add_argument("--poll-interval", type=float, default=2.0,
+                            help="Seconds to wait before checking an empty queue again.")
+        parser.add_argument("--parse-workers", type=int, default=None,
+                            help="Processes used to parse the assessments of one zip in parallel "
+                                 "(default: settings.QTI_IMPORT_PARSE_WORKERS).")
+        parser.add_argument("--once", action="store_true", help="Exit once the queue is empty instead of waiting.")
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+        threads = [
+            threading.Thread(target=self.work, args=(number, options, stop), daemon=True)
+            for number in range(max(1, options["workers"]))
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            while any(thread.is_alive() for thread in threads):
+                time.sleep(0.5)
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping after the jobs that are running now finish...")
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+    def work(self, number, options, stop):
+        worker_name = f"{socket.gethostname()}-{os.getpid()}-{number}"
+        try:
+            while not stop.is_set():
+                job = claim_next_job(worker_name)
+                if job is None:
+                    if options["once"]:
+                        return
+                    stop.wait(options["poll_interval"])
+                    continue
+
+                self.stdout.write(f"[{worker_name}] job {job.pk}: importing {job.original_filename}")
+                job = run_import_job(job, parse_workers=options["parse_workers"])
+                if job.status == job.DONE:
+                    self.stdout.write(self.style.SUCCESS(
+                        f"[{worker_name}] job {job.pk}: {job.items_processed} items in {job.elapsed_seconds}s"
+                    ))
+                else:
+                    self.stdout.write(self.style.ERROR(f"[{worker_name}] job {job.pk} failed: {job.error}"))
+        finally:
+            connections.close_all()
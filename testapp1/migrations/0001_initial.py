@@ -0,0 +1,260 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:07
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Course',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('course_id', models.CharField(default='CS499', help_text='e.g: CS499', max_length=50)),
+                ('name', models.CharField(default='Untitled Course', help_text='e.g: SR PROJ:TEAM SOFTWARE DESIGN', max_length=250)),
+                ('crn', models.CharField(default='0000', help_text='e.g: 54352', max_length=50)),
+                ('sem', models.CharField(default='Fall 2021', help_text='e.g: Fall 2021', max_length=50)),
+                ('published', models.BooleanField(default=False)),
+                ('teachers', models.ManyToManyField(blank=True, limit_choices_to={'userprofile__role': 'teacher'}, related_name='courses', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Attachment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Attachment name', max_length=300)),
+                ('file', models.FileField(upload_to='attachments/')),
+                ('published', models.BooleanField(default=False)),
+                ('course', models.ForeignKey(blank=True, help_text='Course associated with this attachment (teacher content).', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='attachment_set', to='testapp1.course')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Feedback',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rating', models.IntegerField(blank=True, choices=[(1, '1'), (2, '2'), (3, '3'), (4, '4'), (5, '5')], null=True)),
+                ('averageScore', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('comments', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FeedbackResponse',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text', models.TextField(blank=True, null=True)),
+                ('date', models.DateTimeField(auto_now_add=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('feedback', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='responses', to='testapp1.feedback')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Question',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('qtype', models.CharField(choices=[('tf', 'True/False'), ('mc', 'Multiple Choice'), ('sa', 'Short Answer'), ('es', 'Essay'), ('ma', 'Matching'), ('ms', 'Multiple Selection'), ('fb', 'Fill in the Blank'), ('dy', 'Dynamic')], max_length=50)),
+                ('text', models.TextField(default='Question text.', help_text='Question prompt.', null=True)),
+                ('img', models.ImageField(blank=True, max_length=200, null=True, upload_to='graphics/')),
+                ('ansimg', models.ImageField(blank=True, null=True, upload_to='answer_graphics/')),
+                ('score', models.DecimalField(decimal_places=2, default=1.0, max_digits=5)),
+                ('eta', models.IntegerField(default=1, help_text='Estimated time (in minutes) to answer the question.')),
+                ('directions', models.TextField(blank=True, null=True)),
+                ('reference', models.CharField(blank=True, help_text='Reference text (optional).', max_length=200, null=True)),
+                ('comments', models.TextField(blank=True, null=True)),
+                ('published', models.BooleanField(default=False)),
+                ('chapter', models.PositiveIntegerField(default=0, help_text='Chapter number. Must be non-negative for publisher questions.')),
+                ('section', models.PositiveIntegerField(default=0, help_text='Section number. Default is 0.')),
+                ('answer', models.TextField(blank=True, help_text='Correct answer for types requiring a single answer.', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('author', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('course', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='testapp1.course')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Options',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text', models.TextField(help_text='Answer option text', null=True)),
+                ('image', models.ImageField(blank=True, help_text='Optional image for the option (extra support).', null=True, upload_to='option_images/')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='question_options', to='testapp1.question')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='feedback',
+            name='question',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='feedbacks', to='testapp1.question'),
+        ),
+        migrations.CreateModel(
+            name='DynamicQuestionParameter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('formula', models.TextField(help_text='Formula for generating or validating the answer.')),
+                ('range_min', models.DecimalField(decimal_places=2, help_text='Minimum acceptable value.', max_digits=10)),
+                ('range_max', models.DecimalField(decimal_places=2, help_text='Maximum acceptable value.', max_digits=10)),
+                ('additional_params', models.JSONField(blank=True, help_text='Additional parameters for dynamic generation.', null=True)),
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='dynamic_parameters', to='testapp1.question')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Answers',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text', models.TextField(help_text='Correct answer text', null=True)),
+                ('answer_graphic', models.ImageField(blank=True, null=True, upload_to='answer_graphics/')),
+                ('response_feedback_text', models.TextField(blank=True, null=True)),
+                ('response_feedback_graphic', models.ImageField(blank=True, null=True, upload_to='')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='question_answers', to='testapp1.question')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Template',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Template name.', max_length=200, unique=True)),
+                ('titleFont', models.CharField(default='Arial', max_length=100)),
+                ('titleFontSize', models.IntegerField(default=48)),
+                ('subtitleFont', models.CharField(default='Arial', max_length=100)),
+                ('subtitleFontSize', models.IntegerField(default=24)),
+                ('bodyFont', models.CharField(default='Arial', max_length=100)),
+                ('bodyFontSize', models.IntegerField(default=12)),
+                ('pageNumbersInHeader', models.BooleanField(default=False)),
+                ('pageNumbersInFooter', models.BooleanField(default=False)),
+                ('headerText', models.TextField(blank=True, null=True)),
+                ('footerText', models.TextField(blank=True, null=True)),
+                ('coverPage', models.IntegerField(default=0)),
+                ('partStructure', models.JSONField(blank=True, help_text='JSON representation of the test part structure', null=True)),
+                ('bonusSection', models.BooleanField(default=False)),
+                ('published', models.BooleanField(default=False)),
+                ('course', models.ForeignKey(blank=True, help_text='Course associated with this template (teacher content).', null=True, on_delete=django.db.models.deletion.CASCADE, to='testapp1.course')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Test',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(default='Untitled Test.', help_text='e.g: Quiz 1, Test 1', max_length=200)),
+                ('date', models.DateField(blank=True, null=True)),
+                ('filename', models.CharField(blank=True, help_text='Generated filename for this test.', max_length=200, null=True)),
+                ('is_final', models.BooleanField(default=False, help_text='Mark as True when test is published/finalized.')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('templateIndex', models.PositiveIntegerField(default=0, help_text='Associated Template ID. Default is 0.')),
+                ('attachments', models.ManyToManyField(blank=True, to='testapp1.attachment')),
+                ('course', models.ForeignKey(blank=True, help_text='Course associated with this test (teacher content).', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='tests', to='testapp1.course')),
+                ('template', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='testapp1.template')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='feedback',
+            name='test',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='feedbacks', to='testapp1.test'),
+        ),
+        migrations.CreateModel(
+            name='TestPart',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('part_number', models.IntegerField(default=1, help_text='Part number within the test')),
+                ('test', models.ForeignKey(help_text='Test this part belongs to', on_delete=django.db.models.deletion.CASCADE, related_name='parts', to='testapp1.test')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TestSection',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('section_number', models.IntegerField(default=1, help_text='Section number within the part')),
+                ('question_type', models.CharField(help_text='Type of questions in this section', max_length=50)),
+                ('part', models.ForeignKey(help_text='Part this section belongs to', on_delete=django.db.models.deletion.CASCADE, related_name='sections', to='testapp1.testpart')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Textbook',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=300)),
+                ('author', models.CharField(blank=True, max_length=300, null=True)),
+                ('version', models.CharField(blank=True, max_length=300, null=True)),
+                ('isbn', models.CharField(blank=True, max_length=300, null=True)),
+                ('link', models.URLField(blank=True, null=True)),
+                ('published', models.BooleanField(default=False)),
+                ('publisher', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='test',
+            name='textbook',
+            field=models.ForeignKey(blank=True, help_text='Textbook associated with this test (publisher content).', null=True, on_delete=django.db.models.deletion.CASCADE, to='testapp1.textbook'),
+        ),
+        migrations.AddField(
+            model_name='template',
+            name='textbook',
+            field=models.ForeignKey(blank=True, help_text='Textbook associated with this template (publisher content).', null=True, on_delete=django.db.models.deletion.CASCADE, to='testapp1.textbook'),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='textbook',
+            field=models.ForeignKey(blank=True, help_text='For publisher-created questions, associate with a textbook.', null=True, on_delete=django.db.models.deletion.CASCADE, to='testapp1.textbook'),
+        ),
+        migrations.CreateModel(
+            name='CoverPage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Name of the cover page.', max_length=200)),
+                ('testNum', models.CharField(help_text='Test number displayed on the cover page.', max_length=50)),
+                ('date', models.DateField(help_text='Date of the test.')),
+                ('file', models.CharField(help_text='Filename displayed on the cover page.', max_length=200)),
+                ('showFilename', models.BooleanField(default=False, help_text='Display the filename on the cover page?')),
+                ('blank', models.CharField(choices=[('TL', 'Top Left'), ('TR', 'Top Right'), ('BT', 'Below Title')], default='TL', help_text="Location for the student's name on the cover page.", max_length=20)),
+                ('instructions', models.TextField(blank=True, help_text='Grading instructions for the answer key.', null=True)),
+                ('published', models.BooleanField(default=False)),
+                ('course', models.ForeignKey(blank=True, help_text='Course associated with this cover page (teacher content).', null=True, on_delete=django.db.models.deletion.CASCADE, to='testapp1.course')),
+                ('textbook', models.ForeignKey(blank=True, help_text='Textbook associated with this cover page (publisher content).', null=True, on_delete=django.db.models.deletion.CASCADE, to='testapp1.textbook')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='textbook',
+            field=models.ForeignKey(blank=True, help_text='Textbook associated with this course.', null=True, on_delete=django.db.models.deletion.SET_NULL, to='testapp1.textbook'),
+        ),
+        migrations.AddField(
+            model_name='attachment',
+            name='textbook',
+            field=models.ForeignKey(blank=True, help_text='Textbook associated with this attachment (publisher content).', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='attachment_set', to='testapp1.textbook'),
+        ),
+        migrations.CreateModel(
+            name='UserProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('role', models.CharField(choices=[('webmaster', 'Webmaster'), ('publisher', 'Publisher'), ('teacher', 'Teacher')], max_length=20)),
+                ('user', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TestQuestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('assigned_points', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('order', models.IntegerField(default=1, help_text='Order of question in the test.')),
+                ('randomize', models.BooleanField(default=False)),
+                ('special_instructions', models.TextField(blank=True, null=True)),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='test_appearances', to='testapp1.question')),
+                ('test', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='test_questions', to='testapp1.test')),
+                ('section', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='testapp1.testsection')),
+            ],
+            options={
+                'ordering': ['order'],
+                'unique_together': {('test', 'question')},
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:07
+
+import testapp1.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testapp1', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='answers',
+            name='answer_graphic',
+            field=models.ImageField(blank=True, null=True, storage=testapp1.storage.ContentAddressedStorage(), upload_to='answer_graphics/'),
+        ),
+        migrations.AlterField(
+            model_name='options',
+            name='image',
+            field=models.ImageField(blank=True, help_text='Optional image for the option (extra support).', null=True, storage=testapp1.storage.ContentAddressedStorage(), upload_to='option_images/'),
+        ),
+        migrations.AlterField(
+            model_name='question',
+            name='ansimg',
+            field=models.ImageField(blank=True, null=True, storage=testapp1.storage.ContentAddressedStorage(), upload_to='answer_graphics/'),
+        ),
+        migrations.AlterField(
+            model_name='question',
+            name='img',
+            field=models.ImageField(blank=True, max_length=200, null=True, storage=testapp1.storage.ContentAddressedStorage(), upload_to='graphics/'),
+        ),
+    ]
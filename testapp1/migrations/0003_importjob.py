@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:07
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testapp1', '0002_content_addressed_images'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('upload', models.FileField(blank=True, help_text='The uploaded zip. Removed once the import succeeds.', max_length=300, null=True, upload_to='qti_uploads/')),
+                ('original_filename', models.CharField(max_length=300)),
+                ('upload_size', models.BigIntegerField(default=0, help_text='Size of the uploaded zip in bytes.')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, default='queued', max_length=20)),
+                ('worker', models.CharField(blank=True, help_text='Worker that claimed the job.', max_length=200, null=True)),
+                ('items_processed', models.PositiveIntegerField(default=0)),
+                ('assessments_processed', models.PositiveIntegerField(default=0)),
+                ('current_assessment', models.CharField(blank=True, max_length=300, null=True)),
+                ('result', models.JSONField(blank=True, help_text='Summary returned by the importer.', null=True)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('course', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='testapp1.course')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
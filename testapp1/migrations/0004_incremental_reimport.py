@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testapp1', '0003_importjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='qti_content_hash',
+            field=models.CharField(blank=True, help_text='Hash of the imported item, used to skip unchanged items.', max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='qti_ident',
+            field=models.CharField(blank=True, help_text='QTI item ident.', max_length=200, null=True),
+        ),
+        migrations.AddField(
+            model_name='test',
+            name='qti_content_hash',
+            field=models.CharField(blank=True, help_text='Hash of the imported assessment XML.', max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='test',
+            name='qti_ident',
+            field=models.CharField(blank=True, db_index=True, help_text='QTI assessment ident.', max_length=200, null=True),
+        ),
+    ]
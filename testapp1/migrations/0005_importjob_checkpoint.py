@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testapp1', '0004_incremental_reimport'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='checkpoint',
+            field=models.JSONField(blank=True, default=list, help_text='Idents of the committed assessments.'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:07
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# the textbook of existing feedback is filled in by `manage.py backfill_feedback_textbook`, run after migrating
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testapp1', '0006_exportjob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feedback',
+            name='textbook',
+            field=models.ForeignKey(blank=True, editable=False, help_text='Textbook of the question or test, filled in on save.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='feedbacks', to='testapp1.textbook'),
+        ),
+        migrations.AddIndex(
+            model_name='feedback',
+            index=models.Index(fields=['textbook', 'created_at', 'id'], name='feedback_textbook_created'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:07
+
+from django.db import migrations, models
+
+# the rating totals of existing rows are filled in by `manage.py reconcile_ratings`, run after migrating
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testapp1', '0007_feedback_textbook'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Number of rated feedbacks.'),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Sum of their ratings.'),
+        ),
+        migrations.AddField(
+            model_name='test',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Number of rated feedbacks.'),
+        ),
+        migrations.AddField(
+            model_name='test',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Sum of their ratings.'),
+        ),
+        migrations.AddField(
+            model_name='textbook',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Number of rated feedbacks.'),
+        ),
+        migrations.AddField(
+            model_name='textbook',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Sum of their ratings.'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testapp1', '0008_rating_totals'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='course',
+            name='course_id',
+            field=models.CharField(db_index=True, default='CS499', help_text='e.g: CS499', max_length=50),
+        ),
+        migrations.AddIndex(
+            model_name='feedback',
+            index=models.Index(fields=['question', 'created_at'], name='feedback_question_created'),
+        ),
+        migrations.AddIndex(
+            model_name='feedback',
+            index=models.Index(fields=['test', 'created_at'], name='feedback_test_created'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['textbook', 'chapter', 'section', 'qtype', 'published'], name='question_textbook_browse'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['course', 'published'], name='question_course_published'),
+        ),
+        migrations.AddIndex(
+            model_name='testquestion',
+            index=models.Index(fields=['test', 'order'], name='testquestion_test_order'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+SQLITE_FULL_TEXT_INDEX = [
+    # an FTS5 table over the search text, kept in step with it by triggers
+    "CREATE VIRTUAL TABLE testapp1_questionsearchtext_fts USING fts5("
+    "text, content='testapp1_questionsearchtext', content_rowid='question_id', tokenize='porter unicode61')",
+    "CREATE TRIGGER testapp1_questionsearchtext_ai AFTER INSERT ON testapp1_questionsearchtext BEGIN "
+    "INSERT INTO testapp1_questionsearchtext_fts(rowid, text) VALUES (new.question_id, new.text); END",
+    "CREATE TRIGGER testapp1_questionsearchtext_ad AFTER DELETE ON testapp1_questionsearchtext BEGIN "
+    "INSERT INTO testapp1_questionsearchtext_fts(testapp1_questionsearchtext_fts, rowid, text) "
+    "VALUES ('delete', old.question_id, old.text); END",
+    "CREATE TRIGGER testapp1_questionsearchtext_au AFTER UPDATE ON testapp1_questionsearchtext BEGIN "
+    "INSERT INTO testapp1_questionsearchtext_fts(testapp1_questionsearchtext_fts, rowid, text) "
+    "VALUES ('delete', old.question_id, old.text); "
+    "INSERT INTO testapp1_questionsearchtext_fts(rowid, text) VALUES (new.question_id, new.text); END",
+]
+SQLITE_DROP_FULL_TEXT_INDEX = [
+    "DROP TRIGGER IF EXISTS testapp1_questionsearchtext_ai",
+    "DROP TRIGGER IF EXISTS testapp1_questionsearchtext_ad",
+    "DROP TRIGGER IF EXISTS testapp1_questionsearchtext_au",
+    "DROP TABLE IF EXISTS testapp1_questionsearchtext_fts",
+]
+MYSQL_FULL_TEXT_INDEX = ["CREATE FULLTEXT INDEX questionsearchtext_fulltext ON testapp1_questionsearchtext (text)"]
+MYSQL_DROP_FULL_TEXT_INDEX = ["DROP INDEX questionsearchtext_fulltext ON testapp1_questionsearchtext"]
+
+
+def run_for_vendor(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testapp1', '0009_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionSearchText',
+            fields=[
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_text', serialize=False, to='testapp1.question')),
+                ('text', models.TextField(blank=True)),
+            ],
+        ),
+        migrations.RunPython(
+            run_for_vendor({'sqlite': SQLITE_FULL_TEXT_INDEX, 'mysql': MYSQL_FULL_TEXT_INDEX}),
+            run_for_vendor({'sqlite': SQLITE_DROP_FULL_TEXT_INDEX, 'mysql': MYSQL_DROP_FULL_TEXT_INDEX}),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testapp1', '0010_question_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionSignature',
+            fields=[
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='signature', serialize=False, to='testapp1.question')),
+                ('scope', models.CharField(help_text='Textbook or course the question is compared within.', max_length=40)),
+                ('minhash', models.BinaryField()),
+                ('similarity', models.FloatField(blank=True, null=True)),
+                ('duplicate_of', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='near_duplicates', to='testapp1.question')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='QuestionLshBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=40)),
+                ('bucket', models.BigIntegerField(help_text="Hash of the band number and the band's MinHash values.")),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lsh_buckets', to='testapp1.question')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['scope', 'bucket'], name='lshbucket_scope_bucket')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testapp1', '0011_question_signatures'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='import_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=40, null=True),
+        ),
+        migrations.AddField(
+            model_name='test',
+            name='import_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=40, null=True),
+        ),
+        migrations.AddField(
+            model_name='testpart',
+            name='import_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=40, null=True),
+        ),
+        migrations.AddField(
+            model_name='testsection',
+            name='import_key',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=40, null=True),
+        ),
+    ]
@@ -0,0 +1,19 @@
+from django.db import migrations
+
+# bulk imports used to leave their import_key on the rows they inserted on MySQL; they clear it now
+
+
+def clear_import_keys(apps, schema_editor):
+    for model_name in ('Test', 'TestPart', 'TestSection', 'Question'):
+        apps.get_model('testapp1', model_name).objects.exclude(import_key=None).update(import_key=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('testapp1', '0013_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_import_keys, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,107 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User  # Standard Django user model.
 from django.core.exceptions import ValidationError
 from django.conf import settings
-from django.db.models import Q, Avg
+from django.db.models import Q, Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .storage import content_addressed_storage
+
+"""
+CHANGE TRACKING QUERYSET
+QuerySet.update() (and bulk_update(), which uses it) skips save(), and with it the auto_now
+updated_at field. This one sets updated_at too, so rows changed in bulk look changed as well,
+e.g. to the export cache (testapp1/utils/export_cache.py), which works out whether an export
+is still current from the latest updated_at of every table in it.
+That includes the rating totals (RatedModel), so a new rating is a change of the rated question,
+test and textbook: the totals are exported columns, and an export cached before the rating
+would show the old ones.
+"""
+
+
+class ChangeTrackingQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        for field in self.model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False) and field.name not in kwargs and field.attname not in kwargs:
+                kwargs[field.name] = timezone.now()
+        return super().update(**kwargs)
+
+
+"""
+RATED MODEL
+Base for the models feedback can rate (textbooks, questions and tests).
+Keeps the number and the sum of the ratings on the row, so the average rating can be read
+straight from a list query without aggregating the feedback table. The totals are updated
+in the same transaction as every feedback that is saved or deleted.
+"""
+
+
+class RatedModel(models.Model):
+    rating_count = models.PositiveIntegerField(default=0, editable=False, help_text="Number of rated feedbacks.")
+    rating_sum = models.PositiveIntegerField(default=0, editable=False, help_text="Sum of their ratings.")
+
+    class Meta:
+        abstract = True
+
+    @property
+    def average_rating(self):
+        if not self.rating_count:
+            return None
+        return self.rating_sum / self.rating_count
+
+    @classmethod
+    def recompute_ratings(cls, queryset=None):
+        """
+        Counts the ratings of the given rows (all of them by default) again from the feedback table,
+        in one UPDATE. Returns the number of rows updated.
+        """
+        rated_field = cls._meta.model_name  # the Feedback foreign key pointing at this model
+        ratings = Feedback.objects.filter(**{rated_field: OuterRef('pk')}, rating__isnull=False) \
+            .order_by().values(rated_field)
+        if queryset is None:
+            queryset = cls.objects.all()
+        return queryset.update(
+            rating_count=Coalesce(Subquery(ratings.annotate(total=Count('pk')).values('total')), 0),
+            rating_sum=Coalesce(Subquery(ratings.annotate(total=Sum('rating')).values('total')), 0)
+        )
+
+
+"""
+TEXTBOOK FIELDS MIXIN
+For the models the textbook of feedback is worked out from (courses, questions and tests).
+Remembers their textbook_fields as they were loaded or last saved, so save() only works out
+the textbook of their feedback again when one of those foreign keys actually changed.
+"""
+
+
+class TextbookFieldsMixin:
+    textbook_fields = ()  # attnames, e.g. 'textbook_id'
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_textbook_fields()
+        return instance
+
+    def remember_textbook_fields(self):
+        # __dict__, so deferred fields aren't loaded just for this
+        self._saved_textbook_fields = {name: self.__dict__[name] for name in self.textbook_fields
+                                       if name in self.__dict__}
+
+    def textbook_fields_changed(self, update_fields=None):
+        saved = getattr(self, '_saved_textbook_fields', {})
+        for name in self.textbook_fields:
+            if update_fields is not None and not {name, name.removesuffix('_id')} & set(update_fields):
+                continue
+            if name not in self.__dict__:
+                continue  # deferred and never set, so unchanged
+            if name not in saved or saved[name] != self.__dict__[name]:
+                return True
+        return False
+
 
 """
 TEXTBOOK MODEL
@@ -11,7 +110,7 @@ and is referenced by teacher courses.
 """
 
 
-class Textbook(models.Model):
+class Textbook(RatedModel):
     title = models.CharField(max_length=300)
     author = models.CharField(max_length=300, blank=True, null=True)
     version = models.CharField(max_length=300, blank=True, null=True)
@@ -24,22 +123,33 @@ class Textbook(models.Model):
         blank=True
     )
     published = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ChangeTrackingQuerySet.as_manager()
 
     def __str__(self):
         return self.title
 
-    def get_feedback(self):
+    def get_feedback(self, after=None, limit=None):
         """
-        Retrieve all feedback related to this textbook.
+        Retrieve feedback related to this textbook, newest first.
         Feedback sources include:
           - Questions directly linked to this textbook.
           - Tests belonging to courses using this textbook.
           - Tests directly created for this textbook.
+        Each feedback records its textbook when it is saved (Feedback.textbook), so this reads a single
+        index range. For pages of feedback, pass limit, and the last feedback of the previous page as after.
         """
         from .models import Feedback  # Local import to avoid circular dependency.
-        return Feedback.objects.filter(
-            Q(question__textbook=self) | Q(test__course__textbook=self) | Q(test__textbook=self)
-        ).distinct()
+        feedback = Feedback.objects.filter(textbook=self).order_by('-created_at', '-id')
+        if after is not None:
+            # keyset pagination: continue right after the given feedback instead of counting an OFFSET
+            feedback = feedback.filter(
+                Q(created_at__lt=after.created_at) | Q(created_at=after.created_at, id__lt=after.id)
+            )
+        if limit is not None:
+            feedback = feedback[:limit]
+        return feedback
 
 
 """
@@ -74,7 +184,7 @@ Each course is linked to a textbook and may have multiple teacher users.
 """
 
 
-class Course(models.Model):
+class Course(TextbookFieldsMixin, models.Model):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -84,7 +194,8 @@ class Course(models.Model):
     course_id = models.CharField(
         max_length=50,
         help_text='e.g: CS499',
-        default='CS499'
+        default='CS499',
+        db_index=True  # every upload looks its course up by course_id
     )
     name = models.CharField(
         max_length=250,
@@ -116,10 +227,23 @@ class Course(models.Model):
         limit_choices_to={'userprofile__role': 'teacher'}
     )
     published = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ChangeTrackingQuerySet.as_manager()
 
     def __str__(self):
         return f"{self.course_id} - {self.name}"
 
+    textbook_fields = ('textbook_id',)
+
+    def save(self, *args, **kwargs):
+        textbook_changed = not self._state.adding and self.textbook_fields_changed(kwargs.get('update_fields'))
+        super().save(*args, **kwargs)
+        if textbook_changed:
+            # feedback on the course's tests belongs to the course's textbook
+            Feedback.refresh_textbooks(Feedback.objects.filter(test__course=self))
+        self.remember_textbook_fields()
+
     def get_publisher_questions(self):
         """
         Returns publisher-created questions for this course by matching the course's textbook.
@@ -154,7 +278,7 @@ For teacher-created questions, link via the 'course' field.
 """
 
 
-class Question(models.Model):
+class Question(TextbookFieldsMixin, RatedModel):
     question_type_options = [
         ('tf', 'True/False'),
         ('mc', 'Multiple Choice'),
@@ -184,8 +308,11 @@ class Question(models.Model):
     text = models.TextField(help_text='Question prompt.', default='Question text.', null=True)
 
     # Common fields for visual elements and grading.
-    img = models.ImageField(upload_to='graphics/', max_length=200, null=True, blank=True)  # Embedded graphic.
-    ansimg = models.ImageField(upload_to='answer_graphics/', null=True, blank=True)  # Answer graphic.
+    # Imported graphics are stored content-addressed, so identical images are kept on disk once.
+    img = models.ImageField(upload_to='graphics/', max_length=200, null=True, blank=True,
+                            storage=content_addressed_storage)  # Embedded graphic.
+    ansimg = models.ImageField(upload_to='answer_graphics/', null=True, blank=True,
+                               storage=content_addressed_storage)  # Answer graphic.
     score = models.DecimalField(max_digits=5, decimal_places=2, default=1.0)
     eta = models.IntegerField(default=1, help_text='Estimated time (in minutes) to answer the question.')
     directions = models.TextField(null=True, blank=True)
@@ -205,6 +332,23 @@ class Question(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ChangeTrackingQuerySet.as_manager()
+
+    # Set for questions imported from QTI, so a re-import can update the question in place.
+    qti_ident = models.CharField(max_length=200, null=True, blank=True, help_text="QTI item ident.")
+    qti_content_hash = models.CharField(max_length=64, null=True, blank=True,
+                                        help_text="Hash of the imported item, used to skip unchanged items.")
+    import_key = models.CharField(max_length=40, null=True, blank=True, editable=False, db_index=True)
+
+    class Meta:
+        # the filters the question bank is browsed by. the query plans are checked in tests.py.
+        # published comes last: Django filters on it as "WHERE published", which an index can't seek on
+        indexes = [
+            models.Index(fields=['textbook', 'chapter', 'section', 'qtype', 'published'],
+                         name='question_textbook_browse'),
+            models.Index(fields=['course', 'published'], name='question_course_published'),
+        ]
+
     def clean(self):
         """
         Custom validation:
@@ -218,15 +362,27 @@ class Question(models.Model):
     def __str__(self):
         return f"[{self.get_qtype_display()}] {self.text[:50]}"
 
+    textbook_fields = ('textbook_id',)
+
+    def save(self, *args, **kwargs):
+        from .utils.question_search import reindex_on_commit  # Local import to avoid circular dependency.
+        textbook_changed = not self._state.adding and self.textbook_fields_changed(kwargs.get('update_fields'))
+        super().save(*args, **kwargs)
+        if textbook_changed:
+            Feedback.refresh_textbooks(self.feedbacks.all())
+        self.remember_textbook_fields()
+        reindex_on_commit([self.pk])
+
     @property
     def publisher_average_rating(self):
         """
         Returns the average rating for a publisher-created question.
         Teachers can use this property to assess aggregated feedback.
+        The average is kept on the question; when listing questions, use
+        select_related('author__userprofile') so checking the author doesn't take queries either.
         """
         if self.author and hasattr(self.author, 'userprofile') and self.author.userprofile.role == 'publisher':
-            avg = self.feedbacks.aggregate(Avg('rating'))['rating__avg']
-            return avg
+            return self.average_rating
         return None
 
 
@@ -244,12 +400,27 @@ class Options(models.Model):
         related_name="question_options"
     )
     text = models.TextField(help_text="Answer option text", null=True)
-    image = models.ImageField(upload_to='option_images/', null=True, blank=True,
+    image = models.ImageField(upload_to='option_images/', null=True, blank=True, storage=content_addressed_storage,
                               help_text="Optional image for the option (extra support).")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ChangeTrackingQuerySet.as_manager()
 
     def __str__(self):
         return self.text or "Option"
 
+    def save(self, *args, **kwargs):
+        from .utils.question_search import reindex_on_commit
+        super().save(*args, **kwargs)
+        reindex_on_commit([self.question_id])  # the options are part of the question's search text
+
+    def delete(self, *args, **kwargs):
+        from .utils.question_search import reindex_on_commit
+        question_id = self.question_id
+        result = super().delete(*args, **kwargs)
+        reindex_on_commit([question_id])
+        return result
+
 
 """
 ANSWERS MODEL
@@ -267,13 +438,29 @@ class Answers(models.Model):
         related_name="question_answers"
     )
     text = models.TextField(help_text="Correct answer text", null=True)
-    answer_graphic = models.ImageField(upload_to='answer_graphics/', null=True, blank=True)
+    answer_graphic = models.ImageField(upload_to='answer_graphics/', null=True, blank=True,
+                                       storage=content_addressed_storage)
     response_feedback_text = models.TextField(null=True, blank=True)
     response_feedback_graphic = models.ImageField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ChangeTrackingQuerySet.as_manager()
 
     def __str__(self):
         return self.text or "Answer"
 
+    def save(self, *args, **kwargs):
+        from .utils.question_search import reindex_on_commit
+        super().save(*args, **kwargs)
+        reindex_on_commit([self.question_id])  # the answers are part of the question's search text
+
+    def delete(self, *args, **kwargs):
+        from .utils.question_search import reindex_on_commit
+        question_id = self.question_id
+        result = super().delete(*args, **kwargs)
+        reindex_on_commit([question_id])
+        return result
+
 
 """
 DYNAMIC QUESTION PARAMETER MODEL
@@ -296,11 +483,89 @@ class DynamicQuestionParameter(models.Model):
         blank=True,
         help_text="Additional parameters for dynamic generation."
     )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ChangeTrackingQuerySet.as_manager()
 
     def __str__(self):
         return f"Dynamic Params for QID {self.question.id}"
 
 
+"""
+QUESTION SEARCH TEXT MODEL
+Plain text of a question (prompt, answer, options and answers, without HTML) for full-text search.
+Maintained by testapp1/utils/question_search.py; the full-text index on it is created by migration
+0010_question_search.
+"""
+
+
+class QuestionSearchText(models.Model):
+    question = models.OneToOneField(
+        Question,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="search_text"
+    )
+    text = models.TextField(blank=True)
+
+    def __str__(self):
+        return f"Search text for QID {self.question_id}"
+
+
+"""
+QUESTION SIGNATURE MODEL
+MinHash signature of a question's plain text, used to find near-duplicate questions (the same prompt
+with different whitespace, HTML or image URLs). A question that nearly duplicates an older one in the
+same textbook (or course, for courses without a textbook) is linked to it with duplicate_of.
+Maintained by testapp1/utils/question_dedup.py.
+"""
+
+
+class QuestionSignature(models.Model):
+    question = models.OneToOneField(
+        Question,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="signature"
+    )
+    scope = models.CharField(max_length=40, help_text="Textbook or course the question is compared within.")
+    minhash = models.BinaryField()
+    # the oldest question of the cluster this question nearly duplicates, with their estimated similarity
+    duplicate_of = models.ForeignKey(
+        Question,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="near_duplicates"
+    )
+    similarity = models.FloatField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Signature for QID {self.question_id}"
+
+
+"""
+QUESTION LSH BUCKET MODEL
+One row per band of a question's signature (locality-sensitive hashing). Questions sharing a bucket
+within a scope are the only candidates compared, so finding the duplicates of a question doesn't
+scan the whole bank.
+"""
+
+
+class QuestionLshBucket(models.Model):
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name="lsh_buckets")
+    scope = models.CharField(max_length=40)
+    bucket = models.BigIntegerField(help_text="Hash of the band number and the band's MinHash values.")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['scope', 'bucket'], name='lshbucket_scope_bucket'),
+        ]
+
+    def __str__(self):
+        return f"Bucket {self.bucket} for QID {self.question_id}"
+
+
 """
 TEMPLATE MODEL
 Stores templates for test formatting.
@@ -429,7 +694,7 @@ Includes title, date, finalization status, and instructions.
 """
 
 
-class Test(models.Model):
+class Test(TextbookFieldsMixin, RatedModel):
     course = models.ForeignKey(
         Course,
         on_delete=models.CASCADE,
@@ -458,8 +723,17 @@ class Test(models.Model):
     attachments = models.ManyToManyField(Attachment, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ChangeTrackingQuerySet.as_manager()
     templateIndex = models.PositiveIntegerField(default=0, help_text="Associated Template ID. Default is 0.")
 
+    # Set for tests imported from QTI, so re-importing the same export skips or updates this test.
+    qti_ident = models.CharField(max_length=200, null=True, blank=True, db_index=True,
+                                 help_text="QTI assessment ident.")
+    qti_content_hash = models.CharField(max_length=64, null=True, blank=True,
+                                        help_text="Hash of the imported assessment XML.")
+    import_key = models.CharField(max_length=40, null=True, blank=True, editable=False, db_index=True)
+
     def __str__(self):
         if self.course:
             return f"{self.name} - {self.course.course_id}"
@@ -467,6 +741,15 @@ class Test(models.Model):
             return f"{self.name} - {self.textbook.title}"
         return self.name
 
+    textbook_fields = ('textbook_id', 'course_id')
+
+    def save(self, *args, **kwargs):
+        textbook_changed = not self._state.adding and self.textbook_fields_changed(kwargs.get('update_fields'))
+        super().save(*args, **kwargs)
+        if textbook_changed:
+            Feedback.refresh_textbooks(self.feedbacks.all())
+        self.remember_textbook_fields()
+
 
 """
 TEST PART MODEL
@@ -482,6 +765,10 @@ class TestPart(models.Model):
         help_text="Test this part belongs to"
     )
     part_number = models.IntegerField(default=1, help_text="Part number within the test")
+    updated_at = models.DateTimeField(auto_now=True)
+    import_key = models.CharField(max_length=40, null=True, blank=True, editable=False, db_index=True)
+
+    objects = ChangeTrackingQuerySet.as_manager()
 
     def __str__(self):
         return f"Part {self.part_number} of {self.test.name}"
@@ -502,6 +789,10 @@ class TestSection(models.Model):
     )
     section_number = models.IntegerField(default=1, help_text="Section number within the part")
     question_type = models.CharField(max_length=50, help_text="Type of questions in this section")
+    updated_at = models.DateTimeField(auto_now=True)
+    import_key = models.CharField(max_length=40, null=True, blank=True, editable=False, db_index=True)
+
+    objects = ChangeTrackingQuerySet.as_manager()
 
     def __str__(self):
         return f"Section {self.section_number} in Part {self.part.part_number} of {self.part.test.name}"
@@ -530,10 +821,16 @@ class TestQuestion(models.Model):
     randomize = models.BooleanField(default=False)
     special_instructions = models.TextField(null=True, blank=True)
     section = models.ForeignKey(TestSection, on_delete=models.CASCADE, null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ChangeTrackingQuerySet.as_manager()
 
     class Meta:
         unique_together = ('test', 'question')
         ordering = ['order']
+        indexes = [
+            models.Index(fields=['test', 'order'], name='testquestion_test_order'),  # a test's questions, in order
+        ]
 
     def __str__(self):
         return f"Q{self.order} in {self.test.name}"
@@ -566,6 +863,91 @@ class Feedback(models.Model):
     averageScore = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
     comments = models.TextField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # The textbook the feedback is about, worked out from the question or test when the feedback is saved
+    # (and kept up to date when they change), so Textbook.get_feedback() doesn't have to join them.
+    textbook = models.ForeignKey(
+        Textbook,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name="feedbacks",
+        help_text="Textbook of the question or test, filled in on save."
+    )
+
+    objects = ChangeTrackingQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['textbook', 'created_at', 'id'], name='feedback_textbook_created'),
+            models.Index(fields=['question', 'created_at'], name='feedback_question_created'),
+            models.Index(fields=['test', 'created_at'], name='feedback_test_created'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.textbook_id = self.owning_textbook_id()
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'textbook'}
+        # the rating totals of the question, test and textbook change in the same transaction
+        with transaction.atomic():
+            if not self._state.adding:
+                previous = Feedback.objects.select_for_update().filter(pk=self.pk) \
+                    .values('question_id', 'test_id', 'textbook_id', 'rating').first()
+                if previous is not None:
+                    Feedback.add_to_ratings(previous, -1)
+            super().save(*args, **kwargs)
+            Feedback.add_to_ratings({'question_id': self.question_id, 'test_id': self.test_id,
+                                     'textbook_id': self.textbook_id, 'rating': self.rating}, 1)
+
+    @staticmethod
+    def add_to_ratings(feedback_values, sign):
+        """
+        Adds a feedback's rating to (sign=1) or takes it off (sign=-1) the totals of its question,
+        test and textbook. feedback_values holds question_id, test_id, textbook_id and rating.
+        This sets their updated_at as well (see ChangeTrackingQuerySet), so cached exports of them are rebuilt.
+        """
+        rating = feedback_values['rating']
+        if rating is None:
+            return
+        for model, field_name in ((Question, 'question_id'), (Test, 'test_id'), (Textbook, 'textbook_id')):
+            if feedback_values[field_name] is not None:
+                model.objects.filter(pk=feedback_values[field_name]).update(
+                    rating_count=F('rating_count') + sign,
+                    rating_sum=F('rating_sum') + sign * rating
+                )
+
+    def owning_textbook_id(self):
+        """
+        The question's textbook, or else the test's textbook, or else the textbook of the test's course.
+        """
+        if self.question_id is not None and self.question.textbook_id is not None:
+            return self.question.textbook_id
+        if self.test_id is not None:
+            if self.test.textbook_id is not None:
+                return self.test.textbook_id
+            if self.test.course_id is not None:
+                return self.test.course.textbook_id
+        return None
+
+    @staticmethod
+    def refresh_textbooks(feedback):
+        """
+        Works out the textbook of every feedback in the queryset again, in one UPDATE, the same way
+        owning_textbook_id() does. Returns the number of rows updated.
+        """
+        question_textbook = Question.objects.filter(pk=OuterRef('question_id')).values('textbook_id')[:1]
+        test_textbook = Test.objects.filter(pk=OuterRef('test_id')).values('textbook_id')[:1]
+        course_textbook = Test.objects.filter(pk=OuterRef('test_id')).values('course__textbook_id')[:1]
+        textbook_ids = set(feedback.exclude(rating=None).values_list('textbook_id', flat=True))
+        updated = feedback.update(textbook=Coalesce(Subquery(question_textbook), Subquery(test_textbook),
+                                                    Subquery(course_textbook)))
+        if textbook_ids:
+            # ratings that moved to another textbook are counted again on both
+            textbook_ids |= set(feedback.exclude(rating=None).values_list('textbook_id', flat=True))
+            Textbook.recompute_ratings(Textbook.objects.filter(pk__in=textbook_ids - {None}))
+        return updated
 
     def __str__(self):
         if self.question:
@@ -575,6 +957,16 @@ class Feedback(models.Model):
         return "General Feedback"
 
 
+@receiver(post_delete, sender=Feedback)
+def remove_deleted_rating(sender, instance, **kwargs):
+    """
+    Takes a deleted feedback's rating off the totals, also when it's deleted along with its question or test.
+    Runs inside the transaction of the delete.
+    """
+    Feedback.add_to_ratings({'question_id': instance.question_id, 'test_id': instance.test_id,
+                             'textbook_id': instance.textbook_id, 'rating': instance.rating}, -1)
+
+
 """
 RESPONSE MODEL
 Stores responses to feedback
@@ -595,4 +987,105 @@ class FeedbackResponse(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return "Response to feedback"
\ No newline at end of file
+        return "Response to feedback"
+
+"""
+IMPORT JOB MODEL
+Tracks a QTI zip upload that is imported in the background.
+The upload is stored on disk, the job waits in the queue until a worker claims it,
+and the worker records progress, the result and any error on the row.
+"""
+
+
+class ImportJob(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+    upload = models.FileField(upload_to='qti_uploads/', max_length=300, null=True, blank=True,
+                              help_text="The uploaded zip. Removed once the import succeeds.")
+    original_filename = models.CharField(max_length=300)
+    upload_size = models.BigIntegerField(default=0, help_text="Size of the uploaded zip in bytes.")
+    course = models.ForeignKey(Course, on_delete=models.SET_NULL, null=True, blank=True)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED, db_index=True)
+    worker = models.CharField(max_length=200, null=True, blank=True, help_text="Worker that claimed the job.")
+
+    # Progress, updated by the worker while the import runs.
+    items_processed = models.PositiveIntegerField(default=0)
+    assessments_processed = models.PositiveIntegerField(default=0)
+    current_assessment = models.CharField(max_length=300, null=True, blank=True)
+
+    # Idents of the assessments already committed. A retried job skips them and carries on from there.
+    checkpoint = models.JSONField(default=list, blank=True, help_text="Idents of the committed assessments.")
+
+    result = models.JSONField(null=True, blank=True, help_text="Summary returned by the importer.")
+    error = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Import of {self.original_filename} ({self.status})"
+
+    @property
+    def elapsed_seconds(self):
+        """
+        Seconds the job has been running (or ran for, once finished). None until a worker claims it.
+        """
+        if self.started_at is None:
+            return None
+        end = self.finished_at or timezone.now()
+        return round((end - self.started_at).total_seconds(), 3)
+
+
+"""
+EXPORT JOB MODEL
+Tracks an export of the entire database that runs in the background.
+The worker dumps every table to its own file, packs them into one zip archive
+and records the archive (and how many rows each table had) on the row.
+"""
+
+
+class ExportJob(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED, db_index=True)
+    archive = models.FileField(upload_to='exports/', max_length=300, null=True, blank=True,
+                               help_text="Zip with one file per table. Set once the export is done.")
+
+    # {table name: {"rows": number of rows exported, "high_water_mark": highest primary key exported}}
+    tables = models.JSONField(default=dict, blank=True, help_text="Rows exported from each table.")
+
+    error = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Export {self.pk} ({self.status})"
+
+    @property
+    def elapsed_seconds(self):
+        """
+        Seconds the export has been running (or ran for, once finished). None until it starts.
+        """
+        if self.started_at is None:
+            return None
+        end = self.finished_at or timezone.now()
+        return round((end - self.started_at).total_seconds(), 3)
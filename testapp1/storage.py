@@ -0,0 +1,73 @@
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+# every content-addressed file lives under this folder of MEDIA_ROOT, whichever field it belongs to
+BLOB_DIR = "blobs"
+BLOB_NAME_PATTERN = re.compile(rf"^{BLOB_DIR}/[0-9a-f]{{2}}/[0-9a-f]{{64}}(\.\w+)?$")
+
+
+def blob_name(digest, extension):
+    """
+    Returns the storage name for a file with the given SHA-256 hex digest, e.g. "blobs/3f/3f1c...e9.png".
+    """
+    return f"{BLOB_DIR}/{digest[:2]}/{digest}{extension.lower()}"
+
+
+def is_blob_name(name):
+    return bool(name) and BLOB_NAME_PATTERN.match(name) is not None
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage that names every file after the SHA-256 of its contents.
+
+    The content is hashed while it is streamed to a temporary file, so the file never has to
+    be held in memory. If a file with the same contents was stored before, the new copy is
+    discarded and the existing name is returned, so byte-identical images are kept on disk once
+    and shared by every row that uses them. The name passed to save() only supplies the file
+    extension; upload_to folders are not used.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # the final name is chosen from the content in _save(), so there's nothing to check here
+        return name
+
+    def _save(self, name, content):
+        extension = posixpath.splitext(name)[1]
+        blob_directory = self.path(BLOB_DIR)
+        os.makedirs(blob_directory, exist_ok=True)
+
+        digest = hashlib.sha256()
+        file_handle, temp_path = tempfile.mkstemp(dir=blob_directory, suffix=".part")
+        try:
+            with os.fdopen(file_handle, "wb") as temp_file:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    temp_file.write(chunk)
+
+            final_name = blob_name(digest.hexdigest(), extension)
+            final_path = self.path(final_name)
+            if os.path.exists(final_path):
+                os.remove(temp_path)  # already stored, keep the existing copy
+            else:
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                # a rename is atomic, so another process never sees a half-written file
+                os.replace(temp_path, final_path)
+                if self.file_permissions_mode is not None:
+                    os.chmod(final_path, self.file_permissions_mode)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        return final_name
+
+
+content_addressed_storage = ContentAddressedStorage()
@@ -1,3 +1,1129 @@
-from django.test import TestCase
+import csv
+import datetime
+import gzip
+import io
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import tracemalloc
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from unittest import mock
+from xml.etree import ElementTree
 
-# Create your tests here.
+import openpyxl
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from testapp1.models import (Answers, Course, DynamicQuestionParameter, ExportJob, Feedback, ImportJob, Options,
+                             Question, QuestionSearchText, QuestionSignature, Test, TestPart, TestQuestion,
+                             TestSection, Textbook, UserProfile)
+from testapp1.storage import ContentAddressedStorage, is_blob_name
+from testapp1.utils.export_cache import data_version
+from testapp1.utils.export_closure import export_closure
+from testapp1.utils.export_query import iter_queryset
+from testapp1.utils.full_export import run_export_job
+from testapp1.utils.html_assets import html_to_text, rewrite_images
+from testapp1.utils.import_benchmark import compare
+from testapp1.utils.import_jobs import (claim_next_job, course_lock_name, named_lock, process_locks, retry_import_job,
+                                        run_import_job)
+from testapp1.utils.import_metrics import ImportMetrics
+from testapp1.utils.qti_bulk import BulkImportWriter
+from testapp1.utils.qti_corpus import write_corpus_zip
+from testapp1.utils.qti_handlers import QUESTION_HANDLERS
+from testapp1.utils.qti_manifest import ZipManifest
+from testapp1.utils.qti_records import ItemRecord
+from testapp1.utils.qti_stream import QtiItemStream, read_description
+from testapp1.utils.qti_to_db import QtiImporter
+from testapp1.utils.question_dedup import link_duplicates
+from testapp1.utils.question_search import index_questions, search_questions
+from testapp1.utils.zip_limits import ZipLimitError, check_zip_limits
+
+# a Canvas export of one quiz with every question type, kept at the top of the repository
+SAMPLE_ZIP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                          "qti sample w one quiz-slash-test w all typesofquestions.zip")
+
+"""
+Query-plan regression tests. Each of the queries below is one of the hot access paths the indexes in
+models.py were added for. The tests seed a small question bank, run EXPLAIN on every query and fail if
+the plan no longer names the index the query is supposed to use, e.g. after a model or query change.
+"""
+
+# name, function returning the queryset to explain, text the plan must contain (the index name)
+QUERY_PLANS = [
+    (
+        "publisher questions of a textbook chapter",
+        lambda data: Question.objects.filter(textbook=data["textbook"], author__userprofile__role='publisher',
+                                             published=True, chapter=2, section=1, qtype='mc'),
+        "question_textbook_browse",
+    ),
+    (
+        "published questions of a course",
+        lambda data: Question.objects.filter(course=data["course"], published=True),
+        "question_course_published",
+    ),
+    (
+        "questions of a test in order",
+        lambda data: TestQuestion.objects.filter(test=data["test"]).order_by('order'),
+        "testquestion_test_order",
+    ),
+    (
+        "feedback on a question, newest first",
+        lambda data: Feedback.objects.filter(question=data["question"]).order_by('-created_at'),
+        "feedback_question_created",
+    ),
+    (
+        "feedback on a test, newest first",
+        lambda data: Feedback.objects.filter(test=data["test"]).order_by('-created_at'),
+        "feedback_test_created",
+    ),
+    (
+        "feedback on a textbook, one page",
+        lambda data: data["textbook"].get_feedback(after=data["feedback"], limit=20),
+        "feedback_textbook_created",
+    ),
+    (
+        "course by course_id",
+        lambda data: Course.objects.filter(course_id="CS499-7"),
+        "course_course_id",
+    ),
+]
+
+
+class QueryPlanTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        publisher = User.objects.create(username="publisher")
+        UserProfile.objects.create(user=publisher, role='publisher')
+        textbooks = Textbook.objects.bulk_create(
+            [Textbook(title=f"Textbook {number}", publisher=publisher) for number in range(5)]
+        )
+        courses = Course.objects.bulk_create(
+            [Course(course_id=f"CS499-{number}", textbook=textbooks[number % 5]) for number in range(20)]
+        )
+        questions = Question.objects.bulk_create([
+            Question(
+                textbook=textbooks[number % 5] if number % 2 else None,
+                course=None if number % 2 else courses[number % 20],
+                qtype=['mc', 'tf', 'essay_question'][number % 3],
+                text=f"Question {number}",
+                chapter=number % 10,
+                section=number % 4,
+                published=bool(number % 3),
+                author=publisher
+            )
+            for number in range(1000)
+        ])
+        tests = Test.objects.bulk_create([Test(course=courses[number % 20], name=f"Test {number}")
+                                          for number in range(50)])
+        TestQuestion.objects.bulk_create([
+            TestQuestion(test=tests[number % 50], question=questions[number], order=number // 50)
+            for number in range(1000)
+        ])
+        for number in range(200):
+            Feedback.objects.create(question=questions[number * 5 + 1] if number % 2 else None,
+                                    test=None if number % 2 else tests[number % 50], rating=number % 5 + 1)
+        cls.data = {
+            "textbook": textbooks[1],
+            "course": courses[2],
+            "test": tests[3],
+            "question": questions[11],
+            "feedback": Feedback.objects.filter(textbook=textbooks[1]).order_by('-created_at', '-id')[5],
+        }
+
+    def test_queries_use_their_indexes(self):
+        for name, make_queryset, expected_index in QUERY_PLANS:
+            with self.subTest(name):
+                plan = make_queryset(self.data).explain()
+                self.assertIn(expected_index, plan, f"{name} no longer uses {expected_index}:\n{plan}")
+
+
+class QuestionSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        textbook = Textbook.objects.create(title="Economics")
+        cls.goods = Question.objects.create(textbook=textbook, qtype='mc', chapter=1, section=1,
+                                            text="<p>Which of these are <b>collective goods</b>?</p>")
+        Options.objects.create(question=cls.goods, text="<p>Lighthouses</p>")
+        cls.markets = Question.objects.create(textbook=textbook, qtype='tf', chapter=2, section=1,
+                                              text="Markets always provide collective goods.")
+        cls.other = Question.objects.create(textbook=textbook, qtype='mc', chapter=2, section=2,
+                                            text="What is the price elasticity of demand?")
+
+    def test_results_are_ranked_filtered_and_paged(self):
+        index_questions([self.goods.pk, self.markets.pk, self.other.pk])
+        results = search_questions("collective goods")
+        self.assertEqual({pk for pk, score in results}, {self.goods.pk, self.markets.pk})
+        self.assertEqual([pk for pk, score in search_questions("lighthouse")], [self.goods.pk])
+        self.assertEqual([pk for pk, score in search_questions("collective goods", chapter=2)], [self.markets.pk])
+        self.assertEqual(search_questions("collective goods", limit=1) + search_questions(
+            "collective goods", after=results[0], limit=1), results)
+
+
+class SearchReindexTests(TransactionTestCase):
+    # the search text is rebuilt when the transaction commits
+
+    def setUp(self):
+        self.question = Question.objects.create(qtype='mc', text="What is the price elasticity of demand?")
+
+    def test_search_text_is_indexed_without_html(self):
+        Options.objects.create(question=self.question, text="<i>Perfectly inelastic</i>")
+        self.assertEqual(QuestionSearchText.objects.get(question=self.question).text,
+                         "What is the price elasticity of demand? Perfectly inelastic")
+
+    def test_a_question_saved_with_its_choices_is_reindexed_once(self):
+        with mock.patch('testapp1.utils.question_search.index_questions') as index_questions_mock:
+            with transaction.atomic():
+                self.question.text = "Which of these are public goods?"
+                self.question.save()
+                for number in range(3):
+                    Options.objects.create(question=self.question, text=f"Option {number}")
+                Options.objects.filter(question=self.question).first().delete()
+                index_questions_mock.assert_not_called()
+        index_questions_mock.assert_called_once_with({self.question.pk})
+
+    def test_a_rolled_back_savepoint_does_not_hold_up_later_writes(self):
+        with mock.patch('testapp1.utils.question_search.index_questions') as index_questions_mock:
+            with transaction.atomic():
+                try:
+                    with transaction.atomic():
+                        self.question.save()
+                        raise ValueError
+                except ValueError:
+                    pass
+                Options.objects.create(question=self.question, text="Lighthouses")
+        index_questions_mock.assert_called_once_with({self.question.pk})
+
+
+class NearDuplicateTests(TestCase):
+
+    def test_copies_are_linked_within_their_textbook(self):
+        textbook = Textbook.objects.create(title="Economics")
+        course = Course.objects.create(course_id="ECON101", textbook=textbook)
+        prompt = "Which of the following goods are non-rival and non-excludable, so that markets under-provide them?"
+        original = Question.objects.create(textbook=textbook, qtype='mc', text=f"<p>{prompt}</p>")
+        copy = Question.objects.create(course=course, qtype='mc',
+                                       text=f'<div>  {prompt} <img src="/media/graphics/a1b2.png"></div>')
+        different = Question.objects.create(textbook=textbook, qtype='mc',
+                                            text="What is the price elasticity of demand for insulin?")
+        elsewhere = Question.objects.create(textbook=Textbook.objects.create(title="Other"), qtype='mc',
+                                            text=prompt)
+
+        self.assertEqual(link_duplicates([original.pk, copy.pk, different.pk, elsewhere.pk]), 1)
+        self.assertEqual(copy.signature.duplicate_of, original)
+        self.assertEqual(copy.signature.similarity, 1.0)
+        for question in (original, different, elsewhere):
+            self.assertIsNone(QuestionSignature.objects.get(question=question).duplicate_of)
+
+
+class BulkImportWriterTests(TestCase):
+
+    def setUp(self):
+        self.course = Course.objects.create(course_id="CS499-1")
+
+    def write_assessment(self, item_count):
+        """
+        Writes a test with item_count questions through one BulkImportWriter and returns its queries.
+        """
+        import_writer = BulkImportWriter()
+        test = import_writer.add(Test(course=self.course, name=f"Quiz of {item_count}"))
+        part = import_writer.add(TestPart(test=test))
+        section = import_writer.add(TestSection(part=part, section_number=1))
+        for number in range(item_count):
+            question = import_writer.add(Question(course=self.course, qtype='mc',
+                                                  text=f"Question {number} of {item_count}"))
+            import_writer.add(Options(question=question, text=f"Option {number}"))
+            import_writer.add(TestQuestion(test=test, question=question, section=section, order=number))
+        with CaptureQueriesContext(connection) as queries:
+            import_writer.save()
+        return queries.captured_queries
+
+    def test_query_count_does_not_grow_with_the_items(self):
+        self.write_assessment(1)  # so both writes below find questions already in the course
+        # 40, since Django splits an SQLite INSERT at 999 parameters (~45 questions)
+        self.assertEqual(len(self.write_assessment(5)), len(self.write_assessment(40)))
+
+    def test_only_the_split_inserts_grow_with_the_items(self):
+        # the rest, signing the questions and finding their near duplicates included, is the same for 200 items
+        self.write_assessment(1)
+        statements = [[query["sql"].split()[0] for query in self.write_assessment(item_count)
+                       if "INSERT INTO" not in query["sql"]] for item_count in (5, 200)]
+        self.assertEqual(statements[0], statements[1])
+
+    def test_ids_are_read_back_when_the_insert_cant_return_them(self):
+        # the MySQL path, whatever the auto-increment lock mode
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False):
+            self.write_assessment(1)
+            queries = len(self.write_assessment(5))
+            self.assertEqual(len(self.write_assessment(40)), queries)
+        test_questions = TestQuestion.objects.filter(test__name="Quiz of 40").select_related('question')
+        self.assertEqual(len(test_questions), 40)
+        for test_question in test_questions:
+            self.assertEqual(test_question.question.text, f"Question {test_question.order} of 40")
+            self.assertEqual(test_question.section.part.test_id, test_question.test_id)
+            self.assertEqual(test_question.question.question_options.get().text, f"Option {test_question.order}")
+        for model in (Test, TestPart, TestSection, Question):
+            self.assertFalse(model.objects.exclude(import_key=None).exists(), model)  # cleared once the IDs are read
+
+
+class FeedbackTextbookTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.textbook = Textbook.objects.create(title="Economics")
+        cls.other_textbook = Textbook.objects.create(title="Finance")
+        cls.course = Course.objects.create(course_id="ECON101", textbook=cls.textbook)
+        cls.test = Test.objects.create(course=cls.course, name="Quiz 1")
+        cls.question = Question.objects.create(textbook=cls.textbook, qtype='mc', text="What is a good?")
+        cls.feedback = [Feedback.objects.create(test=cls.test, rating=4, comments=f"Test feedback {number}")
+                        for number in range(3)]
+        cls.feedback += [Feedback.objects.create(question=cls.question, rating=2) for number in range(2)]
+
+    def test_feedback_follows_the_textbook(self):
+        self.assertEqual({feedback.textbook_id for feedback in self.feedback}, {self.textbook.pk})
+        course = Course.objects.get(pk=self.course.pk)
+        course.textbook = self.other_textbook
+        course.save()
+        self.assertEqual(set(Feedback.objects.filter(test=self.test).values_list('textbook', flat=True)),
+                         {self.other_textbook.pk})
+        question = Question.objects.get(pk=self.question.pk)
+        question.textbook = None
+        question.save()
+        self.assertEqual(set(Feedback.objects.filter(question=self.question).values_list('textbook', flat=True)),
+                         {None})
+
+    def test_saves_that_keep_the_textbook_leave_feedback_alone(self):
+        for model, instance in ((Course, self.course), (Test, self.test), (Question, self.question)):
+            with self.subTest(model.__name__):
+                instance = model.objects.get(pk=instance.pk)
+                with self.assertNumQueries(1):
+                    instance.save()
+                instance.textbook = self.other_textbook
+                with self.assertNumQueries(1):
+                    instance.save(update_fields=['published' if model is not Test else 'name'])
+
+    def test_get_feedback_pages_newest_first(self):
+        feedback = list(self.textbook.get_feedback())
+        self.assertEqual(feedback, sorted(self.feedback, key=lambda item: (item.created_at, item.pk), reverse=True))
+        first_page = list(self.textbook.get_feedback(limit=2))
+        second_page = list(self.textbook.get_feedback(after=first_page[-1], limit=10))
+        self.assertEqual(first_page + second_page, feedback)
+
+
+class ImportMetricsTests(TestCase):
+
+    def measure(self, metrics):
+        metrics.start()
+        with metrics.phase("xml_parse"):
+            data = [bytes(1000) for _ in range(1000)]
+        metrics.stop()
+        del data
+        return metrics.as_dict()["xml_parse"]
+
+    def test_memory_is_only_traced_when_asked_for(self):
+        self.assertFalse(ImportMetrics().trace_memory)
+        self.assertEqual(self.measure(ImportMetrics())["peak_memory_bytes"], 0)
+        self.assertFalse(tracemalloc.is_tracing())
+        self.assertGreater(self.measure(ImportMetrics(trace_memory=True))["peak_memory_bytes"], 1000000)
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_tracing_started_elsewhere_is_left_alone(self):
+        tracemalloc.start()
+        try:
+            stats = self.measure(ImportMetrics(trace_memory=True))
+            self.assertTrue(tracemalloc.is_tracing())
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(stats["peak_memory_bytes"], 0)
+        self.assertEqual(stats["calls"], 1)
+
+
+class BenchmarkImportTests(TestCase):
+    def test_the_corpus_is_the_same_for_the_same_seed(self):
+        with tempfile.TemporaryDirectory() as work_dir:
+            paths = [os.path.join(work_dir, f"corpus{number}.zip") for number in range(3)]
+            summaries = [write_corpus_zip(path, assessments=2, items=30, image_ratio=0.2, image_size=100, seed=seed)
+                         for path, seed in zip(paths, (1, 1, 2))]
+            contents = []
+            for path in paths:
+                with zipfile.ZipFile(path) as zip_ref:
+                    contents.append({name: zip_ref.read(name) for name in zip_ref.namelist()})
+                    self.assertEqual(len(list(ZipManifest(zip_ref.namelist()).assessments())), 2)
+        self.assertEqual(summaries[0], summaries[1])
+        self.assertEqual(contents[0], contents[1])
+        self.assertNotEqual(contents[0], contents[2])
+        self.assertEqual(summaries[0]["items"], 60)
+        self.assertEqual(sum(summaries[0]["types"].values()), 60)
+
+    def test_regressions_are_judged_by_the_direction_of_each_metric(self):
+        baseline = {"items_per_second": 100, "queries_per_item": 2.0, "peak_rss_bytes": 1000, "media_bytes": 0}
+        result = {"items_per_second": 80, "queries_per_item": 2.1, "peak_rss_bytes": 900, "media_bytes": 10}
+        self.assertEqual({metric: is_regression for metric, old_value, new_value, change, is_regression
+                          in compare(result, baseline, tolerance=0.1)},
+                         {"items_per_second": True, "queries_per_item": False, "peak_rss_bytes": False})
+
+    def test_benchmark_needs_force(self):
+        with mock.patch('testapp1.management.commands.benchmark_import.write_corpus_zip') as write_corpus_zip:
+            with self.assertRaisesMessage(CommandError, "--force"):
+                call_command('benchmark_import', '--suite', 'small')
+        write_corpus_zip.assert_not_called()
+
+
+class CourseImportLockTests(TestCase):
+    def test_a_named_lock_is_held_until_the_block_ends(self):
+        entered = threading.Event()
+
+        def take_lock():
+            with named_lock("test-lock"):
+                entered.set()
+
+        with named_lock("test-lock"):
+            thread = threading.Thread(target=take_lock)
+            thread.start()
+            self.assertFalse(entered.wait(0.2))
+        thread.join(5)
+        self.assertTrue(entered.is_set())
+
+    def test_an_import_holds_the_lock_of_its_course(self):
+        course = Course.objects.create(course_id="CS499-LOCK", name="Locks")
+        job = ImportJob.objects.create(original_filename="quiz.zip", upload_size=1, course=course,
+                                       status=ImportJob.RUNNING)
+
+        def run(importer, zip_source):
+            self.assertTrue(process_locks[course_lock_name(course.pk)].locked())
+            return {}
+
+        with mock.patch('testapp1.utils.import_jobs.QtiImporter.run', autospec=True, side_effect=run):
+            job = run_import_job(job, zip_path="quiz.zip")
+        self.assertEqual(job.status, ImportJob.DONE, job.error)
+        self.assertFalse(process_locks[course_lock_name(course.pk)].locked())
+
+
+class JobAccessTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user("owner", password="secret")
+        cls.other = User.objects.create_user("other", password="secret")
+        cls.staff = User.objects.create_user("staff", password="secret", is_staff=True)
+        course = Course.objects.create(course_id="CS499-JOBS", name="Jobs")
+        cls.import_job = ImportJob.objects.create(original_filename="quiz.zip", upload_size=1, course=course,
+                                                  user=cls.owner)
+        cls.export_job = ExportJob.objects.create(user=cls.owner)
+
+    def status_urls(self):
+        return [reverse("import_status", args=[self.import_job.pk]),
+                reverse("export_status", args=[self.export_job.pk])]
+
+    def test_anonymous_users_cannot_see_a_users_job(self):
+        for url in self.status_urls():
+            self.assertEqual(self.client.get(url).status_code, 404, url)
+
+    def test_only_the_owner_and_staff_see_a_job(self):
+        for user, status_code in ((self.owner, 200), (self.staff, 200), (self.other, 404)):
+            self.client.force_login(user)
+            for url in self.status_urls():
+                self.assertEqual(self.client.get(url).status_code, status_code, (user.username, url))
+
+    def test_other_users_cannot_download_an_export(self):
+        ExportJob.objects.filter(pk=self.export_job.pk).update(status=ExportJob.DONE)
+        self.client.force_login(self.other)
+        self.assertEqual(self.client.get(reverse("export_download", args=[self.export_job.pk])).status_code, 404)
+
+
+class ExportVersionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.course = Course.objects.create(course_id="CS499-EXPORT", name="Exports")
+        cls.question = Question.objects.create(course=cls.course, qtype='mc', text="Which one?")
+        cls.option = Options.objects.create(question=cls.question, text="This one")
+        cls.test = Test.objects.create(course=cls.course, name="Quiz")
+        cls.test_question = TestQuestion.objects.create(test=cls.test, question=cls.question)
+
+    def version(self):
+        return data_version(export_closure(course_ids=[self.course.pk]))
+
+    def assertChangesVersion(self, change):
+        version = self.version()
+        change()
+        self.assertNotEqual(self.version(), version)
+
+    def test_rows_edited_in_place_change_the_version(self):
+        self.option.text = "That one"
+        self.assertChangesVersion(self.option.save)
+        self.assertChangesVersion(lambda: TestQuestion.objects.filter(pk=self.test_question.pk).update(order=2))
+
+    def test_rating_totals_change_the_version(self):
+        self.assertChangesVersion(lambda: Feedback.add_to_ratings(
+            {'question_id': self.question.pk, 'test_id': None, 'textbook_id': None, 'rating': 4}, 1))
+
+    def test_ratings_of_other_courses_leave_the_version_alone(self):
+        other_question = Question.objects.create(course=Course.objects.create(course_id="CS499-OTHER"), qtype='mc')
+        version = self.version()
+        Feedback.objects.create(question=other_question, rating=2)
+        self.assertEqual(self.version(), version)
+
+
+class QuestionHandlerTests(TestCase):
+    # a dropdown (or blank) with one empty choice, which Canvas exports as an empty mattext
+    ITEM = """
+        <item ident="item1">
+          <presentation>
+            <response_lid ident="response_color">
+              <material><mattext>color</mattext></material>
+              <render_choice>
+                <response_label ident="1"><material><mattext>red</mattext></material></response_label>
+                <response_label ident="2"><material><mattext></mattext></material></response_label>
+              </render_choice>
+            </response_lid>
+          </presentation>
+          <resprocessing>
+            <respcondition continue="No">
+              <conditionvar><varequal respident="response_color">1</varequal></conditionvar>
+            </respcondition>
+          </resprocessing>
+        </item>
+    """
+
+    def parse(self, qti_type):
+        item_record = ItemRecord("item1", 1, QUESTION_HANDLERS[qti_type].stored_type, "Pick one", 1)
+        QUESTION_HANDLERS[qti_type].handle(ElementTree.fromstring(self.ITEM), item_record, lambda text: (text, None))
+        return item_record
+
+    def test_empty_dropdown_choices_are_kept(self):
+        item_record = self.parse('multiple_dropdowns_question')
+        self.assertEqual([answer.text for answer in item_record.answers], ["color;;;;; red"])
+        self.assertEqual([option.text for option in item_record.options], ["color;;;;; "])
+
+    def test_empty_blank_responses_are_kept(self):
+        item_record = self.parse('fill_in_multiple_blanks_question')
+        self.assertEqual([answer.text for answer in item_record.answers], ["color;;;;; red", "color;;;;; "])
+
+
+class QtiItemStreamTests(TestCase):
+    QUESTIONS = b"""<?xml version="1.0" encoding="UTF-8"?>
+        <questestinterop xmlns="http://www.imsglobal.org/xsd/ims_qtiasiv1p2">
+          <assessment ident="quiz1" title="Quiz 1">
+            <section ident="root_section">
+              <item ident="a"/>
+              <section ident="group1">
+                <item ident="b"/>
+                <item ident="c"/>
+              </section>
+              <item ident="d"/>
+              <section ident="group2">
+                <item ident="e"/>
+              </section>
+            </section>
+          </assessment>
+        </questestinterop>"""
+
+    def test_items_are_numbered_by_their_innermost_section(self):
+        stream = QtiItemStream(io.BytesIO(self.QUESTIONS))
+        self.assertEqual((stream.ident, stream.title), ("quiz1", "Quiz 1"))
+        self.assertEqual([(section_number, item.get('ident')) for section_number, item in stream],
+                         [(1, "a"), (2, "b"), (2, "c"), (1, "d"), (3, "e")])
+
+    def test_finished_items_are_detached_from_the_tree(self):
+        stream = QtiItemStream(io.BytesIO(self.QUESTIONS))
+        for section_number, item in stream:
+            self.assertEqual(item.tag, "item")  # without the namespace
+        self.assertEqual(list(stream.assessment.iter('item')), [])
+
+    def test_a_file_without_an_assessment_yields_nothing(self):
+        stream = QtiItemStream(io.BytesIO(b"<questestinterop/>"))
+        self.assertIsNone(stream.assessment)
+        self.assertEqual(list(stream), [])
+
+    def test_description_is_read_from_the_meta_file(self):
+        meta = b"""<quiz xmlns="http://canvas.instructure.com/xsd/cccv1p0"><title>Quiz 1</title>
+                   <description>&lt;p&gt;Read chapter 2&lt;/p&gt;</description></quiz>"""
+        self.assertEqual(read_description(io.BytesIO(meta)), "<p>Read chapter 2</p>")
+
+
+class ZipManifestTests(TestCase):
+    NAMES = [
+        "imsmanifest.xml",
+        "quiz1/", "quiz1/assessment_meta.xml", "quiz1/quiz1.xml",
+        "quiz2/assessment_meta.xml", "quiz2/renamed.xml",
+        "notes/readme.xml",
+        "Uploaded Media/pic one.png",
+        "quiz1/local.png",
+    ]
+
+    def test_assessment_folders_are_found(self):
+        self.assertEqual(sorted(ZipManifest(self.NAMES).assessments()), [
+            ("quiz1/", "quiz1/assessment_meta.xml", "quiz1/quiz1.xml"),
+            ("quiz2/", "quiz2/assessment_meta.xml", "quiz2/renamed.xml"),
+        ])
+
+    def test_images_are_found_by_their_link(self):
+        zip_manifest = ZipManifest(self.NAMES)
+        self.assertEqual(zip_manifest.find_file("$IMS-CC-FILEBASE$/Uploaded%20Media/pic%20one.png?canvas_download=1"),
+                         "Uploaded Media/pic one.png")
+        self.assertEqual(zip_manifest.find_file("local.png"), "quiz1/local.png")
+        self.assertIsNone(zip_manifest.find_file("$IMS-CC-FILEBASE$/missing.png"))
+        self.assertIsNone(zip_manifest.find_file(None))
+
+
+class HtmlAssetTests(TestCase):
+    def test_image_sources_are_rewritten_in_one_pass(self):
+        text = ('<p>Look: <IMG alt="a &amp; b" src="$IMS-CC-FILEBASE$/pic.png" width=10></p>'
+                "<img src='missing.png'><img title=no-src>")
+        new_text, references = rewrite_images(text, lambda reference: "/media/a b.png"
+                                              if reference.src.endswith("pic.png") else None)
+        self.assertEqual(new_text, '<p>Look: <IMG alt="a &amp; b" src="/media/a b.png" width=10></p>'
+                                   "<img src='missing.png'><img title=no-src>")
+        self.assertEqual([(reference.src, reference.alt, reference.url) for reference in references],
+                         [("$IMS-CC-FILEBASE$/pic.png", "a & b", "/media/a b.png"), ("missing.png", None, None)])
+
+    def test_text_without_images_is_left_alone(self):
+        resolve = mock.Mock()
+        self.assertEqual(rewrite_images("<p>No images</p>", resolve), ("<p>No images</p>", []))
+        resolve.assert_not_called()
+
+    def test_plain_text_of_html(self):
+        self.assertEqual(html_to_text("<table><tr><td>a</td><td>b&nbsp;&lt;c&gt;</td></tr></table>"), "a b <c>")
+
+
+class ContentAddressedStorageTests(TestCase):
+    def setUp(self):
+        media_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(media_dir.cleanup)
+        self.storage = ContentAddressedStorage(location=media_dir.name)
+
+    def stored_files(self):
+        return [file_name for directory, folder_names, file_names in os.walk(self.storage.location)
+                for file_name in file_names]
+
+    def test_identical_files_are_stored_once(self):
+        name = self.storage.save("option_images/a.PNG", ContentFile(b"same bytes"))
+        self.assertTrue(is_blob_name(name))
+        self.assertTrue(name.endswith(".png"))
+        self.assertEqual(self.storage.save("answer_graphics/b.png", ContentFile(b"same bytes")), name)
+        self.assertNotEqual(self.storage.save("a.png", ContentFile(b"other bytes")), name)
+        self.assertEqual(len(self.stored_files()), 2)
+
+
+class ImportJobQueueTests(TestCase):
+    def setUp(self):
+        media_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(media_dir.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_dir.name, QTI_IMPORT_LOCAL_WORKERS=0,
+                                              QTI_IMPORT_PARSE_WORKERS=1)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = User.objects.create_user("teacher", password="secret")
+        self.client.force_login(self.user)
+
+    def upload(self):
+        with open(SAMPLE_ZIP, "rb") as zip_file:
+            response = self.client.post(reverse("parse_qti_xml"), {
+                "file": zip_file, "courseID": "CS499-QUEUE", "courseName": "Queue", "courseCRN": "54352",
+                "courseSemester": "Fall 2021", "courseTextbookTitle": "Book"
+            })
+        self.assertEqual(response.status_code, 202)
+        return response.json()
+
+    def test_an_upload_is_queued_and_run_by_one_worker(self):
+        upload = self.upload()
+        self.assertEqual(self.client.get(upload["status_url"]).json()["status"], ImportJob.QUEUED)
+
+        job = claim_next_job("worker-1")
+        self.assertEqual((job.pk, job.status, job.worker), (upload["job_id"], ImportJob.RUNNING, "worker-1"))
+        self.assertIsNone(claim_next_job("worker-2"))
+
+        run_import_job(job)
+        status = self.client.get(upload["status_url"]).json()
+        self.assertEqual(status["status"], ImportJob.DONE, status["error"])
+        self.assertEqual(status["items_processed"], status["result"]["items"])
+        self.assertEqual(Test.objects.filter(course__course_id="CS499-QUEUE").count(), status["result"]["added"])
+        self.assertFalse(ImportJob.objects.get(pk=job.pk).upload)  # removed once imported
+
+    def test_a_failed_job_can_be_retried(self):
+        upload = self.upload()
+        job = claim_next_job("worker-1")
+        with mock.patch('testapp1.utils.import_jobs.QtiImporter.run', side_effect=ValueError("broken")):
+            run_import_job(job)
+        status = self.client.get(upload["status_url"]).json()
+        self.assertEqual((status["status"], status["error"]), (ImportJob.FAILED, "ValueError: broken"))
+
+        self.assertTrue(retry_import_job(ImportJob.objects.get(pk=job.pk)))
+        self.assertEqual(claim_next_job("worker-2").pk, job.pk)
+
+    def test_an_anonymous_upload_can_be_followed_in_the_same_session_only(self):
+        self.client.logout()
+        upload = self.upload()
+        self.assertIsNone(ImportJob.objects.get(pk=upload["job_id"]).user)
+
+        response = self.client.get(upload["status_url"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status"], ImportJob.QUEUED)
+        self.assertEqual(Client().get(upload["status_url"]).status_code, 404)
+
+
+class CorpusTestCase(TestCase):
+    """
+    Imports a small synthetic export (testapp1/utils/qti_corpus.py), written for every test,
+    with images saved to a temporary folder.
+    """
+
+    def setUp(self):
+        work_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(work_dir.cleanup)
+        self.work_dir = work_dir.name
+        self.storage = ContentAddressedStorage(location=os.path.join(self.work_dir, "media"))
+        self.zip_path = os.path.join(self.work_dir, "corpus.zip")
+        write_corpus_zip(self.zip_path, assessments=3, items=8, image_ratio=0.5, image_size=500, seed=7)
+
+    def import_zip(self, course, zip_path=None, parse_workers=1, **options):
+        importer = QtiImporter(course, parse_workers=parse_workers, image_storage=self.storage, **options)
+        return importer.run(zip_path or self.zip_path)
+
+
+class ParallelParseTests(CorpusTestCase):
+    def imported(self, parse_workers):
+        course = Course.objects.create(course_id=f"CS499-PARSE{parse_workers}", name="Parsing")
+        self.import_zip(course, parse_workers=parse_workers)
+        return [
+            (test.name, [(test_question.question.qtype, test_question.question.text, test_question.question.answer,
+                          test_question.question.img,
+                          sorted(test_question.question.question_options.values_list('text', flat=True)),
+                          sorted(test_question.question.question_answers.values_list('text', flat=True)))
+                         for test_question in test.test_questions.order_by('order')])
+            for test in Test.objects.filter(course=course).order_by('pk')
+        ]
+
+    def test_parsing_in_a_process_pool_gives_the_same_import(self):
+        serial = self.imported(parse_workers=1)
+        self.assertEqual(len(serial), 3)
+        with mock.patch('testapp1.utils.qti_to_db.ProcessPoolExecutor', wraps=ProcessPoolExecutor) as pool:
+            self.assertEqual(self.imported(parse_workers=2), serial)
+        pool.assert_called_once()
+
+
+class IncrementalReimportTests(CorpusTestCase):
+    def edited_zip(self):
+        # the same export with the first question of one assessment reworded
+        edited_path = os.path.join(self.work_dir, "edited.zip")
+        with zipfile.ZipFile(self.zip_path) as source, zipfile.ZipFile(edited_path, "w") as edited:
+            questions_path = next(name for name in source.namelist()
+                                  if name.endswith(".xml") and "/" in name and not name.endswith("assessment_meta.xml"))
+            for name in source.namelist():
+                data = source.read(name)
+                if name == questions_path:
+                    data = data.replace(b"</mattext>", b" (reworded)</mattext>", 1)
+                edited.writestr(name, data)
+        return edited_path
+
+    def test_unchanged_assessments_are_skipped_and_changed_ones_updated_in_place(self):
+        course = Course.objects.create(course_id="CS499-REIMPORT", name="Re-import")
+        self.assertEqual(self.import_zip(course)["added"], 3)
+        test_ids = set(Test.objects.filter(course=course).values_list('pk', flat=True))
+        question_ids = set(Question.objects.filter(course=course).values_list('pk', flat=True))
+
+        summary = self.import_zip(course)
+        self.assertEqual((summary["added"], summary["updated"], summary["skipped"], summary["items"]), (0, 0, 3, 0))
+
+        summary = self.import_zip(course, zip_path=self.edited_zip())
+        self.assertEqual((summary["added"], summary["updated"], summary["skipped"]), (0, 1, 2))
+        self.assertEqual(summary["items_updated"], 1)
+        self.assertEqual(set(Test.objects.filter(course=course).values_list('pk', flat=True)), test_ids)
+        self.assertEqual(set(Question.objects.filter(course=course).values_list('pk', flat=True)), question_ids)
+        self.assertEqual(Question.objects.filter(course=course, text__contains="(reworded)").count(), 1)
+
+
+def zip_bytes(members, compression=zipfile.ZIP_DEFLATED):
+    zip_buffer = io.BytesIO()
+    with zipfile.ZipFile(zip_buffer, "w", compression) as zip_ref:
+        for name, data in members.items():
+            zip_ref.writestr(name, data)
+    return zip_buffer.getvalue()
+
+
+@override_settings(QTI_UPLOAD_MAX_COMPRESSED_SIZE=10000, QTI_UPLOAD_MAX_UNCOMPRESSED_SIZE=50000,
+                   QTI_UPLOAD_MAX_COMPRESSION_RATIO=100, QTI_UPLOAD_MAX_MEMBERS=10)
+class ZipLimitTests(TestCase):
+    def assertRejected(self, data, message):
+        with self.assertRaisesMessage(ZipLimitError, message):
+            check_zip_limits(io.BytesIO(data), compressed_size=len(data))
+
+    def test_zips_within_the_limits_pass(self):
+        check_zip_limits(io.BytesIO(zip_bytes({"quiz/quiz.xml": os.urandom(5000)})))
+
+    def test_zips_breaking_a_limit_are_rejected(self):
+        self.assertRejected(b"not a zip", "not a valid zip")
+        self.assertRejected(zip_bytes({"big.bin": os.urandom(20000)}, zipfile.ZIP_STORED), "uploads are limited to")
+        self.assertRejected(zip_bytes({f"file{number}.txt": b"x" for number in range(11)}), "at most 10 are allowed")
+        self.assertRejected(zip_bytes({"bomb.txt": b"0" * 40000}), "compressed more than 100 to 1")
+        self.assertRejected(zip_bytes({f"part{number}.bin": os.urandom(1000) for number in range(2)} |
+                                      {"big.txt": bytes(range(256)) * 200}), "unpacks to more than")
+
+    def test_the_upload_is_refused_before_anything_is_saved(self):
+        bomb = ContentFile(zip_bytes({"bomb.txt": b"0" * 40000}), name="bomb.zip")
+        response = self.client.post(reverse("parse_qti_xml"), {"file": bomb, "courseID": "CS499-BOMB"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("compressed more than", response.json()["error"])
+        self.assertFalse(Course.objects.filter(course_id="CS499-BOMB").exists())
+        self.assertFalse(ImportJob.objects.exists())
+
+
+class ImportQtiCommandTests(TransactionTestCase):
+    # the command imports on pool threads, each with its own database connection, so nothing here
+    # can stay inside an uncommitted test transaction
+
+    def setUp(self):
+        work_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(work_dir.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=os.path.join(work_dir.name, "media"),
+                                              QTI_IMPORT_PARSE_WORKERS=1)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.zip_dir = os.path.join(work_dir.name, "zips")
+        os.makedirs(self.zip_dir)
+        for name, seed in (("first.zip", 1), ("second.zip", 2)):
+            write_corpus_zip(os.path.join(self.zip_dir, name), assessments=2, items=5, image_ratio=0, seed=seed)
+        self.manifest_path = os.path.join(work_dir.name, "manifest.csv")
+        with open(self.manifest_path, "w") as manifest_file:
+            manifest_file.write("zip,course_id,course_name,textbook_title\n"
+                                "first.zip,CS499-BULK,Bulk,Book\n"
+                                "second.zip,CS499-BULK,Bulk,Book\n")
+
+    def import_qti(self, *options):
+        output = io.StringIO()
+        call_command('import_qti', self.zip_dir, '--manifest', self.manifest_path, '--workers', '2', *options,
+                     stdout=output)
+        return output.getvalue()
+
+    def test_a_directory_is_imported_once(self):
+        output = self.import_qti()
+        self.assertIn("Imported 2 zip(s)", output)
+        self.assertEqual(Course.objects.filter(course_id="CS499-BULK").count(), 1)
+        self.assertEqual(Textbook.objects.filter(title="Book").count(), 1)
+        self.assertEqual(Test.objects.filter(course__course_id="CS499-BULK").count(), 4)
+        self.assertEqual(ImportJob.objects.filter(status=ImportJob.DONE).count(), 2)
+
+        self.assertIn("0 tests would be added, 0 would be updated, 4 unchanged", self.import_qti('--dry-run'))
+        self.assertIn("(2 skipped, 0 failed)", self.import_qti('--resume'))
+        self.assertEqual(Test.objects.count(), 4)
+
+
+class CheckpointResumeTests(CorpusTestCase):
+    def setUp(self):
+        super().setUp()
+        settings_override = override_settings(MEDIA_ROOT=os.path.join(self.work_dir, "media"),
+                                              QTI_IMPORT_PARSE_WORKERS=1)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_a_failed_import_resumes_after_the_assessments_it_committed(self):
+        course = Course.objects.create(course_id="CS499-RESUME", name="Resume")
+        job = ImportJob.objects.create(original_filename="corpus.zip", upload_size=1, course=course,
+                                       status=ImportJob.RUNNING)
+        save_assessment = QtiImporter.save_assessment
+
+        def fail_on_the_second(importer, assessment):
+            if importer.assessments_processed == 1:
+                raise OSError("disk full")
+            return save_assessment(importer, assessment)
+
+        with mock.patch.object(QtiImporter, 'save_assessment', autospec=True, side_effect=fail_on_the_second):
+            job = run_import_job(job, zip_path=self.zip_path)
+        self.assertEqual((job.status, job.error), (ImportJob.FAILED, "OSError: disk full"))
+        job.refresh_from_db()
+        self.assertEqual(len(job.checkpoint), 1)
+        self.assertEqual(list(Test.objects.filter(course=course).values_list('qti_ident', flat=True)), job.checkpoint)
+
+        job = run_import_job(job, zip_path=self.zip_path)
+        self.assertEqual(job.status, ImportJob.DONE, job.error)
+        self.assertEqual((job.result["resumed"], job.result["added"]), (1, 2))
+        self.assertEqual(len(job.checkpoint), 3)
+        self.assertEqual(Test.objects.filter(course=course).count(), 3)
+
+
+def create_export_data():
+    """
+    Two courses: the first with a textbook, a test of one question (with options, an answer,
+    dynamic parameters and feedback) and a question of its own; the second with one question.
+    """
+    textbook = Textbook.objects.create(title="Software Design")
+    course = Course.objects.create(course_id="CS499-EXPORT", name="Team Software Design", textbook=textbook)
+    other_course = Course.objects.create(course_id="CS330", name="Data Structures")
+    question = Question.objects.create(course=course, qtype='mc', text="Which pattern?", answer="Observer")
+    Options.objects.bulk_create([Options(question=question, text=text) for text in ("Observer", "Visitor")])
+    Answers.objects.create(question=question, text="Observer")
+    DynamicQuestionParameter.objects.create(question=question, formula="x + 1", range_min=1, range_max=2,
+                                            additional_params={"vars": ["x"]})
+    test = Test.objects.create(course=course, name="Midterm")
+    section = TestSection.objects.create(part=TestPart.objects.create(test=test), section_number=1)
+    TestQuestion.objects.create(test=test, question=question, section=section)
+    Feedback.objects.create(question=question, rating=4, comments="Clear")
+    return {
+        "textbook": textbook, "course": course, "other_course": other_course, "question": question, "test": test,
+        "course_question": Question.objects.create(course=course, qtype='tf', text="Is it true?"),
+        "other_question": Question.objects.create(course=other_course, qtype='tf', text="Is a heap a tree?"),
+    }
+
+
+@override_settings(EXPORT_CACHE_MAX_BYTES=0, EXPORT_CHUNK_SIZE=1)
+class XlsxExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = create_export_data()
+
+    def test_a_course_export_has_a_sheet_per_table(self):
+        response = self.client.post(reverse("export_csv"), {"typeOfExport": ["course"],
+                                                            "course": [self.data["course"].pk]},
+                                    content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        workbook = openpyxl.load_workbook(io.BytesIO(b"".join(response.streaming_content)), read_only=True)
+        sheets = {sheet.title: list(sheet.values) for sheet in workbook.worksheets}
+
+        self.assertEqual(len(sheets["testapp1_options"]), 3)  # the header and both options
+        header, *rows = sheets["testapp1_question"]
+        self.assertEqual(header[0], "id")
+        self.assertEqual([row[header.index("text")] for row in rows], ["Which pattern?", "Is it true?"])
+        created_at = rows[0][header.index("created_at")]
+        self.assertIsInstance(created_at, datetime.datetime)
+        self.assertIsNone(created_at.tzinfo)  # written in UTC, since Excel has no time zones
+        header, row = sheets["testapp1_dynamicquestionparamet"]  # sheet titles are cut to 31 characters
+        self.assertEqual(row[header.index("additional_params")], '{"vars": ["x"]}')
+
+
+class ExportQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = create_export_data()
+
+    def test_rows_are_filtered_by_the_database(self):
+        selected = [self.data["other_question"].pk, self.data["question"].pk]
+        with self.assertNumQueries(1):
+            header, *rows = iter_queryset(Question.objects.filter(pk__in=selected))
+        self.assertEqual(header, tuple(field.column for field in Question._meta.concrete_fields
+                                       if field.name != "import_key"))
+        self.assertEqual([row[0] for row in rows], sorted(selected))
+
+    def test_an_empty_selection_runs_no_query(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(len(list(iter_queryset(Question.objects.filter(pk__in=[])))), 1)
+
+
+class ExportClosureTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = create_export_data()
+
+    def closure(self, **selected_ids):
+        with CaptureQueriesContext(connection) as queries:
+            closure = {model: {pk for queryset in querysets for pk in queryset.values_list('pk', flat=True)}
+                       for model, querysets in export_closure(**selected_ids)}
+        self.assertLessEqual(len(queries), len(closure))  # one per table at most, whatever the selection
+        return closure
+
+    def test_a_test_brings_its_questions_and_what_they_belong_to(self):
+        closure = self.closure(test_ids=[self.data["test"].pk])
+        self.assertEqual(closure[Question], {self.data["question"].pk})
+        self.assertEqual(closure[Course], {self.data["course"].pk})
+        self.assertEqual(closure[Textbook], {self.data["textbook"].pk})
+        self.assertEqual(len(closure[Options]), 2)
+        self.assertEqual(len(closure[TestSection]), 1)
+        self.assertEqual(len(closure[Feedback]), 1)
+
+    def test_a_course_brings_its_own_questions_but_not_other_courses(self):
+        closure = self.closure(course_ids=[self.data["course"].pk])
+        self.assertEqual(closure[Question], {self.data["question"].pk, self.data["course_question"].pk})
+        self.assertEqual(closure[Test], {self.data["test"].pk})
+
+    def test_a_question_brings_its_course_but_no_tests(self):
+        closure = self.closure(question_ids=[self.data["other_question"].pk])
+        self.assertEqual(closure[Course], {self.data["other_course"].pk})
+        self.assertEqual((closure[Test], closure[Textbook], closure[Options]), (set(), set(), set()))
+
+    def test_a_selection_past_the_parameter_limit_is_exported_in_chunks(self):
+        # far more IDs than SQLite takes as parameters in one query. the two questions are in the first and
+        # the last chunk, and the course they share is exported once
+        if connection.vendor == 'sqlite':  # SQLite's default limit, which some builds raise
+            connection.ensure_connection()
+            default_limit = connection.connection.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, 32766)
+            self.addCleanup(connection.connection.setlimit, sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, default_limit)
+        question_ids = [self.data["question"].pk] + list(range(10 ** 6, 10 ** 6 + 100000)) + [
+            self.data["course_question"].pk]
+        response = self.client.post(reverse("export_csv"), {
+            "typeOfExport": ["questions"], "questions": question_ids, "formatOfExport": ["ndjson"]
+        }, content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        lines = [json.loads(line) for line in gzip.decompress(b"".join(response.streaming_content)).splitlines()]
+        exported = {table: [line["row"]["id"] for line in lines if line["table"] == table]
+                    for table in ("testapp1_question", "testapp1_course")}
+        self.assertEqual(sorted(exported["testapp1_question"]),
+                         sorted([self.data["question"].pk, self.data["course_question"].pk]))
+        self.assertEqual(exported["testapp1_course"], [self.data["course"].pk])
+
+
+class FullExportTests(TransactionTestCase):
+    # the tables are dumped by pool threads, each on its own database connection
+
+    def setUp(self):
+        media_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(media_dir.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        create_export_data()
+        self.user = User.objects.create_user("exporter", password="secret")
+        self.client.force_login(self.user)
+
+    def test_the_entire_database_is_exported_in_the_background(self):
+        with mock.patch('testapp1.views.start_export') as start_export:
+            response = self.client.post(reverse("export_csv"), {"typeOfExport": ["entire"]},
+                                        content_type="application/json")
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()["job_id"]
+        start_export.assert_called_once_with(job_id)
+
+        job = run_export_job(job_id, workers=3)
+        self.assertEqual(job.status, ExportJob.DONE, job.error)
+        self.assertIsNone(run_export_job(job_id))  # already run
+        status = self.client.get(response.json()["status_url"]).json()
+        download = self.client.get(status["download_url"])
+        with zipfile.ZipFile(io.BytesIO(b"".join(download.streaming_content))) as archive:
+            manifest = json.loads(archive.read("manifest.json"))
+            options_csv = archive.read("testapp1_options.csv").decode().splitlines()
+            self.assertIn("testapp1_course_teachers.csv", archive.namelist())  # the many-to-many tables too
+        self.assertEqual(manifest["tables"]["testapp1_question"]["rows"], 3)
+        self.assertEqual(manifest["tables"]["testapp1_options"]["rows"], 2)
+        self.assertEqual(len(options_csv), 3)
+
+
+@override_settings(EXPORT_CACHE_MAX_BYTES=0)
+class DelimitedExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = create_export_data()
+
+    def export(self, export_format):
+        response = self.client.post(reverse("export_csv"), {"typeOfExport": ["test"], "test": [self.data["test"].pk],
+                                                            "formatOfExport": [export_format]},
+                                    content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        return response, b"".join(response.streaming_content)
+
+    def test_csv_is_a_zip_with_a_file_per_table(self):
+        response, content = self.export("csv")
+        self.assertEqual(response["Content-Type"], "application/zip")
+        self.assertIn('filename="exported_data.csv.zip"', response["Content-Disposition"])
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            self.assertIn("testapp1_textbook.csv", archive.namelist())
+            header, *rows = csv.reader(io.StringIO(archive.read("testapp1_dynamicquestionparameter.csv").decode()))
+        self.assertEqual(rows[0][header.index("additional_params")], '{"vars": ["x"]}')
+        self.assertEqual(rows[0][header.index("formula")], "x + 1")
+
+    def test_ndjson_is_gzipped_lines_tagged_with_their_table(self):
+        response, content = self.export("ndjson")
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        lines = [json.loads(line) for line in gzip.decompress(content).decode().splitlines()]
+        options = [line["row"] for line in lines if line["table"] == "testapp1_options"]
+        self.assertEqual(sorted(option["text"] for option in options), ["Observer", "Visitor"])
+        parameters = next(line["row"] for line in lines if line["table"] == "testapp1_dynamicquestionparameter")
+        self.assertEqual((parameters["formula"], parameters["question_id"]), ("x + 1", self.data["question"].pk))
+
+    def test_an_unknown_format_is_refused(self):
+        response = self.client.post(reverse("export_csv"), {"typeOfExport": ["test"], "test": [self.data["test"].pk],
+                                                            "formatOfExport": ["pdf"]},
+                                    content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+
+class ExportCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = create_export_data()
+
+    def setUp(self):
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.cache_dir = cache_dir.name
+        settings_override = override_settings(EXPORT_CACHE_DIR=self.cache_dir, EXPORT_CACHE_MAX_BYTES=10 * 1024 * 1024)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def export(self, export_format="xlsx", **headers):
+        response = self.client.post(reverse("export_csv"), {"typeOfExport": ["course"],
+                                                            "course": [self.data["course"].pk],
+                                                            "formatOfExport": [export_format]},
+                                    content_type="application/json", headers=headers)
+        content = b"".join(response.streaming_content) if response.status_code == 200 else b""
+        return response, content
+
+    def test_unchanged_exports_are_served_from_the_cache_or_not_modified(self):
+        for export_format, builder in (("xlsx", 'testapp1.views.XlsxExport'), ("csv", 'testapp1.views.export_stream')):
+            response, content = self.export(export_format)
+            etag = response["ETag"]
+
+            with mock.patch(builder) as build_export:
+                self.assertEqual(self.export(export_format, if_none_match=etag)[0].status_code, 304)
+                cached_response, cached_content = self.export(export_format)
+            build_export.assert_not_called()
+            self.assertEqual((cached_response["ETag"], cached_content), (etag, content))
+
+    def test_an_edit_changes_the_etag_and_replaces_the_cached_export(self):
+        etag = self.export()[0]["ETag"]
+        Options.objects.filter(question=self.data["question"], text="Visitor").update(text="Strategy")
+        response, content = self.export(if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)  # the old version was removed
+
+
+class RatingTotalsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.textbook = Textbook.objects.create(title="Software Design")
+        course = Course.objects.create(course_id="CS499-RATINGS", name="Ratings", textbook=cls.textbook)
+        cls.question = Question.objects.create(course=course, textbook=cls.textbook, qtype='mc', text="Which one?")
+        cls.other_question = Question.objects.create(course=course, qtype='tf', text="True?")
+        cls.test = Test.objects.create(course=course, name="Quiz")
+
+    def totals(self, instance):
+        instance.refresh_from_db()
+        return instance.rating_count, instance.rating_sum, instance.average_rating
+
+    def test_totals_follow_saved_edited_and_deleted_feedback(self):
+        feedback = Feedback.objects.create(question=self.question, rating=4)
+        Feedback.objects.create(question=self.question, rating=2)
+        Feedback.objects.create(test=self.test, rating=5)
+        Feedback.objects.create(question=self.question, comments="No rating")
+        self.assertEqual(self.totals(self.question), (2, 6, 3))
+        self.assertEqual(self.totals(self.test), (1, 5, 5))
+        self.assertEqual(self.totals(self.textbook), (3, 11, 11 / 3))
+
+        feedback.question = self.other_question
+        feedback.rating = 1
+        feedback.save()
+        self.assertEqual(self.totals(self.question), (1, 2, 2))
+        self.assertEqual(self.totals(self.other_question), (1, 1, 1))
+
+        feedback.delete()
+        self.assertEqual(self.totals(self.other_question), (0, 0, None))
+        self.assertEqual(self.totals(self.textbook), (2, 7, 3.5))
+
+    def test_deleting_a_question_takes_its_ratings_off_the_textbook(self):
+        Feedback.objects.create(question=self.question, rating=3)
+        self.question.delete()
+        self.assertEqual(self.totals(self.textbook), (0, 0, None))
+
+    def test_reconcile_ratings_repairs_totals_after_bulk_changes(self):
+        Feedback.objects.create(question=self.question, rating=3)
+        Feedback.objects.filter(question=self.question).update(rating=5)  # skips save(), so the totals are stale
+        self.assertEqual(self.totals(self.question), (1, 3, 3))
+        call_command('reconcile_ratings', stdout=io.StringIO())
+        self.assertEqual(self.totals(self.question), (1, 5, 5))
+        self.assertEqual(self.totals(self.textbook), (1, 5, 5))
@@ -0,0 +1,143 @@
+import csv
+import datetime
+import decimal
+import io
+import json
+import zipfile
+import zlib
+
+from django.http import StreamingHttpResponse
+
+"""
+Streams exports as plain text instead of a workbook: CSV files in a zip archive (one file per table),
+or newline-delimited JSON compressed with gzip (one line per row, tagged with its table). Rows go
+from the database cursor through the compressor to the client as they are read, so nothing is built
+up in memory or on disk, and the download starts with the first rows.
+
+tables is an iterable of (table name, column names, rows), e.g.
+
+    [("testapp1_question", ("id", "text", ...), iter_queryset(questions)), ...]
+
+Each table's rows are read to the end before the next table is started.
+"""
+
+# rows written between two chunks sent to the client
+ROWS_PER_CHUNK = 500
+
+EXPORT_FORMATS = {
+    # format: (file extension, content type)
+    "csv": (".csv.zip", "application/zip"),
+    "ndjson": (".ndjson.gz", "application/gzip"),
+}
+
+
+def csv_value(value):
+    """
+    Converts a database value into text for a CSV cell. NULL is an empty cell.
+    """
+    if value is None:
+        return ""
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    if isinstance(value, (bytes, memoryview)):
+        return bytes(value).hex()
+    return value
+
+
+def json_value(value):
+    """
+    Converts a database value that json can't serialize as is.
+    """
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return str(value)  # as text, so no precision is lost
+    if isinstance(value, (bytes, memoryview)):
+        return bytes(value).hex()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class StreamBuffer:
+    """
+    A write-only file that holds what was written until it is taken with pop(). zipfile writes
+    to it as if it was a (non-seekable) file, and the generator hands the bytes to the client.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_csv_zip(tables):
+    """
+    Yields a zip archive with <table>.csv for every table.
+    """
+    buffer = StreamBuffer()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for table_name, columns, rows in tables:
+            with archive.open(f"{table_name}.csv", "w", force_zip64=True) as member:
+                text = io.TextIOWrapper(member, encoding="utf-8", newline="")
+                writer = csv.writer(text)
+                writer.writerow(columns)
+                for row_number, row in enumerate(rows, 1):
+                    writer.writerow([csv_value(value) for value in row])
+                    if row_number % ROWS_PER_CHUNK == 0:
+                        text.flush()
+                        yield buffer.pop()
+                text.flush()
+                text.detach()  # so closing the writer doesn't close the member twice
+            yield buffer.pop()
+    yield buffer.pop()
+
+
+def stream_ndjson_gzip(tables):
+    """
+    Yields gzip-compressed lines of {"table": table name, "row": {column: value}}.
+    """
+    compressor = zlib.compressobj(wbits=31)  # 31: with a gzip header and trailer
+    lines = []
+    for table_name, columns, rows in tables:
+        for row in rows:
+            lines.append(json.dumps({"table": table_name, "row": dict(zip(columns, row))},
+                                    default=json_value) + "\n")
+            if len(lines) == ROWS_PER_CHUNK:
+                yield compressor.compress("".join(lines).encode("utf-8"))
+                lines = []
+    yield compressor.compress("".join(lines).encode("utf-8")) + compressor.flush()
+
+
+def export_stream(export_format, tables):
+    """
+    Yields the bytes of tables in export_format ("csv" or "ndjson").
+    """
+    stream = stream_csv_zip(tables) if export_format == "csv" else stream_ndjson_gzip(tables)
+    return (chunk for chunk in stream if chunk)
+
+
+def streaming_response(export_format, chunks, filename):
+    """
+    Returns a StreamingHttpResponse that sends chunks (from export_stream()) as a download.
+    filename is the name of the download, without its extension.
+    """
+    extension, content_type = EXPORT_FORMATS[export_format]
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}{extension}"'
+    return response
@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+import tempfile
+
+from django.conf import settings
+from django.db.models import Count, Max
+
+"""
+Keeps finished exports on disk so the same export of unchanged data isn't built twice.
+
+An export is cached under a key made from what was asked for (the export type, the format and the
+normalized selection of IDs) and is only served while the data it was built from has the same
+version. The version is worked out from the querysets of the export: for every table, the number of
+rows, the highest primary key and the latest updated_at. Adding or deleting a row, or changing one
+in place, changes the version; every exported table has an updated_at, which QuerySet.update() sets
+too (ChangeTrackingQuerySet in models.py), so rows changed in bulk count. That includes the rating
+totals: a new rating changes the exports of the question, test and textbook it rates, since their
+rows carry the totals, and leaves the cached exports of everything else alone.
+
+The cache is limited to settings.EXPORT_CACHE_MAX_BYTES; the least recently used files are removed
+once it grows past that. Setting it to 0 turns the cache off.
+"""
+
+PARTIAL_SUFFIX = ".part"  # files still being written
+
+
+def data_version(closure):
+    """
+    Returns a hash of the row count, highest primary key and latest updated_at of every queryset
+    of an export_closure(). Takes one query per queryset.
+    """
+    version = []
+    for model, querysets in closure:
+        aggregates = {"rows": Count('pk'), "high_water_mark": Max('pk')}
+        if any(field.name == 'updated_at' for field in model._meta.concrete_fields):
+            aggregates["updated_at"] = Max('updated_at')
+        version.append([model._meta.db_table, [queryset.aggregate(**aggregates) for queryset in querysets]])
+    return hashlib.sha256(json.dumps(version, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class ExportCache:
+    """
+    A folder of cached exports, named <key>-<version><extension>.
+    """
+
+    def __init__(self, directory=None, max_bytes=None):
+        self.directory = str(directory or getattr(settings, 'EXPORT_CACHE_DIR'))
+        self.max_bytes = max_bytes if max_bytes is not None else getattr(settings, 'EXPORT_CACHE_MAX_BYTES', 0)
+        if self.enabled:
+            os.makedirs(self.directory, exist_ok=True)
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    @staticmethod
+    def key(export_type, export_format, selected_ids):
+        """
+        The cache key of an export. The IDs are sorted, so the same selection always has the same key.
+        """
+        selection = {name: sorted(set(ids)) for name, ids in selected_ids.items() if ids}
+        normalized = json.dumps([export_type, export_format, selection], sort_keys=True)
+        return hashlib.sha256(normalized.encode()).hexdigest()
+
+    @staticmethod
+    def etag(key, version):
+        return '"' + hashlib.sha256(f"{key}-{version}".encode()).hexdigest()[:32] + '"'
+
+    def path(self, key, version, extension):
+        return os.path.join(self.directory, f"{key}-{version}{extension}")
+
+    def open(self, key, version, extension):
+        """
+        Returns the cached export opened for reading, or None if it isn't cached.
+        """
+        path = self.path(key, version, extension)
+        try:
+            cached_file = open(path, "rb")
+        except FileNotFoundError:
+            return None
+        os.utime(path)  # marks it as recently used
+        return cached_file
+
+    def write_through(self, key, version, extension, chunks):
+        """
+        Yields chunks while copying them to the cache. The export is only added to the cache once
+        every chunk has been written, so a download that's cut short leaves nothing behind.
+        """
+        partial_file = tempfile.NamedTemporaryFile(dir=self.directory, suffix=PARTIAL_SUFFIX, delete=False)
+        try:
+            for chunk in chunks:
+                partial_file.write(chunk)
+                yield chunk
+            partial_file.close()
+            self.add(key, partial_file.name, self.path(key, version, extension))
+        finally:
+            partial_file.close()
+            if os.path.exists(partial_file.name):
+                os.remove(partial_file.name)
+
+    def save(self, key, version, extension, write):
+        """
+        Calls write(file) to write an export to the cache, and returns the cached export opened for reading.
+        """
+        with tempfile.NamedTemporaryFile(dir=self.directory, suffix=PARTIAL_SUFFIX, delete=False) as partial_file:
+            try:
+                write(partial_file)
+            except BaseException:
+                partial_file.close()
+                os.remove(partial_file.name)
+                raise
+        path = self.path(key, version, extension)
+        self.add(key, partial_file.name, path)
+        return open(path, "rb")
+
+    def add(self, key, partial_path, path):
+        os.replace(partial_path, path)
+        # older versions of the same export won't be asked for again
+        for file_name in os.listdir(self.directory):
+            file_path = os.path.join(self.directory, file_name)
+            if file_name.startswith(f"{key}-") and file_path != path and not file_name.endswith(PARTIAL_SUFFIX):
+                self.remove(file_path)
+        self.evict(keep=path)
+
+    def evict(self, keep=None):
+        """
+        Removes the least recently used exports until the cache fits in max_bytes.
+        """
+        entries = []
+        for file_name in os.listdir(self.directory):
+            file_path = os.path.join(self.directory, file_name)
+            if file_name.endswith(PARTIAL_SUFFIX) or not os.path.isfile(file_path):
+                continue
+            file_stat = os.stat(file_path)
+            entries.append((file_stat.st_mtime, file_stat.st_size, file_path))
+        total_bytes = sum(size for used_at, size, file_path in entries)
+        for used_at, size, file_path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            if file_path != keep:
+                self.remove(file_path)
+                total_bytes -= size
+
+    @staticmethod
+    def remove(file_path):
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass  # removed by another request
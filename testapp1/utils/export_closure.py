@@ -0,0 +1,85 @@
+from django.conf import settings
+from django.db.models import Q
+
+from testapp1.models import (Textbook, Course, Test, TestPart, TestSection, TestQuestion, Question, Options,
+                             Answers, DynamicQuestionParameter, Feedback)
+
+"""
+Works out everything an export of some courses, tests or questions has to include so the exported
+rows are complete: the selected rows, everything below them, and everything they point at.
+
+    Textbook -> Course -> Test -> TestPart -> TestSection -> TestQuestion -> Question
+                                                                             -> Options, Answers,
+                                                                                DynamicQuestionParameter,
+                                                                                Feedback
+
+Every model's rows are described by one queryset, built from the others as subqueries, so the
+database works out the closure, and no ID lists are loaded into Python along the way.
+
+The selected IDs are query parameters, and each one is repeated in up to seven of the subqueries.
+So that a long selection doesn't run past the database's limit on parameters (32766 on SQLite),
+it is split into chunks of settings.EXPORT_IN_CLAUSE_SIZE IDs with a closure each. Exporting takes
+one query per model and chunk; rows reached from more than one chunk are written once
+(see iter_querysets in export_query.py).
+"""
+
+
+def in_clause_size():
+    return getattr(settings, 'EXPORT_IN_CLAUSE_SIZE', 1000)
+
+
+def export_closure(course_ids=(), test_ids=(), question_ids=()):
+    """
+    Returns [(model, querysets)] for the closure of the selected courses, tests and questions,
+    ordered so that every model comes after the models it references. There is one queryset per
+    chunk of the selection, so just one unless more than EXPORT_IN_CLAUSE_SIZE IDs are selected.
+
+    A selected course brings its tests and its own questions; a selected test brings its parts,
+    sections and questions; a selected question brings its options, answers and dynamic parameters.
+    The courses and textbooks everything belongs to are included, and so is the feedback on every
+    included question and test.
+    """
+    selection = [(name, pk) for name, ids in (('course_ids', course_ids), ('test_ids', test_ids),
+                                              ('question_ids', question_ids)) for pk in ids]
+    closures = []
+    for start in range(0, max(len(selection), 1), in_clause_size()):
+        chunk = {'course_ids': [], 'test_ids': [], 'question_ids': []}
+        for name, pk in selection[start:start + in_clause_size()]:
+            chunk[name].append(pk)
+        closures.append(chunk_closure(**chunk))
+    # [(model, queryset)] per chunk -> [(model, [queryset per chunk])]
+    return [(chunk_querysets[0][0], [queryset for model, queryset in chunk_querysets])
+            for chunk_querysets in zip(*closures)]
+
+
+def chunk_closure(course_ids, test_ids, question_ids):
+    """
+    Returns [(model, queryset)] for the closure of one chunk of the selection.
+    """
+    tests = Test.objects.filter(Q(pk__in=test_ids) | Q(course__in=course_ids))
+    test_questions = TestQuestion.objects.filter(test__in=tests)
+    questions = Question.objects.filter(
+        Q(pk__in=question_ids) | Q(course__in=course_ids) | Q(pk__in=test_questions.values('question'))
+    )
+    courses = Course.objects.filter(
+        Q(pk__in=course_ids) | Q(pk__in=tests.values('course')) | Q(pk__in=questions.values('course'))
+    )
+    textbooks = Textbook.objects.filter(
+        Q(pk__in=courses.values('textbook')) | Q(pk__in=tests.values('textbook')) |
+        Q(pk__in=questions.values('textbook'))
+    )
+    test_parts = TestPart.objects.filter(test__in=tests)
+
+    return [
+        (Textbook, textbooks),
+        (Course, courses),
+        (Test, tests),
+        (TestPart, test_parts),
+        (TestSection, TestSection.objects.filter(part__in=test_parts)),
+        (Question, questions),
+        (TestQuestion, test_questions),
+        (Options, Options.objects.filter(question__in=questions)),
+        (Answers, Answers.objects.filter(question__in=questions)),
+        (DynamicQuestionParameter, DynamicQuestionParameter.objects.filter(question__in=questions)),
+        (Feedback, Feedback.objects.filter(Q(question__in=questions) | Q(test__in=tests))),
+    ]
@@ -0,0 +1,96 @@
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.exceptions import EmptyResultSet
+from django.db import connection
+
+"""
+Reads query results for exports without loading them into memory all at once. Rows are fetched
+from a server-side cursor in chunks of settings.EXPORT_CHUNK_SIZE, so only one chunk is held in
+the web process at a time, however large the table is.
+"""
+
+
+# bookkeeping of bulk imports on MySQL (see insert_with_ids in qti_bulk.py), not data
+UNEXPORTED_FIELDS = {'import_key'}
+
+
+def chunk_size():
+    return getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+
+
+def exported_fields(model):
+    return [field for field in model._meta.concrete_fields if field.name not in UNEXPORTED_FIELDS]
+
+
+@contextmanager
+def server_side_cursor():
+    """
+    A cursor that leaves the result set on the database server until rows are fetched.
+    MySQL needs mysqlclient's SSCursor for that (Django's cursors buffer the whole result);
+    on PostgreSQL this is a named cursor, and SQLite fetches rows lazily anyway.
+
+    Nothing else can run on the connection until an SSCursor is read to the end, so read
+    each query fully before starting the next one.
+    """
+    if connection.vendor == 'mysql':
+        from MySQLdb.cursors import SSCursor
+        connection.ensure_connection()
+        cursor = connection.connection.cursor(SSCursor)
+    else:
+        cursor = connection.chunked_cursor()
+    try:
+        yield cursor
+    finally:
+        cursor.close()
+
+
+def iter_query(query, params=()):
+    """
+    Runs query and yields the tuple of its column names, then every row, fetched a chunk at a time.
+    """
+    with server_side_cursor() as cursor:
+        cursor.execute(query, params)
+        yield tuple(column_info[0] for column_info in cursor.description)
+        while True:
+            rows = cursor.fetchmany(chunk_size())
+            if not rows:
+                break
+            yield from rows
+
+
+def iter_queryset(queryset):
+    """
+    Yields the column names of the queryset's table (all but UNEXPORTED_FIELDS), then every row of the
+    queryset as a tuple of column values, ordered by primary key. Runs as a single query on a server-side cursor.
+    """
+    fields = exported_fields(queryset.model)
+    yield tuple(field.column for field in fields)
+    try:
+        sql, params = queryset.order_by('pk').values_list(*(field.attname for field in fields)).query.sql_with_params()
+    except EmptyResultSet:  # e.g. filtered on an empty ID list, so there's nothing to run
+        return
+    rows = iter_query(sql, params)
+    next(rows)
+    yield from rows
+
+
+def iter_querysets(querysets):
+    """
+    Like iter_queryset, for the union of querysets of the same model (the chunks of an export_closure).
+    Each queryset is read in primary key order, and rows already read from an earlier one are skipped.
+    """
+    if len(querysets) == 1:
+        yield from iter_queryset(querysets[0])
+        return
+    seen = set()
+    for index, queryset in enumerate(querysets):
+        rows = iter_queryset(queryset)
+        header = next(rows)
+        if index == 0:
+            yield header
+        pk_index = header.index(queryset.model._meta.pk.column)
+        for row in rows:
+            if row[pk_index] not in seen:
+                seen.add(row[pk_index])
+                yield row
@@ -0,0 +1,140 @@
+import csv
+import json
+import os
+import shutil
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files import File
+from django.db import connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from testapp1.models import ExportJob
+from testapp1.utils.delimited_export import csv_value
+from testapp1.utils.export_query import iter_queryset
+
+"""
+Exports the entire database (every testapp1 table, including the many-to-many link tables) to a
+zip archive with one CSV file per table and a manifest.json.
+
+The tables are dumped at the same time by a pool of settings.EXPORT_WORKERS threads, each on its
+own database connection. For a consistent snapshot, the highest primary key of every table is
+read first, in one transaction, and each table is only exported up to that high-water mark, so
+rows added while the export runs are left out of every table alike. (Rows updated or deleted
+in the meantime aren't held back; an export meant as a backup should run while nobody is editing.)
+"""
+
+export_pool = None
+export_pool_lock = threading.Lock()
+
+
+def exported_models():
+    return list(apps.get_app_config('testapp1').get_models(include_auto_created=True))
+
+
+def high_water_marks(models):
+    """
+    Returns {model: highest primary key} for models (0 for an empty table), read in one transaction.
+    """
+    with transaction.atomic():
+        return {model: model.objects.aggregate(high_water_mark=Max('pk'))['high_water_mark'] or 0
+                for model in models}
+
+
+def dump_table(model, high_water_mark, directory):
+    """
+    Writes the rows of model's table up to high_water_mark to <directory>/<table>.csv.
+    Returns (file name, number of rows). Runs in a pool thread.
+    """
+    file_name = f"{model._meta.db_table}.csv"
+    row_count = 0
+    try:
+        rows = iter_queryset(model.objects.filter(pk__lte=high_water_mark))
+        with open(os.path.join(directory, file_name), "w", newline="", encoding="utf-8") as table_file:
+            writer = csv.writer(table_file)
+            writer.writerow(next(rows))
+            for row in rows:
+                writer.writerow([csv_value(value) for value in row])
+                row_count += 1
+    finally:
+        connections.close_all()
+    return file_name, row_count
+
+
+def write_archive(job, workers=None):
+    """
+    Dumps every table and saves the archive on the job. Returns the archive's tables summary.
+    """
+    if workers is None:
+        workers = getattr(settings, 'EXPORT_WORKERS', 4)
+    models = exported_models()
+    snapshot = high_water_marks(models)
+    directory = tempfile.mkdtemp(prefix="export-")
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='export') as pool:
+            futures = {model: pool.submit(dump_table, model, snapshot[model], directory) for model in models}
+            tables = {}
+            for model, future in futures.items():
+                file_name, row_count = future.result()
+                tables[model._meta.db_table] = {"file": file_name, "rows": row_count,
+                                                "high_water_mark": snapshot[model]}
+
+        with tempfile.TemporaryFile() as archive_file:
+            with zipfile.ZipFile(archive_file, "w", zipfile.ZIP_DEFLATED, allowZip64=True) as archive:
+                archive.writestr("manifest.json", json.dumps({
+                    "created_at": timezone.now().isoformat(),
+                    "tables": tables,
+                }, indent=2))
+                for table in tables.values():
+                    archive.write(os.path.join(directory, table["file"]), table["file"])
+            archive_file.seek(0)
+            job.archive.save(f"export-{job.pk}.zip", File(archive_file), save=False)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return tables
+
+
+def run_export_job(job_id, workers=None):
+    """
+    Claims a queued export and runs it to completion, recording the archive (or the error) on the row.
+    """
+    claimed = ExportJob.objects.filter(pk=job_id, status=ExportJob.QUEUED).update(
+        status=ExportJob.RUNNING,
+        started_at=timezone.now()
+    )
+    if not claimed:
+        return None
+    job = ExportJob.objects.get(pk=job_id)
+    try:
+        job.tables = write_archive(job, workers)
+    except Exception as error:
+        job.status = ExportJob.FAILED
+        job.error = f"{type(error).__name__}: {error}"
+    else:
+        job.status = ExportJob.DONE
+    job.finished_at = timezone.now()
+    job.save()
+    return job
+
+
+def run_export_in_thread(job_id):
+    try:
+        run_export_job(job_id)
+    finally:
+        connections.close_all()
+
+
+def start_export(job_id):
+    """
+    Runs a queued export in a background thread of the web process.
+    """
+    global export_pool
+    with export_pool_lock:
+        if export_pool is None:
+            export_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='full-export')
+    export_pool.submit(run_export_in_thread, job_id)
@@ -0,0 +1,104 @@
+import html
+import re
+from html.parser import HTMLParser
+
+# one pass over the fragment finds every <img ...> tag; the rest of the HTML is copied as-is
+IMG_TAG = re.compile(r"<img\b[^>]*>", re.IGNORECASE)
+SRC_ATTR = re.compile(r"""(\ssrc\s*=\s*)("[^"]*"|'[^']*'|[^\s"'>]+)""", re.IGNORECASE)
+ALT_ATTR = re.compile(r"""\salt\s*=\s*("[^"]*"|'[^']*'|[^\s"'>]+)""", re.IGNORECASE)
+
+
+class ImageReference:
+    """
+    One <img> found in an HTML fragment.
+    src and alt are the unescaped attribute values; url is what src was rewritten to
+    (None if the image couldn't be resolved and the tag was left alone).
+    """
+    __slots__ = ("src", "alt", "url")
+
+    def __init__(self, src, alt):
+        self.src = src
+        self.alt = alt
+        self.url = None
+
+
+def has_images(text):
+    """
+    Cheap check used to skip fragments without images entirely.
+    """
+    return bool(text) and "<img" in text.lower()
+
+
+def attribute_value(raw_value):
+    if raw_value[:1] in ('"', "'"):
+        raw_value = raw_value[1:-1]
+    return html.unescape(raw_value)
+
+
+def rewrite_images(text, resolve):
+    """
+    Finds every <img> in an HTML fragment and rewrites its src in the same pass.
+
+    resolve(reference) is called once per image, in document order, and returns the URL the
+    src should point at, or None to leave the tag unchanged. Returns (new_text, references).
+    Text without an "<img" substring is returned untouched without being scanned.
+    """
+    if not has_images(text):
+        return text, []
+
+    references = []
+
+    def rewrite_tag(match):
+        tag = match.group(0)
+        src_match = SRC_ATTR.search(tag)
+        if src_match is None:
+            return tag
+        alt_match = ALT_ATTR.search(tag)
+        reference = ImageReference(
+            attribute_value(src_match.group(2)),
+            attribute_value(alt_match.group(1)) if alt_match else None
+        )
+        references.append(reference)
+
+        reference.url = resolve(reference)
+        if reference.url is None:
+            return tag
+        new_src = f'{src_match.group(1)}"{html.escape(reference.url, quote=True)}"'
+        return tag[:src_match.start()] + new_src + tag[src_match.end():]
+
+    return IMG_TAG.sub(rewrite_tag, text), references
+
+
+class TextExtractor(HTMLParser):
+    """
+    Collects the text of an HTML fragment, with a space wherever a tag was, so words in
+    neighbouring elements (<td>a</td><td>b</td>) don't run together.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+
+    def handle_starttag(self, tag, attrs):
+        self.parts.append(" ")
+
+    def handle_endtag(self, tag):
+        self.parts.append(" ")
+
+    def handle_data(self, data):
+        self.parts.append(data)
+
+
+def html_to_text(text):
+    """
+    Returns the plain text of an HTML fragment: tags (and images with them) dropped, entities
+    decoded and whitespace collapsed. Used to index the HTML that imports store.
+    """
+    if not text:
+        return ""
+    if "<" not in text and "&" not in text:
+        return " ".join(text.split())
+    extractor = TextExtractor()
+    extractor.feed(text)
+    extractor.close()
+    return " ".join("".join(extractor.parts).split())
@@ -0,0 +1,126 @@
+import json
+import os
+import shutil
+import tempfile
+
+try:
+    import resource  # not available on Windows, where peak RSS isn't reported
+except ImportError:
+    resource = None
+
+"""
+Runs QTI imports for benchmarking and compares the results with a stored baseline.
+Each case runs in a fresh process (so its peak RSS is its own) against a throwaway test database
+created from the default connection the way the test runner does (test_<NAME>, in memory on SQLite),
+with images saved to a temporary folder; both are removed afterwards, so nothing is imported into
+the configured database.
+"""
+
+# zips generated by `manage.py benchmark_import --suite ...` (see testapp1/utils/qti_corpus.py)
+SUITES = {
+    "small": {"assessments": 5, "items": 20, "image_ratio": 0.1, "image_size": 20000},
+    "medium": {"assessments": 20, "items": 50, "image_ratio": 0.1, "image_size": 20000},
+    "large": {"assessments": 50, "items": 200, "image_ratio": 0.1, "image_size": 20000},
+}
+
+# how each result is judged against the baseline: True if a higher value is better
+METRIC_DIRECTIONS = {
+    "items_per_second": True,
+    "queries_per_item": False,
+    "peak_rss_bytes": False,
+    "media_bytes": False,
+}
+
+
+def folder_size(path):
+    total = 0
+    for directory, folder_names, file_names in os.walk(path):
+        for file_name in file_names:
+            total += os.path.getsize(os.path.join(directory, file_name))
+    return total
+
+
+def peak_rss_bytes(who):
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux (and in bytes on macOS, which this doesn't try to tell apart)
+    return resource.getrusage(who).ru_maxrss * 1024
+
+
+def run_benchmark_case(zip_path, parse_workers, trace_memory=False):
+    """
+    Imports zip_path once and returns its measurements. Meant to run in a new process.
+    """
+    import django
+    django.setup()
+
+    from django.conf import settings
+    from django.db import DEFAULT_DB_ALIAS
+    from django.test.utils import setup_databases, teardown_databases
+    from testapp1.models import Course, Textbook
+    from testapp1.storage import ContentAddressedStorage
+    from testapp1.utils.import_metrics import ImportMetrics
+    from testapp1.utils.qti_to_db import QtiImporter
+
+    old_config = setup_databases(verbosity=0, interactive=False, aliases={DEFAULT_DB_ALIAS}, serialized_aliases=set())
+    media_dir = tempfile.mkdtemp(prefix="qti-benchmark-media-")
+    try:
+        textbook = Textbook.objects.create(title="QTI import benchmark")
+        course = Course.objects.create(course_id="BENCHMARK", name="QTI import benchmark", textbook=textbook)
+        importer = QtiImporter(course, parse_workers=parse_workers,
+                               image_storage=ContentAddressedStorage(location=media_dir, base_url=settings.MEDIA_URL))
+        # tracemalloc slows the import down and distorts the timings, so it's only on when asked for
+        importer.metrics = ImportMetrics(trace_memory=trace_memory)
+        summary = importer.run(zip_path)
+        media_bytes = folder_size(media_dir)
+    finally:
+        shutil.rmtree(media_dir, ignore_errors=True)
+        teardown_databases(old_config, verbosity=0)
+
+    items = max(summary["items_added"], 1)
+    self_rss = peak_rss_bytes(resource.RUSAGE_SELF) if resource else None
+    children_rss = peak_rss_bytes(resource.RUSAGE_CHILDREN) if resource else None
+    result = {
+        "zip_bytes": os.path.getsize(zip_path),
+        "assessments": summary["assessments"],
+        "items": summary["items_added"],
+        "seconds": summary["elapsed_seconds"],
+        "items_per_second": round(summary["items_added"] / max(summary["elapsed_seconds"], 1e-9), 1),
+        "queries_per_item": round(summary["metrics"]["total"]["queries"] / items, 3),
+        "peak_rss_bytes": max(filter(None, [self_rss, children_rss]), default=None),
+        "media_bytes": media_bytes,
+        "errors": summary["errors"],
+        "phases": {name: stats["wall_seconds"] for name, stats in summary["metrics"].items()},
+    }
+    if trace_memory:
+        result["phase_peak_memory_bytes"] = {name: stats["peak_memory_bytes"]
+                                             for name, stats in summary["metrics"].items()}
+    return result
+
+
+def load_baseline(path):
+    with open(path) as baseline_file:
+        return json.load(baseline_file)["cases"]
+
+
+def save_baseline(path, results):
+    with open(path, "w") as baseline_file:
+        json.dump({"cases": results}, baseline_file, indent=2, sort_keys=True)
+
+
+def compare(result, baseline_result, tolerance):
+    """
+    Returns [(metric, baseline value, new value, relative change, is a regression)] for one case.
+    The relative change is positive when the new value is better.
+    """
+    comparisons = []
+    for metric, higher_is_better in METRIC_DIRECTIONS.items():
+        old_value = baseline_result.get(metric)
+        new_value = result.get(metric)
+        if not old_value or new_value is None:
+            continue
+        change = (new_value - old_value) / old_value
+        if not higher_is_better:
+            change = -change
+        comparisons.append((metric, old_value, new_value, change, change < -tolerance))
+    return comparisons
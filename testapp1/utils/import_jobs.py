@@ -0,0 +1,191 @@
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils import timezone
+
+from testapp1.models import ImportJob
+from testapp1.utils.qti_to_db import QtiImporter
+
+PROGRESS_SAVE_INTERVAL = 1.0  # seconds between progress updates written to the job row
+
+local_pool = None
+local_pool_lock = threading.Lock()
+
+# named locks of databases that have none (SQLite), shared by the threads of this process only
+process_locks = {}
+process_locks_lock = threading.Lock()
+
+# held while a course and its textbook are looked up or created for an import, so two imports
+# for the same new course don't both create it
+NEW_COURSE_LOCK = "qti-import:new-course"
+
+
+def course_lock_name(course_pk):
+    # held for the whole import into a course, from the unchanged-assessment check to the last write
+    return f"qti-import:course:{course_pk}"
+
+
+@contextmanager
+def named_lock(name, using=DEFAULT_DB_ALIAS):
+    """
+    Holds the lock called name until the block ends, waiting for it if another import holds it.
+    On MySQL (GET_LOCK) and PostgreSQL (advisory lock) the lock is shared by every process using the
+    database; elsewhere only by the threads of this process.
+    """
+    connection = connections[using]
+    if connection.vendor == 'mysql':
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT GET_LOCK(%s, -1)", [name])
+        try:
+            yield
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT RELEASE_LOCK(%s)", [name])
+    elif connection.vendor == 'postgresql':
+        key = int.from_bytes(hashlib.blake2b(name.encode(), digest_size=8).digest(), "big", signed=True)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_lock(%s)", [key])
+        try:
+            yield
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", [key])
+    else:
+        with process_locks_lock:
+            lock = process_locks.setdefault(name, threading.Lock())
+        with lock:
+            yield
+
+
+def claim_next_job(worker_name):
+    """
+    Marks the oldest queued job as running and returns it, or None if the queue is empty.
+    The claim is a conditional UPDATE, so several workers (threads or processes) can poll
+    the same table without ever running a job twice.
+    """
+    while True:
+        job = ImportJob.objects.filter(status=ImportJob.QUEUED).order_by('created_at', 'pk').first()
+        if job is None:
+            return None
+        claimed = ImportJob.objects.filter(pk=job.pk, status=ImportJob.QUEUED).update(
+            status=ImportJob.RUNNING,
+            worker=worker_name,
+            started_at=timezone.now()
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+        # another worker got there first, try the next one
+
+
+def run_import_job(job, parse_workers=None, zip_path=None):
+    """
+    Runs a claimed job to completion and records the result (or the error) on the row.
+    parse_workers is passed on to QtiImporter (None uses settings.QTI_IMPORT_PARSE_WORKERS).
+    zip_path imports a zip from elsewhere on disk instead of the job's upload (which is left empty).
+    """
+    last_saved = 0.0
+
+    def save_progress(importer):
+        nonlocal last_saved
+        now = time.monotonic()
+        if now - last_saved < PROGRESS_SAVE_INTERVAL:
+            return
+        last_saved = now
+        ImportJob.objects.filter(pk=job.pk).update(
+            items_processed=importer.items_processed,
+            assessments_processed=importer.assessments_processed,
+            current_assessment=importer.current_assessment
+        )
+
+    def save_checkpoint(importer, assessment_ident):
+        # runs inside the transaction that commits the assessment
+        job.checkpoint.append(assessment_ident)
+        ImportJob.objects.filter(pk=job.pk).update(checkpoint=job.checkpoint)
+
+    # a retried job skips the assessments in its checkpoint
+    importer = QtiImporter(job.course, job.user, progress=save_progress, parse_workers=parse_workers,
+                           checkpoint=job.checkpoint, save_checkpoint=save_checkpoint)
+    try:
+        # one import into a course at a time, or two could both find an assessment new (or changed)
+        # and both write it
+        with named_lock(course_lock_name(job.course_id)):
+            # the zip is opened by path, so parse worker processes can open it too
+            job.result = importer.run(zip_path or job.upload.path)
+    except Exception as error:
+        job.status = ImportJob.FAILED
+        job.error = f"{type(error).__name__}: {error}"
+        job.result = {"metrics": importer.metrics.as_dict()}  # how far it got, and how long that took
+    else:
+        job.status = ImportJob.DONE
+        if job.upload:
+            job.upload.delete(save=False)  # the zip isn't needed once it's imported
+
+    job.items_processed = importer.items_processed
+    job.assessments_processed = importer.assessments_processed
+    job.current_assessment = None
+    job.finished_at = timezone.now()
+    job.save()
+    return job
+
+
+def retry_import_job(job):
+    """
+    Puts a failed (or stuck) job back in the queue. It keeps its checkpoint, so the retry skips
+    the assessments that were already committed. Returns False if the job can't be retried
+    because it finished or its upload is gone.
+    """
+    if job.status == ImportJob.DONE or not (job.upload and job.upload.storage.exists(job.upload.name)):
+        return False
+    ImportJob.objects.filter(pk=job.pk).update(
+        status=ImportJob.QUEUED,
+        worker=None,
+        error=None,
+        current_assessment=None,
+        started_at=None,
+        finished_at=None
+    )
+    return True
+
+
+def work_until_empty(worker_name):
+    """
+    Runs queued jobs one after another until the queue is empty. Returns how many ran.
+    """
+    jobs_run = 0
+    while True:
+        job = claim_next_job(worker_name)
+        if job is None:
+            return jobs_run
+        run_import_job(job)
+        jobs_run += 1
+
+
+def drain_queue_in_thread():
+    try:
+        work_until_empty(f"local-{os.getpid()}-{threading.get_ident()}")
+    finally:
+        # Django closes connections when a request ends. a thread of our own has to close the ones it opened
+        connections.close_all()
+
+
+def start_local_workers():
+    """
+    Wakes the in-process worker pool so queued jobs start without a separate worker process.
+    The pool has settings.QTI_IMPORT_LOCAL_WORKERS threads; 0 leaves the queue to
+    `manage.py run_worker`.
+    """
+    global local_pool
+    worker_count = getattr(settings, 'QTI_IMPORT_LOCAL_WORKERS', 0)
+    if worker_count <= 0:
+        return
+    with local_pool_lock:
+        if local_pool is None:
+            local_pool = ThreadPoolExecutor(max_workers=worker_count, thread_name_prefix='qti-import')
+    local_pool.submit(drain_queue_in_thread)
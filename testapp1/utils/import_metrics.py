@@ -0,0 +1,175 @@
+import json
+import logging
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+from django.db import connection
+
+logger = logging.getLogger("testapp1.qti_import")
+
+"""
+Per-phase measurements for QTI imports. An import is split into named phases (zip_open, manifest,
+xml_parse, item:<type>, html_rewrite, media_write, db_write, ...) and for each one this records:
+    calls, wall_seconds, cpu_seconds, peak_memory_bytes, queries, query_seconds
+Phases can be nested; an outer phase includes everything measured inside it.
+
+CPU time is the CPU time of the importing thread. Memory is only measured when asked for
+(trace_memory), with tracemalloc, which slows Python down and traces the whole process. So it is
+measured by the import that started tracing; one that finds tracing already on (another import in
+the same process) leaves it alone and reports no memory, instead of resetting the other's peaks.
+Queries are counted on the importing thread's connection only.
+"""
+
+
+class PhaseStats:
+    __slots__ = ("calls", "wall_seconds", "cpu_seconds", "peak_memory_bytes", "queries", "query_seconds")
+
+    def __init__(self):
+        self.calls = 0
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.peak_memory_bytes = 0
+        self.queries = 0
+        self.query_seconds = 0.0
+
+    def as_dict(self):
+        return {
+            "calls": self.calls,
+            "wall_seconds": round(self.wall_seconds, 6),
+            "cpu_seconds": round(self.cpu_seconds, 6),
+            "peak_memory_bytes": self.peak_memory_bytes,
+            "queries": self.queries,
+            "query_seconds": round(self.query_seconds, 6),
+        }
+
+    def add(self, stats):
+        self.calls += stats["calls"]
+        self.wall_seconds += stats["wall_seconds"]
+        self.cpu_seconds += stats["cpu_seconds"]
+        self.peak_memory_bytes = max(self.peak_memory_bytes, stats["peak_memory_bytes"])
+        self.queries += stats["queries"]
+        self.query_seconds += stats["query_seconds"]
+
+
+class ImportMetrics:
+    """
+    Collects PhaseStats for one import. Use as:
+
+        metrics = ImportMetrics()
+        with metrics.measure_queries():
+            with metrics.phase("db_write"):
+                ...
+        metrics.as_dict()
+
+    Peak memory is only measured with trace_memory=True, between start() and stop().
+    """
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.phases = {}  # phase name -> PhaseStats, in the order the phases first ran
+        self.active = []  # [stats, memory when the phase started, peak seen so far] of the open phases
+        self.thread_id = threading.get_ident()
+        self.started_tracing = False
+        self.measure_memory = False
+
+    def start(self, reuse_tracing=False):
+        """
+        Starts tracing memory if trace_memory is set. If tracing is already on, memory is only measured
+        with reuse_tracing, i.e. when the caller knows nothing else in the process is using it.
+        """
+        if not self.trace_memory:
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+            self.measure_memory = True
+        elif reuse_tracing:
+            self.measure_memory = True
+
+    def stop(self):
+        self.measure_memory = False
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+
+    @contextmanager
+    def phase(self, name):
+        stats = self.phases.get(name)
+        if stats is None:
+            stats = self.phases[name] = PhaseStats()
+
+        tracing = self.measure_memory and tracemalloc.is_tracing()
+        if tracing:
+            current_memory, peak_memory = tracemalloc.get_traced_memory()
+            # the open phases keep the peak they reached so far, then the peak is reset for this one
+            self.note_peak(peak_memory)
+            tracemalloc.reset_peak()
+        else:
+            current_memory = 0
+        active_phase = [stats, current_memory, current_memory]
+        self.active.append(active_phase)
+
+        start_wall = time.perf_counter()
+        start_cpu = time.thread_time()
+        try:
+            yield stats
+        finally:
+            stats.calls += 1
+            stats.wall_seconds += time.perf_counter() - start_wall
+            stats.cpu_seconds += time.thread_time() - start_cpu
+            if tracing and tracemalloc.is_tracing():
+                self.note_peak(tracemalloc.get_traced_memory()[1])
+            self.active.pop()
+            stats.peak_memory_bytes = max(stats.peak_memory_bytes, active_phase[2] - active_phase[1])
+
+    def note_peak(self, peak_memory):
+        for active_phase in self.active:
+            active_phase[2] = max(active_phase[2], peak_memory)
+
+    @contextmanager
+    def measure_queries(self):
+        """
+        Counts the queries run on this thread's connection into the phases open at the time.
+        """
+        def record_query(execute, sql, params, many, context):
+            if threading.get_ident() != self.thread_id or not self.active:
+                return execute(sql, params, many, context)
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                duration = time.perf_counter() - start
+                for stats, start_memory, peak_memory in self.active:
+                    stats.queries += 1
+                    stats.query_seconds += duration
+
+        with connection.execute_wrapper(record_query):
+            yield
+
+    def merge(self, phases):
+        """
+        Adds phases measured elsewhere (e.g. in a parse worker process), as returned by as_dict().
+        """
+        for name, stats in phases.items():
+            self.phases.setdefault(name, PhaseStats()).add(stats)
+
+    def as_dict(self):
+        return {name: stats.as_dict() for name, stats in self.phases.items()}
+
+
+def phase(metrics, name):
+    """
+    metrics.phase(name), or a context manager that does nothing when metrics is None.
+    """
+    if metrics is None:
+        return nullcontext()
+    return metrics.phase(name)
+
+
+def log_import(record):
+    """
+    Writes one import's summary and metrics to the import log as a single JSON line.
+    """
+    logger.info(json.dumps(record, default=str))
@@ -0,0 +1,121 @@
+import uuid
+
+from django.db import connection, transaction
+
+from testapp1.models import Test, TestPart, TestSection, Question, Options, Answers, DynamicQuestionParameter, TestQuestion
+from testapp1.utils.question_dedup import link_duplicates
+from testapp1.utils.question_search import index_questions
+
+# rows are written parents first, so every foreign key points at a row that already has an ID
+WRITE_ORDER = [Test, TestPart, TestSection, Question, Options, Answers, DynamicQuestionParameter, TestQuestion]
+# other rows point at these, so their IDs have to be known after they are inserted
+REFERENCED_MODELS = {Test, TestPart, TestSection, Question}
+
+BATCH_SIZE = 500  # rows per INSERT statement
+
+
+class BulkImportWriter:
+    """
+    Collects the rows created while importing one assessment and writes them all at once.
+
+    Instances are built unsaved and handed to add(). Related objects can be assigned
+    directly (e.g. Options(question=question_instance)) even though the parent has no ID
+    yet; save() writes each model with bulk_create inside one transaction, so the number
+    of queries depends on the number of models, not on the number of items, and a failure
+    leaves nothing of the assessment behind.
+
+    When an assessment is re-imported, existing rows can also be queued with update() and
+    delete(). Inserts run first, then updates (so updated rows may point at new rows), then
+    deletes in the order they were queued.
+    """
+
+    def __init__(self):
+        self.pending = {model: [] for model in WRITE_ORDER}
+        self.pending_updates = {}  # (model, fields) -> instances
+        self.pending_deletes = []  # (model, primary keys)
+        self.duplicates = 0  # questions save() found to nearly duplicate an existing one
+
+    def add(self, instance):
+        self.pending[type(instance)].append(instance)
+        return instance
+
+    def update(self, instance, *fields):
+        model = type(instance)
+        # bulk_update skips pre_save(), so auto_now fields (updated_at) are set here
+        for field in model._meta.concrete_fields:
+            if getattr(field, "auto_now", False):
+                field.pre_save(instance, False)
+                fields += (field.name,)
+        self.pending_updates.setdefault((model, fields), []).append(instance)
+        return instance
+
+    def delete(self, model, pks):
+        if pks:
+            self.pending_deletes.append((model, list(pks)))
+
+    def touched_questions(self):
+        """
+        The questions whose search text changes: new and updated questions, and questions with new options or answers.
+        """
+        questions = list(self.pending[Question])
+        for (model, fields), rows in self.pending_updates.items():
+            if model is Question:
+                questions.extend(rows)
+        for model in (Options, Answers):
+            questions.extend(row.question for row in self.pending[model])
+        return questions
+
+    def save(self):
+        touched_questions = self.touched_questions()
+        with transaction.atomic():
+            for model in WRITE_ORDER:
+                rows = self.pending[model]
+                if not rows:
+                    continue
+                if model in REFERENCED_MODELS:
+                    insert_with_ids(model, rows)
+                else:
+                    model.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+                rows.clear()
+
+            for (model, fields), rows in self.pending_updates.items():
+                model.objects.bulk_update(rows, fields, batch_size=BATCH_SIZE)
+            self.pending_updates.clear()
+
+            for model, pks in self.pending_deletes:
+                for start in range(0, len(pks), BATCH_SIZE):
+                    model.objects.filter(pk__in=pks[start:start + BATCH_SIZE]).delete()
+            self.pending_deletes.clear()
+
+            # bulk_create and bulk_update skip save(), so the search text is rebuilt here, in the same transaction,
+            # and the questions are checked against the ones already in their textbook or course
+            index_questions(question.pk for question in touched_questions)
+            self.duplicates = link_duplicates(question.pk for question in touched_questions)
+
+
+def insert_with_ids(model, rows):
+    """
+    Inserts rows with bulk_create and makes sure every instance gets its primary key back.
+
+    SQLite, MariaDB and PostgreSQL return the new IDs from the INSERT itself. MySQL doesn't, and with
+    innodb_autoinc_lock_mode=2 (the MySQL 8 default) the IDs of one INSERT needn't even be consecutive.
+    So there every row is inserted with an import_key unique to this write (the models in
+    REFERENCED_MODELS have that column for this alone), one SELECT per batch reads the IDs back by it,
+    and one UPDATE clears the keys again.
+    """
+    if connection.features.can_return_rows_from_bulk_insert:
+        model.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+        return
+
+    token = uuid.uuid4().hex
+    for start in range(0, len(rows), BATCH_SIZE):
+        chunk = rows[start:start + BATCH_SIZE]
+        for offset, row in enumerate(chunk):
+            row.import_key = f"{token}-{start + offset}"
+        model.objects.bulk_create(chunk)
+        ids = dict(model.objects.filter(import_key__in=[row.import_key for row in chunk])
+                   .values_list('import_key', 'pk'))
+        model.objects.filter(pk__in=ids.values()).update(import_key=None)
+        for row in chunk:
+            row.pk = ids[row.import_key]
+            row.import_key = None
@@ -0,0 +1,339 @@
+import random
+import urllib.parse
+import zipfile
+from xml.sax.saxutils import escape, quoteattr
+
+"""
+Writes synthetic Canvas-style QTI 1.2 exports, for benchmarking the importer at sizes the one
+sample zip doesn't reach. The zips have the same layout as a Canvas export (imsmanifest.xml,
+one folder per assessment with assessment_meta.xml and <ident>.xml, images under
+web_resources/Uploaded Media/) and use every question type the importer has a handler for.
+Everything is derived from the seed, so the same options always give the same zip.
+"""
+
+# relative weights of the question types in a generated assessment
+DEFAULT_TYPE_MIX = {
+    "multiple_choice_question": 6,
+    "true_false_question": 2,
+    "short_answer_question": 1,
+    "multiple_answers_question": 2,
+    "matching_question": 1,
+    "essay_question": 1,
+    "numerical_question": 1,
+    "calculated_question": 1,
+    "fill_in_multiple_blanks_question": 1,
+    "multiple_dropdowns_question": 1,
+}
+
+QTI_NAMESPACE = "http://www.imsglobal.org/xsd/ims_qtiasiv1p2"
+META_NAMESPACE = "http://canvas.instructure.com/xsd/cccv1p0"
+MEDIA_FOLDER = "web_resources/Uploaded Media/"
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+WORDS = ("cell", "energy", "matrix", "vector", "theorem", "protein", "circuit", "market", "orbit", "syntax",
+         "enzyme", "voltage", "integral", "species", "tariff", "lattice", "pointer", "glacier", "isotope", "verb")
+
+
+def parse_type_mix(text):
+    """
+    Parses "multiple_choice_question=5,essay_question=1" into a type mix dict.
+    """
+    type_mix = {}
+    for part in text.split(","):
+        qti_type, equals, weight = part.strip().partition("=")
+        type_mix[qti_type] = float(weight) if equals else 1.0
+    return type_mix
+
+
+class CorpusWriter:
+    """
+    Builds one synthetic export. Use write(path) to save it as a zip.
+    """
+
+    def __init__(self, assessments=10, items=20, type_mix=None, image_ratio=0.1, image_size=20000, seed=0):
+        self.assessment_count = assessments
+        self.items_per_assessment = items
+        self.type_mix = type_mix or DEFAULT_TYPE_MIX
+        self.image_ratio = image_ratio
+        self.image_size = image_size
+        self.rng = random.Random(seed)
+        self.images = {}  # zip member name -> bytes
+        self.item_count = 0
+
+    def write(self, path):
+        """
+        Writes the zip and returns a summary of what is in it.
+        """
+        type_counts = dict.fromkeys(self.type_mix, 0)
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zip_out:
+            idents = []
+            for number in range(1, self.assessment_count + 1):
+                ident = self.new_ident()
+                idents.append(ident)
+                title = f"Synthetic quiz {number}"
+                items = []
+                for position in range(self.items_per_assessment):
+                    qti_type = self.rng.choices(list(self.type_mix), weights=list(self.type_mix.values()))[0]
+                    type_counts[qti_type] += 1
+                    items.append(self.item_xml(qti_type))
+                zip_out.writestr(f"{ident}/assessment_meta.xml", self.meta_xml(ident, title))
+                zip_out.writestr(f"{ident}/{ident}.xml", self.questions_xml(ident, title, items))
+            for name, data in self.images.items():
+                # images are already compressed, so they are stored as they are (like Canvas does)
+                zip_out.writestr(name, data, compress_type=zipfile.ZIP_STORED)
+            zip_out.writestr("imsmanifest.xml", self.manifest_xml(idents))
+
+        return {
+            "assessments": self.assessment_count,
+            "items": self.item_count,
+            "images": len(self.images),
+            "image_bytes": sum(len(data) for data in self.images.values()),
+            "types": {qti_type: count for qti_type, count in type_counts.items() if count},
+        }
+
+    def new_ident(self):
+        return "g" + "%032x" % self.rng.getrandbits(128)
+
+    def words(self, count):
+        return " ".join(self.rng.choice(WORDS) for _ in range(count))
+
+    def prompt_html(self):
+        """
+        HTML for a question prompt; image_ratio of them embed a new image.
+        """
+        html = f"<div><p>Which {self.words(6)}?</p>"
+        if self.rng.random() < self.image_ratio:
+            file_name = f"image_{len(self.images) + 1}.png"
+            self.images[MEDIA_FOLDER + file_name] = PNG_SIGNATURE + self.rng.randbytes(
+                max(self.image_size - len(PNG_SIGNATURE), 0))
+            src = "$IMS-CC-FILEBASE$/" + urllib.parse.quote("Uploaded Media/" + file_name)
+            html += f'<p><img src="{src}" alt="{file_name}"></p>'
+        return html + "</div>"
+
+    def item_xml(self, qti_type):
+        self.item_count += 1
+        presentation, resprocessing, extension = getattr(self, qti_type)()
+        answer_ids = ",".join(str(self.rng.randint(100, 9999)) for _ in range(3))
+        return f"""      <item ident="{self.new_ident()}" title="Question">
+        <itemmetadata>
+          <qtimetadata>
+            <qtimetadatafield>
+              <fieldlabel>question_type</fieldlabel>
+              <fieldentry>{qti_type}</fieldentry>
+            </qtimetadatafield>
+            <qtimetadatafield>
+              <fieldlabel>points_possible</fieldlabel>
+              <fieldentry>{self.rng.choice(("1.0", "2.0", "5.0"))}</fieldentry>
+            </qtimetadatafield>
+            <qtimetadatafield>
+              <fieldlabel>original_answer_ids</fieldlabel>
+              <fieldentry>{answer_ids}</fieldentry>
+            </qtimetadatafield>
+            <qtimetadatafield>
+              <fieldlabel>assessment_question_identifierref</fieldlabel>
+              <fieldentry>{self.new_ident()}</fieldentry>
+            </qtimetadatafield>
+          </qtimetadata>
+        </itemmetadata>
+        <presentation>
+          <material>
+            <mattext texttype="text/html">{escape(self.prompt_html())}</mattext>
+          </material>
+{presentation}
+        </presentation>
+        <resprocessing>
+          <outcomes>
+            <decvar maxvalue="100" minvalue="0" varname="SCORE" vartype="Decimal"/>
+          </outcomes>
+{resprocessing}
+        </resprocessing>{extension}
+      </item>
+"""
+
+    # each question type returns (presentation, resprocessing, itemproc_extension) XML fragments
+
+    def choices(self, count):
+        return [(str(self.rng.randint(1000, 9999)), self.words(3)) for _ in range(count)]
+
+    def response_lid(self, ident, choices, name=None):
+        labels = "".join(f"""
+              <response_label ident="{choice_id}">
+                <material>
+                  <mattext texttype="text/plain">{escape(text)}</mattext>
+                </material>
+              </response_label>""" for choice_id, text in choices)
+        material = f"""
+            <material>
+              <mattext>{escape(name)}</mattext>
+            </material>""" if name is not None else ""
+        return f"""          <response_lid ident="{ident}" rcardinality="Single">{material}
+            <render_choice>{labels}
+            </render_choice>
+          </response_lid>"""
+
+    @staticmethod
+    def final_condition(conditionvar):
+        return f"""          <respcondition continue="No">
+            <conditionvar>
+              {conditionvar}
+            </conditionvar>
+            <setvar action="Set" varname="SCORE">100</setvar>
+          </respcondition>"""
+
+    def multiple_choice_question(self):
+        choices = self.choices(4)
+        correct_id = self.rng.choice(choices)[0]
+        return (self.response_lid("response1", choices),
+                self.final_condition(f'<varequal respident="response1">{correct_id}</varequal>'), "")
+
+    def true_false_question(self):
+        choices = [(str(self.rng.randint(1000, 9999)), "True"), (str(self.rng.randint(1000, 9999)), "False")]
+        correct_id = self.rng.choice(choices)[0]
+        return (self.response_lid("response1", choices),
+                self.final_condition(f'<varequal respident="response1">{correct_id}</varequal>'), "")
+
+    def short_answer_question(self):
+        presentation = """          <response_str ident="response1" rcardinality="Single">
+            <render_fib>
+              <response_label ident="answer1" rshuffle="No"/>
+            </render_fib>
+          </response_str>"""
+        answers = "".join(f'<varequal respident="response1">{escape(self.words(1))}</varequal>' for _ in range(2))
+        return presentation, self.final_condition(answers), ""
+
+    def multiple_answers_question(self):
+        choices = self.choices(5)
+        correct = self.rng.sample(choices, 2)
+        conditions = "".join(
+            f'<varequal respident="response1">{choice_id}</varequal>' if (choice_id, text) in correct
+            else f'<not><varequal respident="response1">{choice_id}</varequal></not>'
+            for choice_id, text in choices)
+        return self.response_lid("response1", choices), self.final_condition(f"<and>{conditions}</and>"), ""
+
+    def matching_question(self):
+        right_sides = self.choices(4)
+        left_sides = [(f"response_{self.rng.randint(1000, 9999)}", self.words(2)) for _ in range(3)]
+        presentation = "\n".join(self.response_lid(ident, right_sides, name) for ident, name in left_sides)
+        resprocessing = "\n".join(f"""          <respcondition>
+            <conditionvar>
+              <varequal respident="{ident}">{right_sides[index][0]}</varequal>
+            </conditionvar>
+            <setvar varname="SCORE" action="Add">33.33</setvar>
+          </respcondition>""" for index, (ident, name) in enumerate(left_sides))
+        return presentation, resprocessing, ""
+
+    def essay_question(self):
+        presentation = """          <response_str ident="response1" rcardinality="Single">
+            <render_fib>
+              <response_label ident="answer1" rshuffle="No"/>
+            </render_fib>
+          </response_str>"""
+        return presentation, """          <respcondition continue="No">
+            <conditionvar>
+              <other/>
+            </conditionvar>
+          </respcondition>""", ""
+
+    def numerical_question(self):
+        presentation = """          <response_str ident="response1" rcardinality="Single">
+            <render_fib fibtype="Decimal">
+              <response_label ident="answer1"/>
+            </render_fib>
+          </response_str>"""
+        value = float(self.rng.randint(1, 500))
+        return presentation, self.final_condition(f"""<or>
+                <varequal respident="response1">{value}</varequal>
+                <and>
+                  <vargte respident="response1">{value - 1}</vargte>
+                  <varlte respident="response1">{value + 1}</varlte>
+                </and>
+              </or>"""), ""
+
+    def calculated_question(self):
+        presentation, resprocessing, extension = self.numerical_question()
+        var_sets = "".join(f"""
+              <var_set ident="{self.rng.randint(1000, 9999)}">
+                <var name="x">{x}</var>
+                <var name="y">{y}</var>
+                <answer>{float(x + y)}</answer>
+              </var_set>""" for x, y in ((self.rng.randint(1, 9), self.rng.randint(1, 9)) for _ in range(5)))
+        extension = f"""
+        <itemproc_extension>
+          <calculated>
+            <answer_tolerance>0</answer_tolerance>
+            <formulas decimal_places="0">
+              <formula>x+y</formula>
+            </formulas>
+            <vars>
+              <var name="x" scale="0">
+                <min>1.0</min>
+                <max>9.0</max>
+              </var>
+              <var name="y" scale="0">
+                <min>1.0</min>
+                <max>9.0</max>
+              </var>
+            </vars>
+            <var_sets>{var_sets}
+            </var_sets>
+          </calculated>
+        </itemproc_extension>"""
+        return presentation, resprocessing, extension
+
+    def blanks(self):
+        blanks = [(f"blank{number}", self.choices(3)) for number in range(1, 3)]
+        presentation = "\n".join(self.response_lid(f"response_{name}", choices, name) for name, choices in blanks)
+        resprocessing = "\n".join(f"""          <respcondition>
+            <conditionvar>
+              <varequal respident="response_{name}">{choices[0][0]}</varequal>
+            </conditionvar>
+            <setvar varname="SCORE" action="Add">50.00</setvar>
+          </respcondition>""" for name, choices in blanks)
+        return presentation, resprocessing, ""
+
+    def fill_in_multiple_blanks_question(self):
+        return self.blanks()
+
+    def multiple_dropdowns_question(self):
+        return self.blanks()
+
+    @staticmethod
+    def meta_xml(ident, title):
+        return f"""<?xml version="1.0" encoding="UTF-8"?>
+<quiz identifier="{ident}" xmlns="{META_NAMESPACE}">
+  <title>{escape(title)}</title>
+  <description>{escape("<p>Generated for benchmarking.</p>")}</description>
+  <quiz_type>assignment</quiz_type>
+</quiz>
+"""
+
+    @staticmethod
+    def questions_xml(ident, title, items):
+        return f"""<?xml version="1.0" encoding="UTF-8"?>
+<questestinterop xmlns="{QTI_NAMESPACE}">
+  <assessment ident="{ident}" title={quoteattr(title)}>
+    <section ident="root_section">
+{"".join(items)}    </section>
+  </assessment>
+</questestinterop>
+"""
+
+    @staticmethod
+    def manifest_xml(idents):
+        resources = "".join(f"""
+    <resource identifier="{ident}" type="imsqti_xmlv1p2">
+      <file href="{ident}/{ident}.xml"/>
+    </resource>""" for ident in idents)
+        return f"""<?xml version="1.0" encoding="UTF-8"?>
+<manifest identifier="synthetic" xmlns="http://www.imsglobal.org/xsd/imsccv1p1/imscp_v1p1">
+  <resources>{resources}
+  </resources>
+</manifest>
+"""
+
+
+def write_corpus_zip(path, **options):
+    """
+    Writes one synthetic export to path; see CorpusWriter for the options.
+    """
+    return CorpusWriter(**options).write(path)
@@ -0,0 +1,252 @@
+"""
+Handlers for the QTI 1.2 question types Canvas exports, one per type, looked up in
+QUESTION_HANDLERS by the item's question_type metadata.
+
+A handler is called as handler(item, item_record, store_graphics) after the prompt and points
+are already on the record. It fills in the answer, options, answers (and, for calculated
+questions, the dynamic parameters). store_graphics(text) saves any images embedded in the
+text and returns (new_text, first image name or None).
+
+To support another question type, write a handler and register it with @handles(...).
+Items of types without a handler (file_upload, text_only) are skipped.
+"""
+
+from testapp1.utils.qti_records import ChoiceRecord, DynamicRecord
+
+# the separator used between the two sides of a matching pair (and between a blank and its answer)
+PAIR_SEPARATOR = ";;;;; "
+
+
+class QuestionHandler:
+    __slots__ = ("stored_type", "handle")
+
+    def __init__(self, stored_type, handle):
+        self.stored_type = stored_type  # the qtype saved on the question
+        self.handle = handle
+
+
+QUESTION_HANDLERS = {}  # QTI question_type -> QuestionHandler
+
+
+def handles(qti_type, stored_type):
+    """
+    Registers the decorated function as the handler for qti_type. Questions of that type
+    are saved with qtype=stored_type.
+    """
+    def register(handle):
+        QUESTION_HANDLERS[qti_type] = QuestionHandler(stored_type, handle)
+        return handle
+    return register
+
+
+def read_choices(response_lid):
+    """
+    Returns {response ident: response text} for the response_labels under a response_lid.
+    """
+    answer_choices_dict = {}
+    for response_label_elem in response_lid.findall('.//response_label'):
+        answer_choices_dict[response_label_elem.get('ident')] = response_label_elem.find('.//mattext').text
+    return answer_choices_dict
+
+
+def final_conditions(item):
+    """
+    The respconditions that end response processing, i.e. the ones that mark a correct response.
+    """
+    return [respcondition_elem for respcondition_elem in item.find('resprocessing').findall('.//respcondition')
+            if respcondition_elem.get('continue') == "No"]
+
+
+def read_blanks(item):
+    """
+    Returns [(blank name, {response ident: response text})] for questions with several
+    blanks/dropdowns, where every response_lid of the presentation is one blank.
+    """
+    blanks = []
+    for response_lid_elem in item.find('presentation').findall('response_lid'):
+        blank_name = response_lid_elem.find('material').find('mattext').text
+        blanks.append((blank_name, read_choices(response_lid_elem)))
+    return blanks
+
+
+def read_varequals(item):
+    """
+    Returns the (respident, text) of every varequal in the item's response processing.
+    """
+    return [(varequal_elem.get('respident'), varequal_elem.text)
+            for varequal_elem in item.find('resprocessing').iter('varequal')]
+
+
+@handles('multiple_choice_question', 'multiple_choice_question')
+def handle_multiple_choice(item, item_record, store_graphics):
+    answer_choices_dict = read_choices(item.find('presentation').find('.//response_lid'))
+
+    # each response has an ID represented as "ident" in the XML
+    # the ID is used to know what the correct response is
+    correct_answer_ident = None
+    for respcondition_elem in final_conditions(item):
+        correct_answer_ident = respcondition_elem.find('.//varequal').text
+
+    for key, value in answer_choices_dict.items():
+        if key == correct_answer_ident:
+            # saves any graphic in the correct answer to the ansimg field
+            item_record.answer, item_record.ansimg = store_graphics(value)
+        else:
+            # saves any graphic in the option to the image field
+            item_record.options.append(ChoiceRecord(*store_graphics(value)))
+
+
+@handles('true_false_question', 'true_false_question')
+def handle_true_false(item, item_record, store_graphics):
+    answer_choices_dict = read_choices(item.find('presentation').find('.//response_lid'))
+
+    correct_answer_ident = None
+    for respcondition_elem in final_conditions(item):
+        correct_answer_ident = respcondition_elem.find('.//varequal').text
+
+    # only the correct answer is kept; the other choice is implied
+    if correct_answer_ident in answer_choices_dict:
+        item_record.answer, item_record.ansimg = store_graphics(answer_choices_dict[correct_answer_ident])
+
+
+@handles('short_answer_question', 'fill_in_the_blank')
+def handle_fill_in_the_blank(item, item_record, store_graphics):
+    # every accepted answer is an Answers entry
+    for respcondition_elem in final_conditions(item):
+        for varequal_elem in respcondition_elem.findall('.//varequal'):
+            item_record.answers.append(ChoiceRecord(*store_graphics(varequal_elem.text)))
+
+
+@handles('multiple_answers_question', 'multiple_selection')
+def handle_multiple_selection(item, item_record, store_graphics):
+    answer_choices_dict = read_choices(item.find('presentation').find('.//response_lid'))
+
+    correct_answer_ident_list = []
+    for respcondition_elem in final_conditions(item):
+        for varequal_elem in respcondition_elem.find('conditionvar').find('and').findall('varequal'):
+            correct_answer_ident_list.append(varequal_elem.text)
+
+    for key, value in answer_choices_dict.items():
+        if key in correct_answer_ident_list:
+            item_record.answers.append(ChoiceRecord(*store_graphics(value)))
+        else:
+            item_record.options.append(ChoiceRecord(*store_graphics(value)))
+
+
+@handles('matching_question', 'matching_question')  # this is explicitly stated in rubric to support
+def handle_matching(item, item_record, store_graphics):
+    # Canvas requires you to add at least one answer
+    node = item.find('presentation')
+    left_side_dict = {}
+    # find left sides
+    for response_lid_elem in node.findall('response_lid'):
+        left_side_dict[response_lid_elem.get('ident')] = response_lid_elem.find('material').find('mattext').text
+    # find right sides (every left side offers the same ones)
+    answer_choices_dict = read_choices(node.find('response_lid').find('render_choice'))
+
+    # now find out which ones are matching pairs
+    matching_pairs_dict = {}
+    right_side_keys_used = set()
+    for respcondition_elem in item.find('resprocessing').findall('respcondition'):
+        varequal_elem = respcondition_elem.find('conditionvar').find('varequal')
+        if varequal_elem is not None:
+            right_side_keys_used.add(varequal_elem.text)
+            matching_pairs_dict[left_side_dict.get(varequal_elem.get('respident'))] = \
+                answer_choices_dict.get(varequal_elem.text)
+
+    # save matching pairs. matching questions CANNOT have embedded graphics in responses
+    for key, value in matching_pairs_dict.items():
+        matching_pair_string = (key or "") + PAIR_SEPARATOR + (";;;;;" if value is None else value)
+        item_record.answers.append(ChoiceRecord(matching_pair_string))
+    # right sides that aren't part of a pair are distractors
+    for key, value in answer_choices_dict.items():
+        if key not in right_side_keys_used:
+            item_record.options.append(ChoiceRecord(value))
+
+
+@handles('essay_question', 'essay_question')
+def handle_essay(item, item_record, store_graphics):
+    # essay questions only have the prompt. may need to process feedbacks or comments later
+    pass
+
+
+@handles('numerical_question', 'numerical')
+def handle_numerical(item, item_record, store_graphics):
+    # every final respcondition is one accepted answer: an exact value, a range, or both
+    # (an exact value with a margin of error)
+    for respcondition_elem in final_conditions(item):
+        conditionvar = respcondition_elem.find('conditionvar')
+        exact_elem = conditionvar.find('.//varequal')
+        lower_elem = conditionvar.find('.//vargte')
+        if lower_elem is None:
+            lower_elem = conditionvar.find('.//vargt')
+        upper_elem = conditionvar.find('.//varlte')
+
+        exact = exact_elem.text if exact_elem is not None else None
+        lower = lower_elem.text if lower_elem is not None else None
+        upper = upper_elem.text if upper_elem is not None else None
+        if exact is not None and (lower is None or lower == upper == exact):
+            answer_text = exact
+        elif exact is not None:
+            answer_text = f"{exact} (accepts {lower} to {upper})"
+        else:
+            answer_text = f"{lower} to {upper}"
+        item_record.answers.append(ChoiceRecord(answer_text))
+
+
+@handles('calculated_question', 'calculated')
+def handle_calculated(item, item_record, store_graphics):
+    calculated = item.find('itemproc_extension').find('calculated')
+    formulas = calculated.find('formulas')
+    variables = [
+        {
+            "name": var_elem.get('name'),
+            "scale": var_elem.get('scale'),
+            "min": float(var_elem.findtext('min')),
+            "max": float(var_elem.findtext('max')),
+        }
+        for var_elem in calculated.find('vars').findall('var')
+    ]
+    # the example values Canvas generated, with the answer for each
+    var_sets = []
+    for var_set_elem in calculated.find('var_sets').findall('var_set'):
+        var_sets.append({
+            "values": {var_elem.get('name'): float(var_elem.text) for var_elem in var_set_elem.findall('var')},
+            "answer": float(var_set_elem.findtext('answer')),
+        })
+
+    answers = [var_set["answer"] for var_set in var_sets]
+    item_record.dynamic = DynamicRecord(
+        formula="; ".join(formula_elem.text for formula_elem in formulas.findall('formula')),
+        range_min=min(answers, default=0.0),
+        range_max=max(answers, default=0.0),
+        additional_params={
+            "answer_tolerance": calculated.findtext('answer_tolerance'),
+            "decimal_places": formulas.get('decimal_places'),
+            "vars": variables,
+            "var_sets": var_sets,
+        }
+    )
+
+
+@handles('fill_in_multiple_blanks_question', 'fill_in_multiple_blanks')
+def handle_fill_in_multiple_blanks(item, item_record, store_graphics):
+    # every response offered for a blank is an accepted answer, saved as "blank;;;;; answer"
+    for blank_name, choices in read_blanks(item):
+        for value in choices.values():
+            item_record.answers.append(ChoiceRecord((blank_name or "") + PAIR_SEPARATOR + (value or "")))
+
+
+@handles('multiple_dropdowns_question', 'multiple_dropdowns')
+def handle_multiple_dropdowns(item, item_record, store_graphics):
+    # the correct choice of each dropdown is an answer and the others are options,
+    # both saved as "dropdown;;;;; choice"
+    correct_choices = {(respident, text) for respident, text in read_varequals(item)}
+    response_lids = item.find('presentation').findall('response_lid')
+    for response_lid_elem, (blank_name, choices) in zip(response_lids, read_blanks(item)):
+        for key, value in choices.items():
+            choice = ChoiceRecord((blank_name or "") + PAIR_SEPARATOR + (value or ""))
+            if (response_lid_elem.get('ident'), key) in correct_choices:
+                item_record.answers.append(choice)
+            else:
+                item_record.options.append(choice)
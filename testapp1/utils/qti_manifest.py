@@ -0,0 +1,65 @@
+import urllib.parse
+
+# Canvas writes links to files inside the export as "$IMS-CC-FILEBASE$/<url-encoded path>"
+FILEBASE_PREFIX = "$IMS-CC-FILEBASE$/"
+ASSESSMENT_META_NAME = "assessment_meta.xml"
+
+
+class ZipManifest:
+    """
+    Index over the member names of a QTI zip, built once per upload.
+
+    Members are grouped by the folder they sit in, and every member is also indexed by
+    each of its path suffixes ("pic.png", "Uploaded Media/pic.png", ...), so an embedded
+    image can be found with one dictionary lookup instead of scanning the whole zip.
+    """
+
+    def __init__(self, names):
+        self.folders = {}  # "folder/" -> names of the files directly inside it
+        self.by_suffix = {}  # path suffix -> member name
+
+        for name in names:
+            if name.endswith("/"):
+                self.folders.setdefault(name, [])
+                continue
+
+            folder, slash, base_name = name.rpartition("/")
+            if slash:
+                self.folders.setdefault(folder + slash, []).append(name)
+
+            parts = name.split("/")
+            for index in range(len(parts)):
+                self.by_suffix["/".join(parts[index:])] = name
+
+    def assessments(self):
+        """
+        Yields (folder, meta_path, questions_path) for every folder that holds an assessment.
+        The metadata file is always named assessment_meta.xml. The questions file is named
+        after the assessment ident, which is also the folder name; if it is missing, the
+        folder's other XML file is used.
+        """
+        for folder, members in self.folders.items():
+            meta_path = folder + ASSESSMENT_META_NAME
+            if meta_path not in members:
+                continue
+
+            questions_path = folder + folder.rstrip("/").rpartition("/")[2] + ".xml"
+            if questions_path not in members:
+                other_xml_files = sorted(name for name in members if name.endswith(".xml") and name != meta_path)
+                if not other_xml_files:
+                    continue
+                questions_path = other_xml_files[0]
+
+            yield folder, meta_path, questions_path
+
+    def find_file(self, src):
+        """
+        Returns the member name an <img> src points at, or None if the zip doesn't have it.
+        src is the raw attribute value, e.g. "$IMS-CC-FILEBASE$/Uploaded%20Media/pic.png".
+        """
+        if not src:
+            return None
+        if src.startswith(FILEBASE_PREFIX):
+            src = src[len(FILEBASE_PREFIX):]
+        src = src.split("?")[0]  # Canvas sometimes appends download flags to the link
+        return self.by_suffix.get(urllib.parse.unquote(src).lstrip("/"))
@@ -0,0 +1,200 @@
+import hashlib
+import json
+import posixpath
+import zipfile
+
+from django.core.files import File
+
+from testapp1.storage import content_addressed_storage
+from testapp1.utils.html_assets import rewrite_images
+from testapp1.utils.import_metrics import ImportMetrics, phase
+from testapp1.utils.qti_handlers import QUESTION_HANDLERS
+from testapp1.utils.qti_manifest import ZipManifest
+from testapp1.utils.qti_records import AssessmentRecord, ItemRecord
+from testapp1.utils.qti_stream import QtiItemStream, read_description
+
+"""
+Turns one assessment folder of a QTI 1.2 zip into records (testapp1/utils/qti_records.py),
+without touching the database. The records can be pickled, so folders can be parsed in
+worker processes while the main process writes the results in order. What is read from each
+item depends on its question type; see testapp1/utils/qti_handlers.py.
+"""
+
+HASH_CHUNK_SIZE = 64 * 1024  # bytes read at a time while hashing a zip member
+
+
+class HashingReader:
+    """
+    Wraps a binary file so that everything read through it is also fed to a hash.
+    """
+
+    def __init__(self, file, hasher):
+        self.file = file
+        self.hasher = hasher
+
+    def read(self, size=-1):
+        data = self.file.read(size)
+        self.hasher.update(data)
+        return data
+
+
+def read_assessment_key(zip_ref, meta_path, questions_path):
+    """
+    Returns (ident, content_hash) for an assessment folder without parsing its items.
+    The hash covers both XML files, so it changes whenever anything in the assessment changes.
+    Both files are read in chunks, and the ident is picked up from the same pass.
+    """
+    hasher = hashlib.sha256()
+    with zip_ref.open(meta_path) as meta_file:
+        reader = HashingReader(meta_file, hasher)
+        while reader.read(HASH_CHUNK_SIZE):
+            pass
+    hasher.update(b"\0")  # keeps the boundary between the two files part of the hash
+    with zip_ref.open(questions_path) as questions_file:
+        reader = HashingReader(questions_file, hasher)
+        ident = QtiItemStream(reader).ident  # only reads up to the <assessment> tag
+        while reader.read(HASH_CHUNK_SIZE):
+            pass
+    return ident, hasher.hexdigest()
+
+
+def item_content_hash(item_record):
+    """
+    Hash of everything an item record stores on its question, options and answers.
+    """
+    return hashlib.sha256(json.dumps(item_record.content(), sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class AssessmentParser:
+    """
+    Parses assessment folders out of one open zip.
+    Embedded images are copied into content-addressed storage as they are found. Storing
+    is idempotent, so several parsers (even in different processes) can store the same image.
+    """
+
+    def __init__(self, zip_ref, zip_manifest, image_storage=content_addressed_storage, metrics=None):
+        self.zip_ref = zip_ref
+        self.zip_manifest = zip_manifest
+        self.image_storage = image_storage
+        self.metrics = metrics  # ImportMetrics the parsing phases are recorded in, if any
+        self.stored_image_names = {}  # zip member name -> name of the stored file
+
+    def store_embedded_graphics(self, text_q):
+        """
+        Saves every image embedded in text_q and rewrites its src to point at the saved copy.
+        Returns (new_text, name of the first stored image or None). The HTML is scanned once,
+        and text without an <img> isn't scanned at all.
+        """
+        first_image_name = None
+
+        def store_image(image_reference):
+            nonlocal first_image_name
+            # decodes the "$IMS-CC-FILEBASE$/..." path and looks it up in the zip index
+            potential_image_name = self.zip_manifest.find_file(image_reference.src)
+            if potential_image_name is None:
+                print('Desired image not found')  # used for debugging
+                return None
+
+            # each zip member is stored once per upload. the storage names files after the hash of their
+            # contents (hashed while streaming out of the zip), so identical images share one file on disk
+            stored_name = self.stored_image_names.get(potential_image_name)
+            if stored_name is None:
+                with phase(self.metrics, "media_write"), \
+                        self.zip_ref.open(potential_image_name) as desired_img_file:  # open the image file
+                    stored_name = self.image_storage.save(posixpath.basename(potential_image_name),
+                                                          File(desired_img_file))
+                self.stored_image_names[potential_image_name] = stored_name
+
+            if first_image_name is None:
+                first_image_name = stored_name
+            return self.image_storage.url(stored_name)
+
+        with phase(self.metrics, "html_rewrite"):
+            new_text, image_references = rewrite_images(text_q, store_image)
+        return new_text, first_image_name
+
+    def parse(self, folder_name, meta_path, questions_path):
+        """
+        Parses one assessment folder into an AssessmentRecord.
+        """
+        with phase(self.metrics, "xml_parse"):
+            return self.parse_folder(folder_name, meta_path, questions_path)
+
+    def parse_folder(self, folder_name, meta_path, questions_path):
+        assessment = AssessmentRecord(folder_name)
+
+        # only the description is needed from the metadata file, so parsing stops right after it
+        with self.zip_ref.open(meta_path) as meta_file:
+            assessment.description = read_description(meta_file)
+
+        with self.zip_ref.open(questions_path) as questions_file:
+            # items are streamed one at a time (namespaces are stripped on the fly)
+            # instead of loading the whole tree into memory
+            item_stream = QtiItemStream(questions_file)
+            if item_stream.assessment is None:
+                assessment.error = f"Element 'assessment' not found in {questions_path}"
+                return assessment
+
+            assessment.ident = item_stream.ident
+            assessment.title = item_stream.title  # test name
+
+            for section_number, item in item_stream:
+                if not assessment.sections or assessment.sections[-1] != section_number:
+                    assessment.sections.append(section_number)
+                assessment.items_seen += 1  # unsupported question types are counted but not imported
+                item_record = self.parse_item(section_number, item)
+                if item_record is not None:
+                    assessment.items.append(item_record)
+
+        return assessment
+
+    def parse_item(self, section_number, item):
+        """
+        Returns the ItemRecord for one <item>, or None if its question type has no handler.
+        """
+        # all useful metadata fields are found in the fieldentry elements under itemmetadata
+        qti_metadata_fields = item.find('itemmetadata').findall(".//fieldentry")
+        the_question_type = qti_metadata_fields[0].text
+
+        question_handler = QUESTION_HANDLERS.get(the_question_type)
+        if question_handler is None:
+            return None
+
+        # question_text_field contains the question prompt text
+        question_text_field = item.find('presentation').find('material').find(".//mattext").text
+        item_record = ItemRecord(item.get('ident'), section_number, question_handler.stored_type,
+                                 question_text_field, float(qti_metadata_fields[1].text))
+        # this saves any embedded graphics in the text to the img field and points the text at the
+        # saved copies. text without an <img> is left as it is.
+        item_record.text, item_record.img = self.store_embedded_graphics(question_text_field)
+
+        with phase(self.metrics, f"item:{question_handler.stored_type}"):
+            question_handler.handle(item, item_record, self.store_embedded_graphics)
+
+        item_record.content_hash = item_content_hash(item_record)
+        return item_record
+
+
+# each worker process keeps the zip it is working on open between tasks
+worker_parsers = {}
+
+
+def parse_folder_in_worker(zip_path, image_storage, trace_memory, folder_name, meta_path, questions_path):
+    """
+    Entry point for process pool workers: parses one assessment folder of the zip at zip_path.
+    Returns (assessment record, phases measured while parsing it).
+    """
+    parser = worker_parsers.get(zip_path)
+    if parser is None:
+        for old_parser in worker_parsers.values():
+            old_parser.zip_ref.close()
+        worker_parsers.clear()
+        zip_ref = zipfile.ZipFile(zip_path, 'r')
+        parser = worker_parsers[zip_path] = AssessmentParser(zip_ref, ZipManifest(zip_ref.namelist()),
+                                                             image_storage=image_storage)
+
+    # tracing, once started, stays on for the life of the worker process, which parses for this import only
+    parser.metrics = ImportMetrics(trace_memory=trace_memory)
+    parser.metrics.start(reuse_tracing=True)
+    assessment = parser.parse(folder_name, meta_path, questions_path)
+    return assessment, parser.metrics.as_dict()
@@ -0,0 +1,97 @@
+"""
+Plain records for parsed QTI content, kept apart from the Django models so that parsing can
+run (and be timed or tested) without a database. The records use __slots__ to stay small,
+and they pickle, so worker processes can send them back to the process that writes them.
+
+Image values are names in content-addressed storage, ready to assign to the image fields.
+"""
+
+
+class ChoiceRecord:
+    """
+    One option or answer of a question: its text and the name of its stored image, if any.
+    """
+    __slots__ = ("text", "image")
+
+    def __init__(self, text, image=None):
+        self.text = text
+        self.image = image
+
+
+class DynamicRecord:
+    """
+    The formula and variables of a calculated question (see DynamicQuestionParameter).
+    """
+    __slots__ = ("formula", "range_min", "range_max", "additional_params")
+
+    def __init__(self, formula, range_min, range_max, additional_params=None):
+        self.formula = formula
+        self.range_min = range_min
+        self.range_max = range_max
+        self.additional_params = additional_params
+
+
+class ItemRecord:
+    """
+    One parsed <item>. qtype is the type stored on the question, not the QTI type.
+    """
+    __slots__ = ("ident", "content_hash", "section_number", "qtype", "text", "points", "answer", "img", "ansimg",
+                 "options", "answers", "dynamic")
+
+    def __init__(self, ident, section_number, qtype, text, points):
+        self.ident = ident
+        self.content_hash = None
+        self.section_number = section_number
+        self.qtype = qtype
+        self.text = text
+        self.points = points
+        self.answer = None
+        self.img = None
+        self.ansimg = None
+        self.options = []  # ChoiceRecords
+        self.answers = []  # ChoiceRecords
+        self.dynamic = None  # DynamicRecord, for calculated questions
+
+    def content(self):
+        """
+        Everything the record stores on its question, options and answers, as plain data
+        (used for the content hash). The section is left out, since moving an item doesn't
+        change the question itself.
+        """
+        content = {
+            "ident": self.ident,
+            "qtype": self.qtype,
+            "text": self.text,
+            "points": self.points,
+            "answer": self.answer,
+            "img": self.img,
+            "ansimg": self.ansimg,
+            "options": [{"text": option.text, "image": option.image} for option in self.options],
+            "answers": [{"text": answer.text, "answer_graphic": answer.image} for answer in self.answers],
+        }
+        if self.dynamic is not None:
+            content["dynamic"] = {
+                "formula": self.dynamic.formula,
+                "range_min": self.dynamic.range_min,
+                "range_max": self.dynamic.range_max,
+                "additional_params": self.dynamic.additional_params,
+            }
+        return content
+
+
+class AssessmentRecord:
+    """
+    One parsed assessment folder. error is set (and items left empty) if the folder
+    couldn't be parsed; items_seen also counts items of unsupported types.
+    """
+    __slots__ = ("folder", "ident", "title", "description", "error", "items_seen", "sections", "items")
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.ident = None
+        self.title = None
+        self.description = None
+        self.error = None
+        self.items_seen = 0
+        self.sections = []  # numbers of the sections holding items, in document order
+        self.items = []  # ItemRecords
@@ -0,0 +1,95 @@
+import xml.etree.ElementTree as ET
+
+
+def strip_namespace(tag):
+    """
+    Returns the tag without its "{namespace}" prefix.
+    """
+    if "}" in tag:
+        return tag.split("}")[-1]
+    return tag
+
+
+def read_description(meta_file):
+    """
+    Returns the text of the first <description> element in an assessment_meta.xml file.
+    Parsing stops as soon as the element is closed, so the rest of the file is never read.
+    """
+    for event, elem in ET.iterparse(meta_file, events=("end",)):
+        if strip_namespace(elem.tag) == "description":
+            return elem.text
+    return None
+
+
+class QtiItemStream:
+    """
+    Streams the <item> elements of a QTI 1.2 questions file one at a time.
+
+    Namespaces are stripped while parsing, so the yielded items can be searched with
+    plain tag names (item.find('presentation'), etc.). Once the caller moves on to the
+    next item, the previous one is cleared and detached from the tree, which keeps memory
+    flat no matter how many items the assessment holds.
+
+    Creating the stream reads up to the opening <assessment> tag, so the test title and
+    ident are available before any item is parsed. If the file has no assessment element,
+    assessment is None and iterating yields nothing.
+    """
+
+    def __init__(self, source):
+        self._events = ET.iterparse(source, events=("start", "end"))
+        self._open_elements = []  # elements that have started but not ended yet
+        self.assessment = None
+
+        for event, elem in self._events:
+            if event == "start":
+                elem.tag = strip_namespace(elem.tag)
+                self._open_elements.append(elem)
+                if elem.tag == "assessment":
+                    self.assessment = elem
+                    break
+            else:
+                self._open_elements.pop()
+
+    @property
+    def title(self):
+        return self.assessment.get("title") if self.assessment is not None else None
+
+    @property
+    def ident(self):
+        return self.assessment.get("ident") if self.assessment is not None else None
+
+    def __iter__(self):
+        """
+        Yields (section_number, item) pairs in document order.
+        Sections are numbered from 1 in the order they are opened, and an item belongs
+        to the innermost section around it.
+        """
+        if self.assessment is None:
+            return
+
+        number_of_sections = 0
+        section_numbers = []  # numbers of the sections currently open
+
+        for event, elem in self._events:
+            if event == "start":
+                elem.tag = strip_namespace(elem.tag)
+                self._open_elements.append(elem)
+                if elem.tag == "section":
+                    number_of_sections += 1
+                    section_numbers.append(number_of_sections)
+                continue
+
+            self._open_elements.pop()
+            if elem.tag == "item":
+                yield (section_numbers[-1] if section_numbers else 0), elem
+            elif elem.tag == "section":
+                section_numbers.pop()
+            elif elem.tag == "assessment":
+                return
+            else:
+                continue
+
+            # the item (or section) is finished, so drop it from memory
+            elem.clear()
+            if self._open_elements:
+                self._open_elements[-1].remove(elem)
@@ -1,18 +1,445 @@
-import xml.etree.ElementTree as ET
+import multiprocessing
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 
-def parse_qti(qti_file_path):
+from django.conf import settings
+from django.db import transaction
+
+from testapp1.models import (Test, TestPart, TestSection, TestQuestion, Question, Options, Answers,
+                             DynamicQuestionParameter)
+from testapp1.storage import content_addressed_storage
+from testapp1.utils.import_metrics import ImportMetrics, log_import
+from testapp1.utils.qti_bulk import BulkImportWriter
+from testapp1.utils.qti_manifest import ZipManifest
+from testapp1.utils.qti_parser import AssessmentParser, parse_folder_in_worker, read_assessment_key
+from testapp1.utils.zip_limits import check_zip_limits
+
+
+class QtiImporter:
     """
-    Parses a QTI XML file and extracts questions.
+    Imports a Canvas QTI 1.2 zip (one folder per assessment) into a course.
+    This supports QTI version 1.2 only.
+
+    Each assessment folder is parsed into plain records (testapp1/utils/qti_parser.py) and the
+    records are then written to the database, one assessment at a time and in zip order.
+    With parse_workers > 1 the folders are parsed in a process pool while this process does
+    the writes, so the result is the same as a serial import. parse_workers defaults to
+    settings.QTI_IMPORT_PARSE_WORKERS.
+
+    Imports are incremental: every Test remembers its assessment ident and a hash of the
+    assessment XML, so re-uploading an export skips unchanged assessments and updates changed
+    ones in place instead of creating a second copy.
+
+    Every import is measured phase by phase (wall time, CPU time, peak memory, queries); the
+    measurements are part of the summary run() returns and are logged to the import log.
+
+    Every assessment is committed on its own. checkpoint holds the idents of assessments an
+    earlier run already committed; they are skipped, so a retried import resumes where the
+    last one stopped. save_checkpoint, if given, is called as save_checkpoint(importer, ident)
+    inside the transaction that commits each assessment, so it can record the ident with it.
+
+    progress, if given, is called as progress(importer) after every assessment, so a caller can
+    read items_processed, assessments_processed and current_assessment while the import runs.
     """
-    tree = ET.parse(qti_file_path)
-    root = tree.getroot()
 
-    node = root.find('assessment')
-    attrib_dict = node.attrib
-    print(node.attrib)
+    def __init__(self, course, user=None, progress=None, parse_workers=None, image_storage=content_addressed_storage,
+                 checkpoint=(), save_checkpoint=None):
+        self.course = course
+        self.user = user  # becomes the author of the imported questions
+        self.progress = progress
+        self.checkpoint = set(checkpoint)  # idents of assessments an earlier, interrupted run already committed
+        self.save_checkpoint = save_checkpoint
+        self.image_storage = image_storage  # where embedded images are saved
+        if parse_workers is None:
+            parse_workers = getattr(settings, 'QTI_IMPORT_PARSE_WORKERS', 1)
+        self.parse_workers = parse_workers
+
+        self.items_processed = 0
+        self.assessments_processed = 0
+        self.current_assessment = None
+        self.errors = []
+
+        # what the import did, by assessment and by item
+        self.added = 0
+        self.updated = 0
+        self.skipped = 0
+        self.resumed = 0  # assessments skipped because they are in the checkpoint
+        self.items_added = 0
+        self.items_updated = 0
+        self.items_removed = 0
+        self.duplicates = 0  # questions linked to a near-duplicate already in the textbook or course
+
+        # time, memory and queries of every import phase (see testapp1/utils/import_metrics.py)
+        self.metrics = ImportMetrics(trace_memory=getattr(settings, 'QTI_IMPORT_TRACE_MEMORY', False))
+
+        self.existing_tests = {}  # assessment ident -> Test already imported into this course
+        self.content_hashes = {}  # folder -> content hash of the assessments that will be imported
+        self.folder_idents = {}  # folder -> assessment ident
+
+    def run(self, zip_source):
+        """
+        Imports every assessment in the zip. zip_source is a path or a file object; parallel
+        parsing needs a path, since every worker process opens the zip itself.
+        Returns a summary dict of what was imported, with the metrics of every import phase.
+        The summary is also written to the import log.
+        """
+        start_time = time.perf_counter()
+        error = None
+        self.metrics.start()
+        try:
+            with self.metrics.measure_queries(), self.metrics.phase("total"):
+                self.import_zip(zip_source)
+        except Exception as import_error:
+            error = f"{type(import_error).__name__}: {import_error}"
+            raise
+        finally:
+            self.metrics.stop()
+            self.current_assessment = None
+            summary = self.summary(time.perf_counter() - start_time)
+            log_import({
+                "source": os.path.basename(os.fspath(zip_source)) if isinstance(zip_source, (str, os.PathLike))
+                else getattr(zip_source, 'name', None),
+                "course": self.course.pk,
+                "error": error,
+                **summary
+            })
+        return summary
+
+    def import_zip(self, zip_source):
+        # uploads are checked when they arrive, but zips can also come from other callers
+        with self.metrics.phase("zip_check"):
+            check_zip_limits(zip_source)
+            if hasattr(zip_source, 'seek'):
+                zip_source.seek(0)
+
+        with self.metrics.phase("zip_open"):
+            zip_ref = zipfile.ZipFile(zip_source, 'r')
+        with zip_ref:
+            with self.metrics.phase("manifest"):
+                # index the zip members once, instead of scanning every name for every folder and image
+                zip_manifest = ZipManifest(zip_ref.namelist())
+                # every assessment is a folder holding assessment_meta.xml and the questions file
+                assessment_folders = list(zip_manifest.assessments())
+            with self.metrics.phase("change_detection"):
+                assessment_folders = self.skip_unchanged(zip_ref, assessment_folders)
+
+            for assessment in self.parse_assessments(zip_source, zip_ref, zip_manifest, assessment_folders):
+                with self.metrics.phase("db_write"):
+                    self.save_assessment(assessment)
+
+    def summary(self, elapsed_seconds):
+        return {
+            "assessments": self.assessments_processed,
+            "items": self.items_processed,
+            "added": self.added,
+            "updated": self.updated,
+            "skipped": self.skipped,
+            "resumed": self.resumed,
+            "items_added": self.items_added,
+            "items_updated": self.items_updated,
+            "items_removed": self.items_removed,
+            "duplicates": self.duplicates,
+            "errors": self.errors,
+            "elapsed_seconds": round(elapsed_seconds, 3),
+            "metrics": self.metrics.as_dict(),
+        }
+
+    def skip_unchanged(self, zip_ref, assessment_folders):
+        """
+        Returns the assessment folders that still have to be imported.
+        A folder is skipped when this course already has a test with the same assessment ident
+        and content hash, i.e. the teacher re-uploaded an export with that assessment unchanged.
+        Only the XML is hashed here, so skipped folders are never parsed.
+        """
+        assessment_keys = [read_assessment_key(zip_ref, meta_path, questions_path)
+                           for folder_name, meta_path, questions_path in assessment_folders]
+
+        idents = [ident for ident, content_hash in assessment_keys
+                  if ident is not None and ident not in self.checkpoint]
+        for test in Test.objects.filter(course=self.course, qti_ident__in=idents).order_by('pk'):
+            self.existing_tests.setdefault(test.qti_ident, test)
+
+        folders_to_import = []
+        for folder, (ident, content_hash) in zip(assessment_folders, assessment_keys):
+            self.folder_idents[folder[0]] = ident
+            if ident is not None and ident in self.checkpoint:
+                self.resumed += 1
+                continue
+            existing_test = self.existing_tests.get(ident)
+            if existing_test is not None and existing_test.qti_content_hash == content_hash:
+                self.skipped += 1
+                continue
+            self.content_hashes[folder[0]] = content_hash
+            folders_to_import.append(folder)
+        return folders_to_import
+
+    def parse_assessments(self, zip_source, zip_ref, zip_manifest, assessment_folders):
+        """
+        Yields the parsed record of every assessment folder, in zip order.
+        """
+        worker_count = min(self.parse_workers, len(assessment_folders))
+        if worker_count > 1 and isinstance(zip_source, (str, os.PathLike)):
+            # "spawn" keeps the workers independent of the threads and DB connections of this process
+            with ProcessPoolExecutor(max_workers=worker_count,
+                                     mp_context=multiprocessing.get_context('spawn')) as pool:
+                # map() hands results back in submission order, so writes happen in zip order
+                for assessment, worker_phases in pool.map(parse_folder_in_worker, repeat(os.fspath(zip_source)),
+                                                          repeat(self.image_storage),
+                                                          repeat(self.metrics.trace_memory),
+                                                          *zip(*assessment_folders)):
+                    # worker phases are added up over all workers, so they can exceed the wall time
+                    self.metrics.merge(worker_phases)
+                    yield assessment
+            return
+
+        parser = AssessmentParser(zip_ref, zip_manifest, image_storage=self.image_storage, metrics=self.metrics)
+        for folder_name, assessment_meta_path, questions_file_path in assessment_folders:
+            self.current_assessment = folder_name.rstrip('/')
+            self.report_progress()
+            yield parser.parse(folder_name, assessment_meta_path, questions_file_path)
+
+    def report_progress(self):
+        if self.progress is not None:
+            self.progress(self)
+
+    # creates a new question record/entry. it is written to the database later by the BulkImportWriter
+    def create_question(self, g_course, item_record):
+        temp_question_instance = Question(
+            course=g_course,
+            # this is because, logically, when questions/tests are uploaded to a course, are they not part of it?
+            qti_ident=item_record.ident
+        )
+        self.fill_question(temp_question_instance, item_record)
+
+        # checks if user is logged in
+        if self.user is not None and self.user.is_authenticated:
+            temp_question_instance.author = self.user  # sets to the current user
+
+        return temp_question_instance
+
+    # copies the imported content of an item onto a question, new or existing
+    def fill_question(self, question_instance, item_record):
+        question_instance.qtype = item_record.qtype
+        question_instance.text = item_record.text
+        question_instance.score = item_record.points
+        question_instance.answer = item_record.answer
+        question_instance.img = item_record.img
+        question_instance.ansimg = item_record.ansimg
+        question_instance.qti_content_hash = item_record.content_hash
+
+    def add_item(self, import_writer, test_instance, test_section, item_record):
+        """
+        Queues a new question for an item, with its place in the test and its options and answers.
+        """
+        question_instance = import_writer.add(self.create_question(self.course, item_record))
+        import_writer.add(TestQuestion(
+            test=test_instance,
+            question=question_instance,
+            assigned_points=item_record.points,
+            section=test_section
+        ))
+        self.add_choices(import_writer, question_instance, item_record)
+        if item_record.dynamic is not None:
+            import_writer.add(self.fill_dynamic_parameters(
+                DynamicQuestionParameter(question=question_instance), item_record.dynamic))
+
+    # copies the formula and variables of a calculated question onto its DynamicQuestionParameter
+    def fill_dynamic_parameters(self, dynamic_parameters, dynamic_record):
+        dynamic_parameters.formula = dynamic_record.formula
+        dynamic_parameters.range_min = dynamic_record.range_min
+        dynamic_parameters.range_max = dynamic_record.range_max
+        dynamic_parameters.additional_params = dynamic_record.additional_params
+        return dynamic_parameters
+
+    def add_choices(self, import_writer, question_instance, item_record):
+        for option_record in item_record.options:
+            import_writer.add(Options(
+                question=question_instance,
+                text=option_record.text,
+                image=option_record.image
+            ))
+        for answer_record in item_record.answers:
+            import_writer.add(Answers(
+                question=question_instance,
+                text=answer_record.text,
+                answer_graphic=answer_record.image
+            ))
+
+    def save_assessment(self, assessment):
+        """
+        Writes one parsed assessment to the database: a new Test with its part, sections and
+        questions, or, if the assessment was imported before, an update of that Test.
+        """
+        if assessment.error is not None:
+            self.errors.append(assessment.error)
+            return
+
+        self.current_assessment = assessment.title
+
+        # every row of this assessment is collected here and written in one transaction at the end,
+        # so a failure part way through leaves nothing half-imported
+        import_writer = BulkImportWriter()
+
+        existing_test = self.existing_tests.get(assessment.ident)
+        if existing_test is None:
+            test_instance = self.add_assessment(import_writer, assessment)
+            self.added += 1
+        else:
+            test_instance = self.update_assessment(import_writer, existing_test, assessment)
+            self.updated += 1
+
+        # write the whole assessment to the database. the checkpoint is saved in the same transaction,
+        # so it lists exactly the assessments that are committed
+        with transaction.atomic():
+            import_writer.save()
+            self.duplicates += import_writer.duplicates
+            if self.save_checkpoint is not None and assessment.ident is not None:
+                self.save_checkpoint(self, assessment.ident)
+        if assessment.ident is not None:
+            # if the zip holds the same assessment twice, the second copy updates the first
+            self.existing_tests[assessment.ident] = test_instance
+        self.assessments_processed += 1
+        self.items_processed += assessment.items_seen
+        self.report_progress()
+
+    def add_assessment(self, import_writer, assessment):
+        the_course = self.course
+
+        # Create a new Test record
+        test_instance = import_writer.add(Test(
+            course=the_course,
+            textbook=the_course.textbook,
+            name=assessment.title,
+            qti_ident=assessment.ident,
+            qti_content_hash=self.content_hashes.get(assessment.folder)
+        ))
+        test_part_instance = import_writer.add(TestPart(
+            test=test_instance
+        ))
+        test_sections = {}
+        for section_number in assessment.sections:
+            test_sections[section_number] = import_writer.add(TestSection(
+                part=test_part_instance,
+                section_number=section_number
+            ))
+
+        for item_record in assessment.items:
+            self.add_item(import_writer, test_instance, test_sections[item_record.section_number], item_record)
+            self.items_added += 1
+        return test_instance
+
+    def update_assessment(self, import_writer, test_instance, assessment):
+        """
+        Brings an imported test up to date with a changed assessment, item by item.
+        Items are matched to questions by their QTI ident: unchanged items are left alone,
+        changed ones are updated in place (their options and answers are replaced), new ones
+        are added and ones no longer in the assessment are removed. Questions a teacher added
+        to the test by hand have no ident and are never touched.
+        """
+        test_instance.name = assessment.title
+        test_instance.qti_content_hash = self.content_hashes.get(assessment.folder)
+        import_writer.update(test_instance, 'name', 'qti_content_hash')
+
+        test_part_instance = TestPart.objects.filter(test=test_instance).order_by('part_number', 'pk').first()
+        test_sections = {}
+        if test_part_instance is None:
+            test_part_instance = import_writer.add(TestPart(test=test_instance))
+        else:
+            for test_section in TestSection.objects.filter(part=test_part_instance).order_by('pk'):
+                test_sections.setdefault(test_section.section_number, test_section)
+        old_sections = list(test_sections.values())
+        for section_number in assessment.sections:
+            if section_number not in test_sections:
+                test_sections[section_number] = import_writer.add(TestSection(
+                    part=test_part_instance,
+                    section_number=section_number
+                ))
+
+        # the imported questions already in the test, by item ident
+        imported_test_questions = {}
+        stale_test_questions = []
+        kept_section_ids = set()  # sections still used by questions added by hand
+        for test_question in TestQuestion.objects.filter(test=test_instance).select_related('question'):
+            item_ident = test_question.question.qti_ident
+            if item_ident is None:
+                kept_section_ids.add(test_question.section_id)
+            elif item_ident in imported_test_questions:
+                stale_test_questions.append(test_question)
+            else:
+                imported_test_questions[item_ident] = test_question
+
+        changed_items = {}  # question ID -> item record, for questions whose item changed
+        for item_record in assessment.items:
+            test_section = test_sections[item_record.section_number]
+            test_question = imported_test_questions.pop(item_record.ident, None)
+            if test_question is None:
+                self.add_item(import_writer, test_instance, test_section, item_record)
+                self.items_added += 1
+                continue
+
+            question_instance = test_question.question
+            if question_instance.qti_content_hash != item_record.content_hash:
+                self.fill_question(question_instance, item_record)
+                import_writer.update(question_instance, 'qtype', 'text', 'score', 'answer', 'img', 'ansimg',
+                                     'qti_content_hash')
+                changed_items[question_instance.pk] = item_record
+                self.add_choices(import_writer, question_instance, item_record)
+                self.items_updated += 1
 
+            if test_question.section_id != test_section.pk or test_question.assigned_points != item_record.points:
+                test_question.section = test_section
+                test_question.assigned_points = item_record.points
+                import_writer.update(test_question, 'section', 'assigned_points')
 
+        # the old options and answers of changed questions are replaced by the ones added above
+        if changed_items:
+            import_writer.delete(Options, Options.objects.filter(
+                question_id__in=changed_items).values_list('pk', flat=True))
+            import_writer.delete(Answers, Answers.objects.filter(
+                question_id__in=changed_items).values_list('pk', flat=True))
+            self.update_dynamic_parameters(import_writer, changed_items)
 
+        # items that are gone from the assessment. a question that another test also uses is only
+        # taken out of this test, otherwise the question itself is deleted
+        stale_test_questions.extend(imported_test_questions.values())
+        if stale_test_questions:
+            shared_question_ids = set(TestQuestion.objects.filter(
+                question_id__in=[test_question.question_id for test_question in stale_test_questions]
+            ).exclude(test=test_instance).values_list('question_id', flat=True))
+            import_writer.delete(TestQuestion, [test_question.pk for test_question in stale_test_questions
+                                                if test_question.question_id in shared_question_ids])
+            import_writer.delete(Question, {test_question.question_id for test_question in stale_test_questions
+                                            if test_question.question_id not in shared_question_ids})
+            self.items_removed += len(stale_test_questions)
 
+        # sections that no question uses anymore
+        import_writer.delete(TestSection, [test_section.pk for test_section in old_sections
+                                           if test_section.section_number not in assessment.sections
+                                           and test_section.pk not in kept_section_ids])
+        return test_instance
 
-    return
\ No newline at end of file
+    def update_dynamic_parameters(self, import_writer, changed_items):
+        """
+        Updates, adds or removes the dynamic parameters of changed questions. A question has at most
+        one, so an existing row is updated rather than replaced.
+        """
+        existing_parameters = {
+            dynamic_parameters.question_id: dynamic_parameters
+            for dynamic_parameters in DynamicQuestionParameter.objects.filter(question_id__in=changed_items)
+        }
+        stale_parameter_ids = []
+        for question_id, item_record in changed_items.items():
+            dynamic_parameters = existing_parameters.get(question_id)
+            if item_record.dynamic is None:
+                if dynamic_parameters is not None:
+                    stale_parameter_ids.append(dynamic_parameters.pk)
+            elif dynamic_parameters is None:
+                import_writer.add(self.fill_dynamic_parameters(
+                    DynamicQuestionParameter(question_id=question_id), item_record.dynamic))
+            else:
+                import_writer.update(self.fill_dynamic_parameters(dynamic_parameters, item_record.dynamic),
+                                     'formula', 'range_min', 'range_max', 'additional_params')
+        import_writer.delete(DynamicQuestionParameter, stale_parameter_ids)
@@ -0,0 +1,182 @@
+import hashlib
+import random
+import re
+import struct
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection
+
+from testapp1.models import Question, QuestionLshBucket, QuestionSignature
+from testapp1.utils.question_search import plain_texts
+
+"""
+Near-duplicate question detection.
+
+Every question gets a MinHash signature of its plain text (prompt, answer, options and answers,
+without HTML, so copies that differ in whitespace, markup or image URLs look the same). The share
+of equal values in two signatures estimates how many of their 3-word shingles the questions have in
+common (Jaccard similarity). The signature is cut into bands, and each band is hashed into a
+bucket (locality-sensitive hashing): questions that are alike almost always share a bucket, and
+questions that aren't rarely do. So a question is only compared with the questions sharing one
+of its buckets instead of with the whole bank. The buckets of a batch of questions are written
+first and joined with the ones already stored, so finding the candidates of every question in
+the batch takes one indexed query.
+
+Questions are compared within their scope: their textbook (their course's textbook, for
+teacher questions) or else their course. A question at least settings.DUPLICATE_QUESTION_SIMILARITY
+alike an older one is linked to the oldest question of that one's cluster (QuestionSignature.duplicate_of).
+The QTI importer does this for every question it writes; `manage.py cluster_duplicates` does it for
+a whole bank.
+"""
+
+SHINGLE_SIZE = 3  # words per shingle
+NUM_PERMUTATIONS = 64  # values per signature
+# questions with all 4 values of any of the 16 bands equal are compared: questions 80% alike
+# almost always (99.98%) share a band, questions 30% alike 12% of the time
+BANDS = 16
+ROWS_PER_BAND = NUM_PERMUTATIONS // BANDS
+# questions signed at a time: a batch takes the same handful of queries however many questions it has,
+# and their IDs are query parameters, which SQLite may allow only 999 of
+SIGN_BATCH_SIZE = 500
+
+MAX_HASH = (1 << 32) - 1
+
+
+def make_permutations(count, seed=499):
+    # each value of a signature is the smallest shingle hash XORed with one of these masks. XOR with a
+    # random mask reorders the (already random) hashes about as well as a * x + b mod p does, at a third of
+    # the cost. the masks must never change, or the stored signatures can't be compared with new ones any
+    # more, hence the fixed seed
+    generator = random.Random(seed)
+    return [generator.getrandbits(64) for _ in range(count)]
+
+
+PERMUTATIONS = make_permutations(NUM_PERMUTATIONS)
+
+
+def stable_hash(data, signed=False):
+    # hash() is salted per process, so a hash that can be stored is made from blake2b
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little", signed=signed)
+
+
+def shingles(text):
+    words = re.findall(r"\w+", text.lower())
+    if len(words) <= SHINGLE_SIZE:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[start:start + SHINGLE_SIZE]) for start in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def minhash(text):
+    """
+    Returns the signature of text (NUM_PERMUTATIONS 32-bit values), or None if it has no words.
+    """
+    hashes = [stable_hash(shingle.encode()) for shingle in shingles(text)]
+    if not hashes:
+        return None
+    return [min(map(mask.__xor__, hashes)) & MAX_HASH for mask in PERMUTATIONS]
+
+
+def pack_signature(signature):
+    return struct.pack(f"<{NUM_PERMUTATIONS}I", *signature)
+
+
+def unpack_signature(data):
+    return list(struct.unpack(f"<{NUM_PERMUTATIONS}I", bytes(data)))
+
+
+def band_buckets(signature):
+    # the band number is hashed in too, so equal values in different bands aren't a match
+    return [
+        stable_hash(struct.pack(f"<H{ROWS_PER_BAND}I", band,
+                                *signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]), signed=True)
+        for band in range(BANDS)
+    ]
+
+
+def similarity(signature, other_signature):
+    """
+    Estimated Jaccard similarity of the shingles of two questions, from 0 to 1.
+    """
+    return sum(1 for value, other_value in zip(signature, other_signature) if value == other_value) / NUM_PERMUTATIONS
+
+
+def question_scopes(question_ids):
+    scopes = {}
+    for pk, textbook_id, course_id, course_textbook_id in Question.objects.filter(pk__in=question_ids) \
+            .values_list('pk', 'textbook_id', 'course_id', 'course__textbook_id'):
+        textbook_id = textbook_id or course_textbook_id
+        scopes[pk] = f"textbook:{textbook_id}" if textbook_id else f"course:{course_id}" if course_id else ""
+    return scopes
+
+
+def link_duplicates(question_ids, threshold=None):
+    """
+    (Re)signs the given questions and links each one to the cluster of the most similar older question
+    in its scope, if they are at least threshold alike. Returns the number of questions linked.
+    Questions are handled oldest first, so a batch of new questions can also match each other.
+    """
+    if threshold is None:
+        threshold = getattr(settings, 'DUPLICATE_QUESTION_SIMILARITY', 0.8)
+    question_ids = sorted(set(question_ids))
+    linked = 0
+    for start in range(0, len(question_ids), SIGN_BATCH_SIZE):
+        linked += link_batch(question_ids[start:start + SIGN_BATCH_SIZE], threshold)
+    return linked
+
+
+def link_batch(batch, threshold):
+    scopes = question_scopes(batch)
+    signatures = {pk: minhash(text) for pk, text in plain_texts(batch).items()}
+    signatures = {pk: signature for pk, signature in signatures.items() if signature is not None}
+
+    QuestionSignature.objects.filter(question__in=batch).delete()
+    QuestionLshBucket.objects.filter(question__in=batch).delete()
+    if not signatures:
+        return 0
+
+    candidates = defaultdict(dict)  # question ID -> {older question ID sharing a bucket: its stored signature}
+    with connection.cursor() as cursor:
+        # BANDS rows per question: inserted without building a model instance for each one
+        cursor.executemany(f"INSERT INTO {QuestionLshBucket._meta.db_table} (question_id, scope, bucket) "
+                           f"VALUES (%s, %s, %s)",
+                           [(pk, scopes[pk], bucket) for pk, signature in signatures.items()
+                            for bucket in band_buckets(signature)])
+        # the older questions sharing a bucket with each of these, with the signature and cluster of the ones
+        # signed before. the ones in this batch have none (they are signed below, oldest first)
+        cursor.execute(
+            f"SELECT pairs.question_id, pairs.other_id, signature.minhash, signature.duplicate_of_id "
+            f"FROM (SELECT DISTINCT own.question_id, other.question_id AS other_id "
+            f"      FROM {QuestionLshBucket._meta.db_table} own "
+            f"      JOIN {QuestionLshBucket._meta.db_table} other "
+            f"        ON other.scope = own.scope AND other.bucket = own.bucket AND other.question_id < own.question_id "
+            f"      WHERE own.question_id IN ({', '.join(['%s'] * len(signatures))})) pairs "
+            f"LEFT JOIN {QuestionSignature._meta.db_table} signature ON signature.question_id = pairs.other_id",
+            list(signatures)
+        )
+        for pk, other_pk, data, duplicate_of_id in cursor.fetchall():
+            candidates[pk][other_pk] = (unpack_signature(data), duplicate_of_id) if data is not None else None
+
+    known = {}  # question ID -> (signature, oldest question of its cluster), for the ones signed in this batch
+    new_signatures = []
+    for pk in sorted(signatures):
+        signature = signatures[pk]
+        # the most similar candidate, the oldest one of equally similar candidates
+        best_pk, best_similarity, best_cluster = None, 0, None
+        for other_pk, other in sorted(candidates[pk].items()):
+            other_signature, other_cluster = other or known[other_pk]
+            other_similarity = similarity(signature, other_signature)
+            if other_similarity > best_similarity:
+                best_pk, best_similarity, best_cluster = other_pk, other_similarity, other_cluster
+        duplicate_of_id = None
+        if best_pk is not None and best_similarity >= threshold:
+            duplicate_of_id = best_cluster or best_pk
+
+        known[pk] = (signature, duplicate_of_id)
+        new_signatures.append(QuestionSignature(
+            question_id=pk, scope=scopes[pk], minhash=pack_signature(signature), duplicate_of_id=duplicate_of_id,
+            similarity=best_similarity if duplicate_of_id else None
+        ))
+
+    QuestionSignature.objects.bulk_create(new_signatures)
+    return sum(1 for question_signature in new_signatures if question_signature.duplicate_of_id)
@@ -0,0 +1,151 @@
+import re
+import threading
+import weakref
+
+from django.db import DEFAULT_DB_ALIAS, connection, transaction
+
+from testapp1.models import Answers, Options, Question, QuestionSearchText
+from testapp1.utils.html_assets import html_to_text
+
+"""
+Full-text search over the question bank.
+
+Every question has a QuestionSearchText row with the plain text of its prompt, answer, options and
+answers (imports store HTML; the tags are stripped). On MySQL that column has a FULLTEXT index and
+is searched with MATCH ... AGAINST in natural language mode. On SQLite an FTS5 table mirrors it
+(kept in step by triggers, see migration 0010_question_search) and results are ranked with bm25.
+Other databases fall back to a substring search without ranking.
+
+The search text is rebuilt whenever a question, option or answer is saved (after the transaction
+commits) and by the QTI importer for every question it writes. `manage.py rebuild_search_index`
+rebuilds all of it.
+"""
+
+FTS_TABLE = "testapp1_questionsearchtext_fts"  # SQLite only
+INDEX_BATCH_SIZE = 500
+
+
+def plain_texts(question_ids):
+    """
+    Returns {question ID: plain text of its prompt, answer, options and answers} in three queries.
+    """
+    parts = {pk: [text, answer] for pk, text, answer in
+             Question.objects.filter(pk__in=question_ids).values_list('pk', 'text', 'answer')}
+    for model in (Options, Answers):
+        for question_id, text in model.objects.filter(question__in=question_ids).order_by('pk') \
+                .values_list('question_id', 'text'):
+            parts[question_id].append(text)
+    return {pk: " ".join(filter(None, map(html_to_text, texts))) for pk, texts in parts.items()}
+
+
+def index_questions(question_ids):
+    """
+    Rebuilds the search text of the given questions. Takes a handful of queries per 500 questions.
+    """
+    question_ids = sorted(set(question_ids))
+    for start in range(0, len(question_ids), INDEX_BATCH_SIZE):
+        batch = question_ids[start:start + INDEX_BATCH_SIZE]
+        QuestionSearchText.objects.filter(question__in=batch).delete()
+        QuestionSearchText.objects.bulk_create([
+            QuestionSearchText(question_id=pk, text=text) for pk, text in plain_texts(batch).items()
+        ])
+
+
+class PendingReindex:
+    """
+    The questions whose search text is rebuilt when the current transaction of a connection commits,
+    by one on_commit callback however many of its writes touched them.
+
+    The callback is the only strong reference to it: the batches being collected are kept in a
+    thread-local WeakValueDictionary, so when Django drops the callbacks of a transaction or savepoint
+    that is rolled back, its batch goes with them and the next write starts a new one.
+    """
+
+    batches = threading.local()
+
+    def __init__(self, using):
+        self.using = using
+        self.question_ids = set()
+
+    @classmethod
+    def current(cls, using):
+        if not hasattr(cls.batches, 'by_alias'):
+            cls.batches.by_alias = weakref.WeakValueDictionary()
+        return cls.batches.by_alias.get(using)
+
+    def __call__(self):
+        if self.current(self.using) is self:
+            del self.batches.by_alias[self.using]
+        index_questions(self.question_ids)
+
+
+def reindex_on_commit(question_ids, using=None):
+    """
+    Rebuilds the search text of the given questions once the current transaction commits
+    (right away outside a transaction), so a rolled back change leaves the index alone.
+    A question saved along with its options and answers is reindexed once.
+    """
+    using = using or DEFAULT_DB_ALIAS
+    pending = PendingReindex.current(using)
+    if pending is not None:
+        pending.question_ids.update(question_ids)
+        return
+    pending = PendingReindex(using)
+    pending.question_ids.update(question_ids)
+    PendingReindex.batches.by_alias[using] = pending
+    transaction.on_commit(pending, using=using)  # outside a transaction, this runs it right away
+
+
+def search_terms(query):
+    return re.findall(r"\w+", query.lower())
+
+
+def search_questions(query, textbook=None, course=None, chapter=None, section=None, qtype=None, after=None,
+                     limit=20):
+    """
+    Returns [(question ID, score)] of the questions matching query, best first. Questions can be
+    filtered by textbook, course, chapter, section and qtype (IDs or values; None doesn't filter).
+
+    For the next page, pass the (question ID, score) of the last result as after. The page is found
+    with a WHERE on (score, ID) rather than an OFFSET, so later pages cost the same as the first.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return []
+
+    filters = []
+    params = []
+    for column, value in (("textbook_id", textbook), ("course_id", course), ("chapter", chapter),
+                          ("section", section), ("qtype", qtype)):
+        if value is not None:
+            filters.append(f"q.{column} = %s")
+            params.append(value)
+
+    if connection.vendor == "mysql":
+        match = "MATCH(s.text) AGAINST (%s IN NATURAL LANGUAGE MODE)"
+        ranked = (f"SELECT s.question_id, {match} AS score FROM testapp1_questionsearchtext s "
+                  f"JOIN testapp1_question q ON q.id = s.question_id WHERE {match}")
+        params = [" ".join(terms), " ".join(terms)] + params
+    elif connection.vendor == "sqlite":
+        # bm25() is lower for better matches; it's negated so a higher score is better everywhere
+        ranked = (f"SELECT f.rowid AS question_id, -bm25({FTS_TABLE}) AS score FROM {FTS_TABLE} f "
+                  f"JOIN testapp1_question q ON q.id = f.rowid WHERE {FTS_TABLE} MATCH %s")
+        params = [" OR ".join(f'"{term}"' for term in terms)] + params
+    else:
+        ranked = ("SELECT s.question_id, 0 AS score FROM testapp1_questionsearchtext s "
+                  "JOIN testapp1_question q ON q.id = s.question_id WHERE LOWER(s.text) LIKE %s")
+        params = ["%" + " ".join(terms) + "%"] + params
+    for condition in filters:
+        ranked += f" AND {condition}"
+
+    query_sql = f"SELECT question_id, score FROM ({ranked}) ranked"
+    if after is not None:
+        after_id, after_score = after
+        query_sql += " WHERE score < %s OR (score = %s AND question_id > %s)"
+        params += [after_score, after_score, after_id]
+    query_sql += " ORDER BY score DESC, question_id LIMIT %s"
+    params.append(limit)
+
+    with connection.cursor() as cursor:
+        cursor.execute(query_sql, params)
+        return [(question_id, float(score)) for question_id, score in cursor.fetchall()]
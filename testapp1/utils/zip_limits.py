@@ -0,0 +1,60 @@
+import zipfile
+
+from django.conf import settings
+
+# defaults used when a limit isn't set in settings.py
+DEFAULT_LIMITS = {
+    "QTI_UPLOAD_MAX_COMPRESSED_SIZE": 200 * 1024 * 1024,  # bytes of the zip itself
+    "QTI_UPLOAD_MAX_UNCOMPRESSED_SIZE": 1024 * 1024 * 1024,  # bytes of all members together
+    "QTI_UPLOAD_MAX_COMPRESSION_RATIO": 100,  # uncompressed / compressed size of any one member
+    "QTI_UPLOAD_MAX_MEMBERS": 10000,  # files and folders in the zip
+}
+
+
+class ZipLimitError(ValueError):
+    """
+    Raised when an uploaded zip is not a zip, or is bigger than the import limits allow.
+    The message is meant to be shown to the user as it is.
+    """
+
+
+def get_limit(name):
+    return getattr(settings, name, DEFAULT_LIMITS[name])
+
+
+def check_zip_limits(zip_source, compressed_size=None):
+    """
+    Checks a zip (a path or a file object) against the upload limits in settings and raises
+    ZipLimitError with a clear message if it breaks one.
+
+    Only the zip's central directory is read, so this is cheap enough to run before anything
+    is written to the database. The sizes checked are the ones the zip declares; zipfile never
+    decompresses more than the declared size of a member (it raises BadZipFile instead), so a
+    zip can't get past these checks by lying about its sizes.
+    """
+    max_compressed_size = get_limit("QTI_UPLOAD_MAX_COMPRESSED_SIZE")
+    if compressed_size is not None and compressed_size > max_compressed_size:
+        raise ZipLimitError(f"The zip is {compressed_size} bytes; "
+                            f"uploads are limited to {max_compressed_size} bytes.")
+
+    try:
+        with zipfile.ZipFile(zip_source, 'r') as zip_ref:
+            members = zip_ref.infolist()
+    except zipfile.BadZipFile:
+        raise ZipLimitError("The file is not a valid zip archive.")
+
+    max_members = get_limit("QTI_UPLOAD_MAX_MEMBERS")
+    if len(members) > max_members:
+        raise ZipLimitError(f"The zip holds {len(members)} files; at most {max_members} are allowed.")
+
+    max_uncompressed_size = get_limit("QTI_UPLOAD_MAX_UNCOMPRESSED_SIZE")
+    max_ratio = get_limit("QTI_UPLOAD_MAX_COMPRESSION_RATIO")
+    uncompressed_size = 0
+    for member in members:
+        uncompressed_size += member.file_size
+        if uncompressed_size > max_uncompressed_size:
+            raise ZipLimitError(f"The zip unpacks to more than {max_uncompressed_size} bytes.")
+        # an empty or stored member has a ratio of (about) 1, so only compressed bytes are divided by
+        if member.file_size > max_ratio * max(member.compress_size, 1):
+            raise ZipLimitError(f"{member.filename} is compressed more than {max_ratio} to 1, "
+                                f"which is not allowed.")
@@ -1,27 +1,29 @@
 # Create your views here.
 import csv
 import json
-import time
-import urllib.parse
 
-import openpyxl
-from bs4 import BeautifulSoup
-from django.core.files.base import ContentFile
-from django.db import connection
-from django.shortcuts import render
+from django.db import connection, transaction
+from django.db.models import Q
+from django.shortcuts import get_object_or_404, render
+from django.urls import reverse
 
 from testapp1.models import *
-import xml.etree.ElementTree as ET
-import zipfile
+from testapp1.utils.export_closure import export_closure
+from testapp1.utils.delimited_export import EXPORT_FORMATS, export_stream, streaming_response
+from testapp1.utils.export_cache import ExportCache, data_version
+from testapp1.utils.export_query import iter_querysets
+from testapp1.utils.full_export import start_export
+from testapp1.utils.import_jobs import NEW_COURSE_LOCK, named_lock, start_local_workers
+from testapp1.utils.question_search import search_questions
+from testapp1.utils.xlsx_export import XLSX_CONTENT_TYPE, XlsxExport
+from testapp1.utils.zip_limits import ZipLimitError, check_zip_limits
 from django.http import JsonResponse
 
 from zipfile import Path
-from django.http import HttpResponse
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
 from django.conf import settings
 from django.core.files.storage import default_storage
 
-from openpyxl.utils import get_column_letter
-
 def upload_page(request):
     return render(request, "upload.html")  # Adjust if needed
 
@@ -31,98 +33,14 @@ def export_csv(request):
 
     print("export_csv view triggered") # used to make sure view function is being called
 
-    necessary_keys_dict = {
-        "welcome_course": {"textbook_id": []},
-    }
-
-    def make_new_sheet(wb, query):
-        #
-        cursor = connection.cursor()
-        cursor.execute(query) # cursor holds result from cursor.execute() query
-        table_name = query.split("FROM")[1].strip()
-
-        rows = cursor.fetchall()
-        columns = [col[0] for col in cursor.description]
-        sheet = wb.create_sheet(title=table_name)
-
-        # Write headers
-        for col_num, column_title in enumerate(columns, 1):
-            col_letter = get_column_letter(col_num)
-            sheet[f'{col_letter}1'] = column_title
-
-        # Write data rows
-        for row_num, row in enumerate(rows, 2):  # Start from row 2
-            for col_num, cell_value in enumerate(row, 1):
-                col_letter = get_column_letter(col_num)
-                sheet[f'{col_letter}{row_num}'] = cell_value
-
-        # end of make_new_sheet inner-function
-
-    # this function finds out whether the given record/entry is missing in the sheet by using record ID
-    def is_record_missing(id_to_check, sheet):
-        did_not_find = True
-        column_of_cells = sheet['A'] # this grabs a column of cells from an Excel worksheet
-        for cell in column_of_cells:
-            if cell.value == id_to_check:
-                did_not_find = False
-                return did_not_find
-
-        return did_not_find
-
-    def fill_out_sheet(sheet, query, lists_of_ids_dict, ids_to_grab_list):
-        cursor = connection.cursor()
-        cursor.execute(query)  # cursor holds result from cursor.execute() query
-        # grabs all rows that cursor is holding. each list object is a tuple. doesn't grab column-name row
-        rows = cursor.fetchall()
-        # this extracts column names from table metadata
-        # cursor.description is a list of tuples that contain table metadata
-        # column_info designates the tuple object that contains column info
-        # the first object in the column metadata-tuple is the column name; column_info[0]
-        column_name_list = [column_info[0] for column_info in cursor.description]
-
-        # this block enters the column names from database into the first row of Excel sheet
-        # uses the form:        for index, item in enumerate(my_list, number):
-        # number is where you start enumerating from. this enumeration starts from 1 (inclusive)
-        column_list_pair_dict = {} # BE CAREFUL! every column is actually column-1 for use with row list indexing
-        for cell_column, column_name in enumerate(column_name_list, 1):
-            cell_column_letter = get_column_letter(cell_column)  # get_column_letter maps number to letter
-            sheet[f'{cell_column_letter}1'] = column_name
-
-            if column_name in lists_of_ids_dict:
-                row_index = cell_column - 1
-                column_list_pair_dict[row_index] = lists_of_ids_dict.get(column_name) # creates int-list pair
-
-        current_records_in_file = 0
-        for column_to_check, list_with_ids in column_list_pair_dict.items():
-            # this block adds each desired database record to the Excel sheet
-            #current_records_in_file = 0 # commented out because i might need to put it back later
-            for row in rows:  # for every record/entry in list of records ...
-                if row[column_to_check] in list_with_ids and is_record_missing(row[0], sheet):  # check if ID in given ID-list
-                    for cell_column, field_value in enumerate(row, 1):
-                        cell_column_letter = get_column_letter(cell_column)
-                        sheet[f'{cell_column_letter}{(current_records_in_file + 2)}'] = field_value
-                    current_records_in_file += 1
-
-        dict_to_return = None
-        if ids_to_grab_list is not None:
-            dict_to_return = {} # (CHANGED) was list of lists. now, dictionary of lists.
-            #current_number_of_lists = 0
-            for index, column_id in enumerate(ids_to_grab_list, 0):
-                # dict_to_return.append([]) # (BEFORE). useless right now. might need later
-                desired_id = ids_to_grab_list[index]
-                dict_to_return[desired_id]= [] # (AFTER)
-                desired_id_column_letter = None # this is just to initialize and keep value outside the loop
-                for first_row_cell in sheet[1]:  # Gets all cells in row 1 of sheet and iterates
-                    if first_row_cell.value == desired_id: # if we found the column of the desired id
-                        desired_id_column_letter = get_column_letter(first_row_cell.column)
-                alleged_cell_column = sheet[desired_id_column_letter] # get entire column of cells
-                i = 1
-                for cell_in_column in alleged_cell_column:
-                    if i > 1:
-                        dict_to_return.get(desired_id).append(cell_in_column.value)
-                    i += 1
-
-        return dict_to_return
+    # yields (table name, column names, rows) for the querysets of export_closure(), i.e. the selected courses,
+    # tests or questions and everything they depend on. this takes one query per table (and chunk of
+    # EXPORT_IN_CLAUSE_SIZE selected IDs). the rows are only read from the database when the export file is written
+    def selected_tables(closure):
+        for model, querysets in closure:
+            rows = iter_querysets(querysets)
+            column_name_list = next(rows)
+            yield model._meta.db_table, column_name_list, rows
 
     if request.method == "POST":
         try: # json.loads() will cause an error if the json is invalid or empty
@@ -136,6 +54,7 @@ def export_csv(request):
         test_id_list = data.get('test', [])
         question_id_list = data.get('questions', [])
         type_of_export = data.get('typeOfExport', [])
+        format_of_export = data.get('formatOfExport', ['xlsx']) # xlsx, csv (zipped) or ndjson (gzipped)
 
         course_id_list = list(set(course_id_list))
         test_id_list = list(set(test_id_list))
@@ -155,11 +74,21 @@ def export_csv(request):
             print('Export type not given')
             return JsonResponse({'error': 'Export type not provided'}, status=400)
 
-        wb = openpyxl.Workbook() # creates the Workbook container object (Excel file)
-        wb.remove(wb.active)  # Remove the default blank sheet
+        export_format = format_of_export[0] if format_of_export else 'xlsx'
+        if export_format != 'xlsx' and export_format not in EXPORT_FORMATS:
+            print('Invalid export format given')
+            return JsonResponse({'error': 'Invalid export format provided'}, status=400)
 
         if export_type == 'entire':
-            print(export_type) # placeholder
+            # the whole database is too much to export within the request. it is exported in the
+            # background (see testapp1/utils/full_export.py) and downloaded from export_status/<job_id>/
+            export_job = ExportJob.objects.create(user=request.user if request.user.is_authenticated else None)
+            remember_job(request, export_job)
+            transaction.on_commit(lambda: start_export(export_job.pk))
+            return JsonResponse({
+                "job_id": export_job.pk,
+                "status_url": reverse('export_status', args=[export_job.pk])
+            }, status=202)
 
         elif export_type == 'course':
             print(course_id_list)
@@ -168,27 +97,13 @@ def export_csv(request):
                 print('No courses given to export')
                 return JsonResponse({'error': 'No courses given to export'}, status=400)
 
-            sheet = wb.create_sheet(title="welcome_course")
-            query = "SELECT * FROM welcome_course"
-
-            """ going to use these in a sec ...
-            table_name = 'welcome_course'
-            query = f"SELECT * FROM `{table_name}` LIMIT 100"
-            query = f"SELECT * FROM `{table_name}`"
-            """
-
-            id_dict = {}
-            id_dict['id'] = course_id_list # this makes a key-list pair entry in a dictionary
-            needed_ids_list = ["textbook_id"]
-            result_dict = fill_out_sheet(sheet, query, id_dict, needed_ids_list)
-            print(result_dict)
-
+            selected_ids = {'course_ids': course_id_list}
 
         elif export_type == 'test':
             print(test_id_list)
 
             if test_id_list:
-                print('') # placeholder
+                selected_ids = {'test_ids': test_id_list}
             else:
                 print('No tests given to export')
                 return JsonResponse({'error': 'No tests given to export'}, status=400)
@@ -197,7 +112,7 @@ def export_csv(request):
             print(question_id_list)
 
             if question_id_list:
-                print('') # placeholder
+                selected_ids = {'question_ids': question_id_list}
             else:
                 print('No questions given to export')
                 return JsonResponse({'error': 'No questions given to export'}, status=400)
@@ -206,20 +121,50 @@ def export_csv(request):
             print('Invalid export type given')
             return JsonResponse({'error': 'Invalid export type provided'}, status=400)
 
-        print("Final sheets in workbook:", wb.sheetnames)
+        closure = export_closure(**selected_ids)
 
-        # Save to a BytesIO stream instead of a file
-        from io import BytesIO
-        output = BytesIO()
-        wb.save(output)
-        output.seek(0)
+        # the same export of data that hasn't changed since is served from the export cache. the ETag
+        # changes with the data, so a client that sends it back in If-None-Match gets a 304 until then
+        export_cache = ExportCache()
+        cache_key = export_cache.key(export_type, export_format, selected_ids)
+        version = data_version(closure) if export_cache.enabled else None
+        etag = export_cache.etag(cache_key, version) if export_cache.enabled else None
+        if export_format == 'xlsx':
+            extension, content_type = '.xlsx', XLSX_CONTENT_TYPE
+        else:
+            extension, content_type = EXPORT_FORMATS[export_format]
+        not_modified = etag is not None and etag in request.headers.get('If-None-Match', '')
+        cached_file = None
+        if export_cache.enabled and not not_modified:
+            cached_file = export_cache.open(cache_key, version, extension)
+
+        if not_modified:
+            response = HttpResponseNotModified()
+        elif cached_file is not None:
+            print("Export served from the cache")
+            response = FileResponse(cached_file, as_attachment=True, filename='exported_data' + extension,
+                                    content_type=content_type)
+        elif export_format == 'xlsx':
+            export = XlsxExport() # creates the write-only workbook (Excel file)
+            for table_name, column_name_list, rows in selected_tables(closure):
+                export.add_sheet(table_name, column_name_list, rows)
+            print("Final sheets in workbook:", list(export.row_counts))
+
+            # the workbook is streamed to the client instead of being built in memory
+            if export_cache.enabled:
+                response = FileResponse(export_cache.save(cache_key, version, extension, export.save),
+                                        as_attachment=True, filename='exported_data.xlsx', content_type=content_type)
+            else:
+                response = export.response('exported_data.xlsx')
+        else:
+            # CSV and NDJSON are written while the client downloads them, straight from the database cursor
+            chunks = export_stream(export_format, selected_tables(closure))
+            if export_cache.enabled:
+                chunks = export_cache.write_through(cache_key, version, extension, chunks)
+            response = streaming_response(export_format, chunks, 'exported_data')
 
-        # Prepare the response
-        response = HttpResponse(
-            output,
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        response['Content-Disposition'] = 'attachment; filename=exported_data.xlsx'
+        if etag is not None:
+            response['ETag'] = etag
 
     print("did it get here???") # used for debugging
 
@@ -230,545 +175,11 @@ def export_csv(request):
 
 def parse_qti_xml(request):
     """
-    Parses a QTI zip file and saves extracted data to the database.
+    Queues a QTI zip file to be imported in the background and returns 202 with the job id.
+    The import itself is done by a worker (see testapp1/utils/import_jobs.py), and its progress
+    can be followed at import_status/<job_id>/ by whoever uploaded it (and by staff).
     This supports QTI version 1.2 only.
     """
-    start_time = time.perf_counter()
-
-    class ImageDataPair:
-        def __init__(self, raw_image_data, actual_image_name):
-            self.raw_image_data = raw_image_data
-            self.actual_image_name = actual_image_name
-
-    # Function to remove namespaces
-    def remove_namespace(given_tree):
-        for elem in given_tree.iter():
-            if "}" in elem.tag:
-                elem.tag = elem.tag.split("}")[-1]
-
-    # creates a new question record/entry
-    def create_question(g_course, g_q_type, g_q_text, g_points):
-        temp_question_instance = Question.objects.create(
-            course=g_course,
-            # this is because, logically, when questions/tests are uploaded to a course, are they not part of it?
-            qtype=g_q_type,
-            text=g_q_text,
-            score=g_points
-        )
-
-        # checks if user is logged in
-        if request.user.is_authenticated:
-            temp_question_instance.author = request.user  # sets to the current user
-            temp_question_instance.save()
-
-        return temp_question_instance
-
-    def check_embedded_graphic(text_q):
-        if text_q is None:
-            return None
-        # Parse the HTML using BeautifulSoup4 library
-        soup = BeautifulSoup(text_q, 'html.parser')
-        # Find the <img> tag
-        img_element = soup.find('img')
-        found_the_image = False
-        if img_element:  # if we find an embedded image
-            temp_file_path1 = img_element.get('src')  # gets the src attribute of img element
-            url_encoded_path = temp_file_path1[18:]  # length of "$IMS-CC-FILEBASE$/" is 18
-            decoded_path = urllib.parse.unquote(url_encoded_path)  # this decodes URL-encoded path
-
-            for potential_image_name in filename_list:  # this assumes an outer function has: filename_list = zip_ref.namelist()
-                if potential_image_name.endswith(decoded_path):
-                    found_the_image = True
-                    my_image_name = img_element.get('alt')
-                    with zip_ref.open(potential_image_name) as desired_img_file:  # open the image file
-                        img_data = desired_img_file.read()  # this is the raw image data
-                        data_to_return = ImageDataPair(img_data, my_image_name)
-            if not found_the_image:
-                print('Desired image not found')  # used for debugging
-        if img_element is None or found_the_image == False:
-            return None
-        else:
-            return data_to_return
-
-    def parse_just_xml(meta_path, non_meta_path, the_course):
-
-        print(f"processing file: {meta_path}")
-        # path to metadata file
-        xml_file_path = meta_path
-        tree = ET.parse(xml_file_path)
-        root = tree.getroot()
-        remove_namespace(root)
-
-        cover_instructions_text = root.find('.//description').text
-
-        print(f"processing file: {non_meta_path}")
-        # Path to the questions file
-        xml_file_path = non_meta_path
-        tree = ET.parse(xml_file_path)
-        root = tree.getroot()
-
-        namespace = {"ns": "http://www.imsglobal.org/xsd/ims_qtiasiv1p2"}
-
-        # Remove namespaces
-        remove_namespace(root)
-        # Find the 'assessment' element
-        my_tag = "assessment"
-        node = root.find(my_tag)
-
-        if node is None:
-            return JsonResponse({"error": f"Element '{my_tag}' not found in XML!"}, status=400)
-
-        # Extract 'ident' and 'title' attribute from the element that node represents
-        the_test_title = node.get("title")  # test name
-        test_identifier = node.get("ident")
-
-        # Create a new Test record
-        test_instance = Test.objects.create(
-            course=the_course,
-            textbook=the_course.textbook,
-            name=the_test_title
-        )
-        test_part_instance = TestPart.objects.create(
-            test=test_instance
-        )
-        number_of_sections = 0
-
-        for section in root.findall(".//section"):
-            number_of_sections = number_of_sections + 1
-            test_section_instance = TestSection.objects.create(
-                part=test_part_instance,
-                section_number=number_of_sections
-            )
-
-            for item in section.findall(".//item"):
-
-                # all useful metadata fields are found in the fieldentry elements under itemmetadata
-                node = item.find('itemmetadata')
-                qti_metadata_fields = node.findall(".//fieldentry")
-
-                node = item.find('presentation')
-
-                temp_node = node.find('material')  # possibly redundant statement
-                temp_node = temp_node.find(".//mattext")
-                # question_text_field contains the question prompt text
-                question_text_field = temp_node.text
-
-                # each response has an ID represented as "ident" in the XML
-                # the ID is used to know what the correct response is
-                correct_answer_ident = None
-
-                correct_answer_ident = None
-
-                the_question_type = qti_metadata_fields[0].text
-                max_points_for_question = float(qti_metadata_fields[1].text)
-
-                # node should currently be already = element w 'presentation' tag
-                # MultiChoice & TF might be able to be combined. For now, they are separate
-                if the_question_type == 'multiple_choice_question':
-                    #
-                    node = node.find('.//response_lid')
-                    answer_choices_dict = {}
-                    for response_label_elem in node.findall('.//response_label'):
-                        response_ident = response_label_elem.get('ident')
-                        response_text = response_label_elem.find('.//mattext').text
-                        answer_choices_dict[response_ident] = response_text
-
-                    node = item.find('resprocessing')
-                    for respcondition_elem in node.findall('.//respcondition'):
-                        if respcondition_elem.get('continue') == "No":
-                            temp_node = respcondition_elem.find('.//varequal')
-                            correct_answer_ident = temp_node.text
-
-                    # this creates a question record in database
-                    question_instance = create_question(the_course, the_question_type, question_text_field,
-                                                        max_points_for_question)
-                    # this block of code checks for an embedded graphic in text, then saves it to field
-                    # is there is a graphic. otherwise it does nothing.
-                    image_data_pair = check_embedded_graphic(question_text_field)
-                    if image_data_pair is not None:
-                        # Save the image to the img field, then update the record/entry
-                        question_instance.img.save(image_data_pair.actual_image_name,
-                                                   ContentFile(image_data_pair.raw_image_data))
-                        question_instance.save()
-                        print(f"{question_instance.img.url}")
-
-                        # Parse the HTML using BeautifulSoup4 library
-                        html_obj = BeautifulSoup(question_text_field, 'html.parser')
-                        # Find the element with "img" tag
-                        my_img_element = html_obj.find('img')
-                        my_img_element['src'] = question_instance.img.url  # change src attribute
-                        question_text_field = str(html_obj)  # save html as string
-                        question_instance.text = question_text_field  # update text field
-                        question_instance.save()  # save/update entry in database
-
-                    testquestion_instance = TestQuestion.objects.create(
-                        test=test_instance,
-                        question=question_instance,
-                        assigned_points=max_points_for_question,
-                        section=test_section_instance
-                    )
-
-                    for key, value in answer_choices_dict.items():
-                        if key == correct_answer_ident:
-                            question_instance.answer = value
-                            temp_img_data_pair = check_embedded_graphic(value)
-                            if temp_img_data_pair is not None:
-                                question_instance.ansimg.save(temp_img_data_pair.actual_image_name,
-                                                              ContentFile(temp_img_data_pair.raw_image_data))
-
-                                # Parse the HTML using BeautifulSoup4 library
-                                html_obj = BeautifulSoup(value, 'html.parser')
-                                # Find the element with "img" tag
-                                my_img_element = html_obj.find('img')
-                                my_img_element['src'] = question_instance.ansimg.url  # change src attribute
-                                value = str(html_obj)  # save html as string
-                                question_instance.answer = value  # update answer text field
-                                question_instance.save()  # save/update entry in database
-
-                            question_instance.save()
-                        else:
-                            options_instance = Options.objects.create(
-                                question=question_instance,
-                                text=value
-                            )
-                            temp_img_data_pair = check_embedded_graphic(value)
-                            if temp_img_data_pair is not None:
-                                options_instance.image.save(temp_img_data_pair.actual_image_name,
-                                                            ContentFile(temp_img_data_pair.raw_image_data))
-                                options_instance.save()
-
-                                # Parse the HTML using BeautifulSoup4 library
-                                html_obj = BeautifulSoup(value, 'html.parser')
-                                # Find the element with "img" tag
-                                my_img_element = html_obj.find('img')
-                                my_img_element['src'] = options_instance.image.url  # change src attribute
-                                value = str(html_obj)  # save html as string
-                                options_instance.text = value  # update options text field
-                                options_instance.save()  # save/update entry in database
-
-                elif the_question_type == 'true_false_question':
-                    node = node.find('.//response_lid')
-                    answer_choices_dict = {}
-                    for response_label_elem in node.findall('.//response_label'):
-                        response_ident = response_label_elem.get('ident')
-                        response_text = response_label_elem.find('.//mattext').text
-                        answer_choices_dict[response_ident] = response_text
-
-                    node = item.find('resprocessing')
-                    for respcondition_elem in node.findall('.//respcondition'):
-                        if respcondition_elem.get('continue') == "No":
-                            temp_node = respcondition_elem.find('.//varequal')
-                            correct_answer_ident = temp_node.text
-
-                    question_instance = create_question(the_course, the_question_type, question_text_field,
-                                                        max_points_for_question)
-                    # this block of code checks for an embedded graphic in text, then saves it to field
-                    # is there is a graphic. otherwise it does nothing.
-                    image_data_pair = check_embedded_graphic(question_text_field)
-                    if image_data_pair is not None:
-                        # Save the image to the img field, then update the record/entry
-                        question_instance.img.save(image_data_pair.actual_image_name,
-                                                   ContentFile(image_data_pair.raw_image_data))
-                        question_instance.save()
-                        print(f"{question_instance.img.url}")
-
-                        # Parse the HTML using BeautifulSoup4 library
-                        html_obj = BeautifulSoup(question_text_field, 'html.parser')
-                        # Find the element with "img" tag
-                        my_img_element = html_obj.find('img')
-                        my_img_element['src'] = question_instance.img.url  # change src attribute
-                        question_text_field = str(html_obj)  # save html as string
-                        question_instance.text = question_text_field  # update text field
-                        question_instance.save()  # save/update entry in database
-
-                    testquestion_instance = TestQuestion.objects.create(
-                        test=test_instance,
-                        question=question_instance,
-                        assigned_points=max_points_for_question,
-                        section=test_section_instance
-                    )
-
-                    for key, value in answer_choices_dict.items():
-                        if key == correct_answer_ident:
-                            question_instance.answer = value
-                            temp_img_data_pair = check_embedded_graphic(value)
-                            if temp_img_data_pair is not None:
-                                question_instance.ansimg.save(temp_img_data_pair.actual_image_name,
-                                                              ContentFile(temp_img_data_pair.raw_image_data))
-
-                            question_instance.save()
-
-                elif the_question_type == 'short_answer_question':  # fill-in-the-blank question (single)
-
-                    the_question_type = "fill_in_the_blank"
-
-                    question_instance = create_question(
-                        the_course, the_question_type, question_text_field,
-                        max_points_for_question
-                    )
-                    # this block of code checks for an embedded graphic in text, then saves it to field
-                    # is there is a graphic. otherwise it does nothing.
-                    image_data_pair = check_embedded_graphic(question_text_field)
-                    if image_data_pair is not None:
-                        # Save the image to the img field, then update the record/entry
-                        question_instance.img.save(image_data_pair.actual_image_name,
-                                                   ContentFile(image_data_pair.raw_image_data))
-                        question_instance.save()
-                        print(f"{question_instance.img.url}")
-
-                        # Parse the HTML using BeautifulSoup4 library
-                        html_obj = BeautifulSoup(question_text_field, 'html.parser')
-                        # Find the element with "img" tag
-                        my_img_element = html_obj.find('img')
-                        my_img_element['src'] = question_instance.img.url  # change src attribute
-                        question_text_field = str(html_obj)  # save html as string
-                        question_instance.text = question_text_field  # update text field
-                        question_instance.save()  # save/update entry in database
-
-                    testquestion_instance = TestQuestion.objects.create(
-                        test=test_instance,
-                        question=question_instance,
-                        assigned_points=max_points_for_question,
-                        section=test_section_instance
-                    )
-
-                    node = item.find('resprocessing')
-                    for respcondition_elem in node.findall('.//respcondition'):
-                        if respcondition_elem.get('continue') == "No":
-                            for varequal_elem in respcondition_elem.findall('.//varequal'):
-                                answer_instance = Answers.objects.create(
-                                    question=question_instance,
-                                    text=varequal_elem.text
-                                )
-                                temp_img_data_pair = check_embedded_graphic(varequal_elem.text)
-                                if temp_img_data_pair is not None:
-                                    answer_instance.answer_graphic.save(temp_img_data_pair.actual_image_name,
-                                                                        ContentFile(temp_img_data_pair.raw_image_data))
-                                    answer_instance.save()
-
-                elif the_question_type == 'multiple_answers_question':
-
-                    the_question_type = "multiple_selection"
-
-                    correct_answer_ident_list = []
-                    node = node.find('.//response_lid')
-                    answer_choices_dict = {}
-                    for response_label_elem in node.findall('.//response_label'):
-                        response_ident = response_label_elem.get('ident')
-                        response_text = response_label_elem.find('.//mattext').text
-                        answer_choices_dict[response_ident] = response_text
-
-                    node = item.find('resprocessing')
-                    for respcondition_elem in node.findall('.//respcondition'):
-                        if respcondition_elem.get('continue') == "No":
-                            for varequal_elem in respcondition_elem.find('conditionvar').find('and').findall(
-                                    'varequal'):
-                                correct_answer_ident_list.append(varequal_elem.text)
-
-                    question_instance = create_question(the_course, the_question_type, question_text_field,
-                                                        max_points_for_question)
-                    # this block of code checks for an embedded graphic in text, then saves it to field
-                    # is there is a graphic. otherwise it does nothing.
-                    image_data_pair = check_embedded_graphic(question_text_field)
-                    if image_data_pair is not None:
-                        # Save the image to the img field, then update the record/entry
-                        question_instance.img.save(image_data_pair.actual_image_name,
-                                                   ContentFile(image_data_pair.raw_image_data))
-                        question_instance.save()
-                        print(f"{question_instance.img.url}")
-
-                        # Parse the HTML using BeautifulSoup4 library
-                        html_obj = BeautifulSoup(question_text_field, 'html.parser')
-                        # Find the element with "img" tag
-                        my_img_element = html_obj.find('img')
-                        my_img_element['src'] = question_instance.img.url  # change src attribute
-                        question_text_field = str(html_obj)  # save html as string
-                        question_instance.text = question_text_field  # update text field
-                        question_instance.save()  # save/update entry in database
-
-                    testquestion_instance = TestQuestion.objects.create(
-                        test=test_instance,
-                        question=question_instance,
-                        assigned_points=max_points_for_question,
-                        section=test_section_instance
-                    )
-
-                    for key, value in answer_choices_dict.items():
-                        if key in correct_answer_ident_list:
-                            answer_instance = Answers.objects.create(
-                                question=question_instance,
-                                text=value
-                            )
-                            temp_img_data_pair = check_embedded_graphic(value)
-                            if temp_img_data_pair is not None:
-                                answer_instance.answer_graphic.save(temp_img_data_pair.actual_image_name,
-                                                                    ContentFile(temp_img_data_pair.raw_image_data))
-                                answer_instance.save()
-
-                                # Parse the HTML using BeautifulSoup4 library
-                                html_obj = BeautifulSoup(value, 'html.parser')
-                                # Find the element with "img" tag
-                                my_img_element = html_obj.find('img')
-                                my_img_element['src'] = answer_instance.answer_graphic.url  # change src attribute
-                                value = str(html_obj)  # save html as string
-                                answer_instance.text = value  # update answer_instance text field
-                                answer_instance.save()  # save/update entry in database
-
-                        else:
-                            options_instance = Options.objects.create(
-                                question=question_instance,
-                                text=value
-                            )
-                            temp_img_data_pair = check_embedded_graphic(value)
-                            if temp_img_data_pair is not None:
-                                options_instance.image.save(temp_img_data_pair.actual_image_name,
-                                                            ContentFile(temp_img_data_pair.raw_image_data))
-                                options_instance.save()
-
-                                # Parse the HTML using BeautifulSoup4 library
-                                html_obj = BeautifulSoup(value, 'html.parser')
-                                # Find the element with "img" tag
-                                my_img_element = html_obj.find('img')
-                                my_img_element['src'] = options_instance.image.url  # change src attribute
-                                value = str(html_obj)  # save html as string
-                                options_instance.text = value  # update option text field
-                                options_instance.save()  # save/update entry in database
-
-                elif the_question_type == 'matching_question':  # this is explicitly stated in rubric to support
-                    # Canvas requires you to add at least one answer
-                    answer_choices_dict = {}  # right side options and their ID's
-                    left_side_dict = {}
-
-                    question_instance = create_question(the_course, the_question_type, question_text_field,
-                                                        max_points_for_question)
-                    # this block of code checks for an embedded graphic in text, then saves it to field
-                    # is there is a graphic. otherwise it does nothing.
-                    image_data_pair = check_embedded_graphic(question_text_field)
-                    if image_data_pair is not None:
-                        # Save the image to the img field, then update the record/entry
-                        question_instance.img.save(image_data_pair.actual_image_name,
-                                                   ContentFile(image_data_pair.raw_image_data))
-                        question_instance.save()
-                        print(f"{question_instance.img.url}")
-
-                        # Parse the HTML using BeautifulSoup4 library
-                        html_obj = BeautifulSoup(question_text_field, 'html.parser')
-                        # Find the element with "img" tag
-                        my_img_element = html_obj.find('img')
-                        my_img_element['src'] = question_instance.img.url  # change src attribute
-                        question_text_field = str(html_obj)  # save html as string
-                        question_instance.text = question_text_field  # update text field
-                        question_instance.save()  # save/update entry in database
-
-                    testquestion_instance = TestQuestion.objects.create(
-                        test=test_instance,
-                        question=question_instance,
-                        assigned_points=max_points_for_question,
-                        section=test_section_instance
-                    )
-
-                    # find left sides
-                    for response_lid_elem in node.findall('response_lid'):  # for all response_lid elements in list
-                        side_key = response_lid_elem.get('ident')
-                        side_text = response_lid_elem.find('material').find('mattext').text
-                        left_side_dict[side_key] = side_text
-                    # find right sides
-                    for response_label_elem in node.find('response_lid').find('render_choice').findall(
-                            'response_label'):
-                        side_key = response_label_elem.get('ident')
-                        side_text = response_label_elem.find('.//mattext').text
-                        answer_choices_dict[side_key] = side_text
-                    # now find out which ones are matching pairs
-                    matching_pairs_dict = {}
-                    node = item.find('resprocessing')
-                    right_side_key_to_delete_list = []
-                    for respcondition_elem in node.findall('respcondition'):
-                        varequal_elem = respcondition_elem.find('conditionvar').find('varequal')
-                        if varequal_elem is not None:
-                            left_key = varequal_elem.get('respident')
-                            right_key = varequal_elem.text
-                            right_side_key_to_delete_list.append(right_key)
-                            # this makes a dictionary of matching pairs
-                            matching_pairs_dict[left_side_dict.get(left_key)] = answer_choices_dict.get(right_key)
-                    unique_key_list_to_del = list(
-                        set(right_side_key_to_delete_list))  # this removes duplicate keys from list
-                    for key_string in unique_key_list_to_del:
-                        del answer_choices_dict[key_string]  # deletes a response option that was a correct right side
-                    # now save matching pairs to database
-                    for key, value in matching_pairs_dict.items():
-                        matching_pair_string = ""
-                        if key is not None:
-                            matching_pair_string += key
-                        matching_pair_string += ";;;;; "
-                        if value is None:
-                            matching_pair_string += ";;;;;"
-                        else:
-                            matching_pair_string += value
-
-                        # matching questions CANNOT have embedded graphics in responses
-                        answer_instance = Answers.objects.create(
-                            question=question_instance,
-                            text=matching_pair_string
-                        )
-                    # save distractors to database
-                    for value in answer_choices_dict.values():
-                        option_instance = Options.objects.create(
-                            question=question_instance,
-                            text=value
-                        )
-
-                elif the_question_type == 'essay_question':
-                    # mostly done but may need to process feedbacks or comments
-
-                    # this creates a question record in database
-                    question_instance = create_question(the_course, the_question_type, question_text_field,
-                                                        max_points_for_question)
-                    # this block of code checks for an embedded graphic in text, then saves it to field
-                    # is there is a graphic. otherwise it does nothing.
-                    image_data_pair = check_embedded_graphic(question_text_field)
-                    if image_data_pair is not None:
-                        # Save the image to the img field, then update the record/entry
-                        question_instance.img.save(image_data_pair.actual_image_name,
-                                                   ContentFile(image_data_pair.raw_image_data))
-                        question_instance.save()
-                        print(f"{question_instance.img.url}")
-
-                        # Parse the HTML using BeautifulSoup4 library
-                        html_obj = BeautifulSoup(question_text_field, 'html.parser')
-                        # Find the element with "img" tag
-                        my_img_element = html_obj.find('img')
-                        my_img_element['src'] = question_instance.img.url  # change src attribute
-                        question_text_field = str(html_obj)  # save html as string
-                        question_instance.text = question_text_field  # update text field
-                        question_instance.save()  # save/update entry in database
-
-                    testquestion_instance = TestQuestion.objects.create(
-                        test=test_instance,
-                        question=question_instance,
-                        assigned_points=max_points_for_question,
-                        section=test_section_instance
-                    )
-
-                # commented out because currently not supported
-                """
-                elif the_question_type == 'fill_in_multiple_blanks_question':
-                    print('')  # this is placeholder for code to extract info from question for table
-                elif the_question_type == 'multiple_dropdowns_question':
-                    print('')  # this is placeholder for code to extract info from question for table
-                elif the_question_type == 'numerical_question':
-                    print('')  # this is placeholder for code to extract info from question for table
-                elif the_question_type == 'calculated_question':
-                    print('')  # this is placeholder for code to extract info from question for table
-
-                elif the_question_type == 'file_upload_question':
-                    # should be done but may need to process feedbacks or comments
-                    print('')
-                elif the_question_type == 'text_only_question':
-                    # placeholder for any future changes, but 99.9% sure this is done
-                    print('')
-                """
-
-                #
 
     # file_info is just used for testing. remove after (probably)
     # for now, what the Parser returns depends on this
@@ -794,6 +205,13 @@ def parse_qti_xml(request):
     if uploaded_file is None:
         return JsonResponse({"message": "No file uploaded or it doesn't exist.", "file_info": file_info})
 
+    # the upload is on disk already (see FILE_UPLOAD_HANDLERS in settings.py). check its size,
+    # member count and compression before anything is written to the database
+    try:
+        check_zip_limits(uploaded_file, compressed_size=uploaded_file.size)
+    except ZipLimitError as error:
+        return JsonResponse({"error": str(error), "file_info": file_info}, status=400)
+
     course_id = request.POST.get("courseID")
     course_name = request.POST.get("courseName")
     course_crn = request.POST.get("courseCRN")
@@ -804,25 +222,27 @@ def parse_qti_xml(request):
     course_textbook_isbn = request.POST.get("courseTextbookISBN")
     course_textbook_link = request.POST.get("courseTextbookLink")
 
-    textbook_instance, created = Textbook.objects.get_or_create(
-        title=course_textbook_title,
-        author=course_textbook_author,
-        version=course_textbook_version,
-        isbn=course_textbook_isbn,
-        defaults={
-            "link": course_textbook_link,
-        }
-    )
+    # two uploads (or an upload and manage.py import_qti) for the same new course must not both create it
+    with named_lock(NEW_COURSE_LOCK):
+        textbook_instance, created = Textbook.objects.get_or_create(
+            title=course_textbook_title,
+            author=course_textbook_author,
+            version=course_textbook_version,
+            isbn=course_textbook_isbn,
+            defaults={
+                "link": course_textbook_link,
+            }
+        )
 
-    course_instance, created = Course.objects.get_or_create(
-        course_id=course_id,
-        defaults={
-            "name": course_name,
-            "crn": course_crn,
-            "sem": course_semester,
-            "textbook": textbook_instance
-        }
-    )
+        course_instance, created = Course.objects.get_or_create(
+            course_id=course_id,
+            defaults={
+                "name": course_name,
+                "crn": course_crn,
+                "sem": course_semester,
+                "textbook": textbook_instance
+            }
+        )
 
     # Check if the user is authenticated (logged in)
     if request.user.is_authenticated:
@@ -844,72 +264,129 @@ def parse_qti_xml(request):
     # 00 End
     # """
 
-    # this is used to stop removing and adding "#" when switching between tests
-    if uploaded_file is None:
-        path_to_zip_file = 'qti sample w one quiz-slash-test w all typesofquestions.zip'
-        # path_to_zip_file = 'added response feedback.zip'
-
-        # Get the first available course (REMOVE AFTER TESTING)
-        course_instance = Course.objects.first()
-        # Used for testing. Remove after
-        if course_instance is None:
-            course_instance = Course.objects.create(
-                course_code='CS123',
-                course_name='placeholder_course',
-                textbook_title='placeholder Tb title',
-                textbook_author='placeholder author',
-                textbook_isbn='placeholder isbn',
-                textbook_link='placeholder Tb link'
-            )
-    else:
-        path_to_zip_file = uploaded_file
-
-    with zipfile.ZipFile(path_to_zip_file, 'r') as zip_ref:
-        # List all files inside the zip file
-        filename_list = zip_ref.namelist()
+    # the zip is stored on disk and imported by a worker, so big uploads don't hold up this request
+    import_job = ImportJob.objects.create(
+        upload=uploaded_file,
+        original_filename=uploaded_file.name,
+        upload_size=uploaded_file.size,
+        course=course_instance,
+        user=request.user if request.user.is_authenticated else None
+    )
+    remember_job(request, import_job)
+    transaction.on_commit(start_local_workers)
 
-        for file_name in filename_list:
+    print(f"Queued import job {import_job.pk}")
+    return JsonResponse({
+        "message": "File queued for import.",
+        "job_id": import_job.pk,
+        "status_url": reverse("import_status", args=[import_job.pk]),
+        "file_info": file_info
+    }, status=202)
 
-            # looks for folders that are direct children of the zipfile
-            if file_name.endswith('/'):
 
-                temp_file_list = []
+def remember_job(request, job):
+    """
+    Keeps the job in the session, so a user who isn't logged in can still follow the job they started.
+    """
+    session_key = f"{job._meta.model_name}_ids"
+    request.session[session_key] = request.session.get(session_key, []) + [job.pk]
 
-                # looks for files that are children of the found folder, then adds them to a list
-                for temp_filename in filename_list:
-                    if temp_filename.startswith(f'{file_name}') and (temp_filename != file_name):
-                        temp_file_list.append(temp_filename)
 
-                # if a folder is not empty, process the files in it with the parser
-                if temp_file_list and len(temp_file_list) >= 2 and temp_file_list[0].endswith('.xml') and \
-                        temp_file_list[1].endswith('.xml'):
-                    # sort the files in the list because the metadata file for assessments is always
-                    # named assessment_meta.xml, but the file with questions seems to always
-                    # start with the letter "g"
-                    temp_file_list = sorted(temp_file_list)
-                    assessment_meta_path = temp_file_list[0]
-                    questions_file_path = temp_file_list[1]
+def job_for_user(request, model, job_id, **filters):
+    """
+    Returns the import or export job if it was started by the logged-in user, or without logging in
+    in this session, or the user is staff. It 404s otherwise, so others can't even tell whether the job exists.
+    """
+    jobs = model.objects.filter(pk=job_id, **filters)
+    if not request.user.is_staff:
+        started_here = Q(user=None, pk__in=request.session.get(f"{model._meta.model_name}_ids", []))
+        if request.user.is_authenticated:
+            started_here |= Q(user=request.user)
+        jobs = jobs.filter(started_here)
+    return get_object_or_404(jobs)
 
-                    with zip_ref.open(assessment_meta_path) as outer_file:
-                        with zip_ref.open(questions_file_path) as inner_file:
-                            outer_file.seek(0)  # Reset file pointer
-                            inner_file.seek(0)
 
-                            # this calls the function that actually handles the parsing
-                            parse_just_xml(outer_file, inner_file, course_instance)
-                            #
+def import_status(request, job_id):
+    """
+    Reports the progress of a background import job.
+    """
+    import_job = job_for_user(request, ImportJob, job_id)
+    return JsonResponse({
+        "job_id": import_job.pk,
+        "status": import_job.status,
+        "filename": import_job.original_filename,
+        "items_processed": import_job.items_processed,
+        "assessments_processed": import_job.assessments_processed,
+        "current_assessment": import_job.current_assessment,
+        "assessments_committed": len(import_job.checkpoint),
+        "elapsed_seconds": import_job.elapsed_seconds,
+        "error": import_job.error,
+        "result": import_job.result
+    })
+
+
+def export_status(request, job_id):
+    """
+    Reports the progress of a background export of the entire database, with its download link once it's done.
+    """
+    export_job = job_for_user(request, ExportJob, job_id)
+    return JsonResponse({
+        "job_id": export_job.pk,
+        "status": export_job.status,
+        "elapsed_seconds": export_job.elapsed_seconds,
+        "tables": export_job.tables,
+        "error": export_job.error,
+        "download_url": reverse('export_download', args=[export_job.pk]) if export_job.archive else None
+    })
+
+
+def export_download(request, job_id):
+    """
+    Streams the archive of a finished export of the entire database.
+    """
+    export_job = job_for_user(request, ExportJob, job_id, status=ExportJob.DONE)
+    return FileResponse(export_job.archive.open("rb"), as_attachment=True,
+                        filename=f"exported_database_{export_job.pk}.zip", content_type="application/zip")
 
-    #
-    end_time = time.perf_counter()
-    execution_time = end_time - start_time
-    print(execution_time)
-    # this is here because the javascript that calls the Parser depends on what it returns
-    if file_info is None:
-        print("Success! Created test record")
-        return JsonResponse({"Success": "created Test record."}, status=555)
 
-    else:
-        print("File processed successfully!")
-        return JsonResponse({"message": "File processed successfully!", "file_info": file_info})
+def search(request):
+    """
+    Full-text search over the question bank, best matches first.
+    Takes q and optionally textbook, course, chapter, section and qtype to filter by, and limit.
+    The next page is requested with the after_id and after_score returned as "next".
+    """
+    query = request.GET.get("q", "").strip()
+    if not query:
+        return JsonResponse({"error": "No search query provided"}, status=400)
+
+    try:
+        filters = {name: int(request.GET[name]) for name in ("textbook", "course", "chapter", "section")
+                   if request.GET.get(name)}
+        limit = min(max(int(request.GET.get("limit", 20)), 1), 100)
+        after = None
+        if request.GET.get("after_id"):
+            after = (int(request.GET["after_id"]), float(request.GET["after_score"]))
+    except (KeyError, ValueError):
+        return JsonResponse({"error": "Invalid search parameters provided"}, status=400)
+
+    results = search_questions(query, qtype=request.GET.get("qtype") or None, after=after, limit=limit, **filters)
+    questions = Question.objects.in_bulk([question_id for question_id, score in results])
+    return JsonResponse({
+        "results": [
+            {
+                "id": question_id,
+                "score": score,
+                "text": questions[question_id].text,
+                "qtype": questions[question_id].qtype,
+                "textbook": questions[question_id].textbook_id,
+                "course": questions[question_id].course_id,
+                "chapter": questions[question_id].chapter,
+                "section": questions[question_id].section,
+            }
+            for question_id, score in results if question_id in questions
+        ],
+        # one full page means there may be more
+        "next": {"after_id": results[-1][0], "after_score": results[-1][1]} if len(results) == limit else None
+    })
 
 #